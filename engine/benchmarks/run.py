@@ -0,0 +1,196 @@
+"""
+Benchmark JobService end to end against local SQLite databases filled with
+synthetic rows, timing each phase from the metrics registry and comparing the
+results to a saved baseline.
+
+    python -m benchmarks.run --rows 1000000 --save-baseline
+    python -m benchmarks.run --rows 1000000
+"""
+from dataclasses import asdict
+from datetime import datetime
+from statistics import median
+from typing import Dict, List, Optional
+import asyncio
+import json
+import os
+import platform
+import tempfile
+import time
+
+import pyarrow as pa
+import typer
+
+from engine.config.config import Config
+from engine.services.job import Destination, Job, JobService
+from engine.services.metrics import metrics
+from benchmarks.synthetic import TableSpec, prepare_destination, prepare_source
+
+# Histograms summed into each phase. Stages run concurrently, so phases are the
+# total time spent in them across workers and can add up to more than the wall time
+PHASES = {
+    "read": ["source_query_seconds", "source_fetch_seconds"],
+    "arrow": ["arrow_conversion_seconds"],
+    "parquet": ["parquet_write_seconds"],
+    "load": ["load_seconds"]
+}
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+app = typer.Typer()
+
+def run_once(spec: TableSpec, work_dir: str, source_path: str, batch_size: Optional[int], destinations: int = 1) -> Dict[str, float]:
+    dest_paths = [os.path.join(work_dir, "dest.db" if index == 0 else f"dest_{index}.db") for index in range(destinations)]
+    for dest_path in dest_paths:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(dest_path + suffix):
+                os.unlink(dest_path + suffix)
+        prepare_destination(dest_path, spec)
+    dest_path = dest_paths[0]
+
+    job = Job(
+        job_id=f"bench-{spec.fingerprint()}",
+        source_engine="sqlite",
+        source_host="",
+        source_port=0,
+        source_user="",
+        source_password="",
+        source_database=source_path,
+        source_table=spec.name,
+        dest_engine="sqlite",
+        dest_host="",
+        dest_port=0,
+        dest_user="",
+        dest_password="",
+        dest_database=dest_path,
+        dest_table=spec.name,
+        s3_bucket="",
+        s3_access_key_id="",
+        s3_secret_access_key="",
+        start_offset=0,
+        end_offset=0,
+        sort_column="",
+        destinations=[Destination("sqlite", "", 0, "", "", path, spec.name) for path in dest_paths[1:]]
+    )
+    service = JobService(job)
+    if batch_size:
+        service.batch_size = batch_size
+
+    metrics.reset()
+    start_time = time.time()
+    asyncio.run(service.run_job())
+    elapsed_time = time.time() - start_time
+
+    report = metrics.report(spec.name)
+    result = {"total": elapsed_time, "rows_per_second": spec.rows / elapsed_time}
+    for phase, names in PHASES.items():
+        result[phase] = sum(histogram["sum"] for histogram in report["histograms"] if histogram["name"] in names)
+    return result
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Print the results next to the baseline, returning the phases that regressed by more than `threshold`"""
+    regressions = []
+    print(f"\n{'phase':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for phase, value in results.items():
+        base = baseline.get(phase)
+        if not base:
+            print(f"{phase:<16}{'-':>12}{value:>12.2f}{'-':>10}")
+            continue
+        change = (value - base) / base
+        # Throughput regresses when it drops, durations when they grow
+        regressed = -change > threshold if phase == "rows_per_second" else change > threshold
+        if regressed:
+            regressions.append(phase)
+        print(f"{phase:<16}{base:>12.2f}{value:>12.2f}{change:>+10.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+@app.command()
+def benchmark(
+    rows: int = typer.Option(1000000, "--rows", "-r", help="Number of rows in the synthetic table"),
+    int_columns: int = typer.Option(2, "--int-columns", help="Number of BIGINT columns"),
+    float_columns: int = typer.Option(2, "--float-columns", help="Number of DOUBLE columns"),
+    string_columns: int = typer.Option(2, "--string-columns", help="Number of VARCHAR columns"),
+    timestamp_columns: int = typer.Option(1, "--timestamp-columns", help="Number of TIMESTAMP columns"),
+    date_columns: int = typer.Option(0, "--date-columns", help="Number of DATE columns"),
+    bool_columns: int = typer.Option(0, "--bool-columns", help="Number of BOOLEAN columns"),
+    string_length: int = typer.Option(32, "--string-length", help="Maximum length of the generated strings"),
+    seed: int = typer.Option(42, "--seed", help="Seed of the generated rows"),
+    batch_size: int = typer.Option(0, "--batch-size", help="Rows per batch, sized from the row width when 0"),
+    encode_processes: bool = typer.Option(False, "--encode-processes", help="Encode parquet files in worker processes"),
+    auto_tune: str = typer.Option("", "--auto-tune", help="Tune the parquet encodings per column for an objective: size, load or balanced"),
+    destinations: int = typer.Option(1, "--destinations", help="Number of destination databases the table is copied into at once"),
+    spill_cache: bool = typer.Option(False, "--spill-cache", help="Cache the extracted batches, repeats after the first read them from the cache"),
+    max_rows_per_second: int = typer.Option(0, "--max-rows-per-second", help="Cap on the rows per second read from the source"),
+    latency_tolerance: float = typer.Option(0.0, "--latency-tolerance", help="Adapt the source query limit, backing off once the fetch latency grows past this multiple"),
+    repeat: int = typer.Option(3, "--repeat", "-n", help="Number of runs, the median of each phase is reported"),
+    work_dir: str = typer.Option(os.path.join(tempfile.gettempdir(), "epic-shelter-bench"), "--work-dir", help="Directory for the databases and exported files"),
+    baseline_path: str = typer.Option(DEFAULT_BASELINE, "--baseline", help="Baseline to compare against"),
+    save_baseline: bool = typer.Option(False, "--save-baseline", help="Save the results as the new baseline"),
+    threshold: float = typer.Option(0.1, "--threshold", help="Relative change that counts as a regression"),
+):
+    """Time a migration of a synthetic table between local SQLite databases"""
+    spec = TableSpec(
+        rows=rows,
+        int_columns=int_columns,
+        float_columns=float_columns,
+        string_columns=string_columns,
+        timestamp_columns=timestamp_columns,
+        date_columns=date_columns,
+        bool_columns=bool_columns,
+        string_length=string_length,
+        seed=seed
+    )
+    os.makedirs(work_dir, exist_ok=True)
+    source_path = os.path.join(work_dir, "source.db")
+    prepare_source(source_path, spec)
+
+    Config.local_dir = os.path.join(work_dir, "export")
+    Config.metrics_dir = os.path.join(work_dir, "metrics")
+    Config.use_s3 = False
+    Config.resume = False
+    Config.incremental = False
+    # A fixed batch size replaces the one derived from the row width
+    Config.adaptive_batch_size = not batch_size
+    Config.encode_processes = encode_processes
+    Config.parquet_auto_tune = bool(auto_tune)
+    if auto_tune:
+        Config.parquet_tune_objective = auto_tune
+    Config.spill_cache = spill_cache
+    Config.source_max_rows_per_second = max_rows_per_second
+    Config.source_latency_tolerance = latency_tolerance
+    Config.spill_cache_dir = os.path.join(work_dir, "spill")
+    # Removes the exported parquet files after each run
+    Config.migrate_only = True
+
+    runs = [run_once(spec, work_dir, source_path, batch_size, destinations) for _ in range(repeat)]
+    results = {phase: median(run[phase] for run in runs) for phase in runs[0]}
+
+    regressions = []
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if baseline["spec"] != asdict(spec):
+            print(f"Baseline {baseline_path} was recorded for a different table spec, comparing anyway")
+        regressions = compare(results, baseline["results"], threshold)
+    else:
+        compare(results, {}, threshold)
+
+    if save_baseline:
+        with open(baseline_path, "w") as f:
+            json.dump({
+                "spec": asdict(spec),
+                "results": results,
+                "runs": runs,
+                "python": platform.python_version(),
+                "pyarrow": pa.__version__,
+                "machine": platform.machine(),
+                "cpu_count": os.cpu_count(),
+                "recorded_at": datetime.now().isoformat()
+            }, f, indent=2)
+        print(f"Saved baseline to {baseline_path}")
+
+    if regressions and not save_baseline:
+        print(f"Regressed phases: {', '.join(regressions)}")
+        raise typer.Exit(1)
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,110 @@
+from dataclasses import dataclass, asdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+import hashlib
+import json
+import os
+import random
+
+from faker import Faker
+import pyarrow as pa
+
+from engine.connectors.sqlite import SQLiteConnector
+
+@dataclass
+class TableSpec:
+    name: str = "bench"
+    rows: int = 1000000
+    int_columns: int = 2
+    float_columns: int = 2
+    string_columns: int = 2
+    timestamp_columns: int = 1
+    date_columns: int = 0
+    bool_columns: int = 0
+    string_length: int = 32
+    seed: int = 42
+
+    def columns(self) -> Dict[str, str]:
+        """Column names and MySQL style types, starting with the `id` primary key"""
+        columns = {"id": "BIGINT"}
+        groups = [
+            ("i", self.int_columns, "BIGINT"),
+            ("f", self.float_columns, "DOUBLE"),
+            ("s", self.string_columns, f"VARCHAR({self.string_length})"),
+            ("t", self.timestamp_columns, "TIMESTAMP"),
+            ("d", self.date_columns, "DATE"),
+            ("b", self.bool_columns, "BOOLEAN")
+        ]
+        for prefix, count, column_type in groups:
+            for i in range(count):
+                columns[f"{prefix}{i}"] = column_type
+        return columns
+
+    def fingerprint(self) -> str:
+        return hashlib.md5(json.dumps(asdict(self), sort_keys=True).encode()).hexdigest()[:12]
+
+def create_table(connector: SQLiteConnector, spec: TableSpec) -> None:
+    """Create an empty table with the columns of `spec`"""
+    columns = spec.columns()
+    definitions = [f"`{name}` {column_type}" for name, column_type in columns.items()]
+    connector._execute(f"DROP TABLE IF EXISTS {spec.name}")
+    connector._execute(f"CREATE TABLE {spec.name} ({', '.join(definitions)}, PRIMARY KEY (`id`))")
+
+def populate_table(connector: SQLiteConnector, spec: TableSpec, chunk_rows: int = 100000) -> None:
+    """Fill the table of `spec` with the same pseudo-random rows on every run"""
+    rng = random.Random(spec.seed)
+    fake = Faker()
+    fake.seed_instance(spec.seed)
+    # Drawing from a fixed vocabulary keeps generation fast while the strings still look like real text
+    vocabulary = [fake.text(max_nb_chars=max(spec.string_length, 5))[:spec.string_length] for _ in range(1000)]
+    epoch = datetime(2020, 1, 1)
+
+    columns = spec.columns()
+    for start in range(0, spec.rows, chunk_rows):
+        num_rows = min(chunk_rows, spec.rows - start)
+        data: Dict[str, List] = {"id": list(range(start + 1, start + num_rows + 1))}
+        for name, column_type in columns.items():
+            if name == "id":
+                continue
+            if column_type == "BIGINT":
+                data[name] = [rng.randint(-2 ** 40, 2 ** 40) for _ in range(num_rows)]
+            elif column_type == "DOUBLE":
+                data[name] = [rng.uniform(-1e6, 1e6) for _ in range(num_rows)]
+            elif column_type == "TIMESTAMP":
+                data[name] = [epoch + timedelta(seconds=rng.randint(0, 5 * 365 * 86400)) for _ in range(num_rows)]
+            elif column_type == "DATE":
+                data[name] = [date(2020, 1, 1) + timedelta(days=rng.randint(0, 5 * 365)) for _ in range(num_rows)]
+            elif column_type == "BOOLEAN":
+                data[name] = [rng.random() < 0.5 for _ in range(num_rows)]
+            else:
+                data[name] = [rng.choice(vocabulary) for _ in range(num_rows)]
+        connector._insert_table(spec.name, pa.Table.from_pydict(data))
+
+def prepare_source(path: str, spec: TableSpec) -> None:
+    """Generate the source database for `spec`, reusing the file from an earlier run with the same spec"""
+    marker = f"{path}.{spec.fingerprint()}"
+    if os.path.exists(path) and os.path.exists(marker):
+        print(f"Reusing synthetic source {path}")
+        return
+
+    for stale in (path, marker):
+        if os.path.exists(stale):
+            os.unlink(stale)
+    print(f"Generating {spec.rows:,} synthetic rows in {path}")
+    connector = SQLiteConnector("", 0, "", "", path)
+    connector.connect()
+    try:
+        create_table(connector, spec)
+        populate_table(connector, spec)
+    finally:
+        connector.disconnect()
+    open(marker, "w").close()
+
+def prepare_destination(path: str, spec: TableSpec) -> None:
+    """Create an empty destination table with the same columns as the source"""
+    connector = SQLiteConnector("", 0, "", "", path)
+    connector.connect()
+    try:
+        create_table(connector, spec)
+    finally:
+        connector.disconnect()
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from pathlib import Path
+import multiprocessing
 
 @dataclass
 class Config:
@@ -10,6 +11,102 @@ class Config:
     local_dir: str = str(Path.home() / "epic-shelter")
     verbose: bool = False
 
+    # Job Config
+    use_s3: bool = False
+    reset_dest_table: bool = False
+    migrate_only: bool = False
+    use_keyset: bool = True
+    resume: bool = True
+    stream_batch_rows: int = 100000
+
+    # Batch Sizing Config
+    adaptive_batch_size: bool = True
+    batch_target_bytes: int = 2 * 1024 * 1024 * 1024
+    stream_memory_bytes: int = 512 * 1024 * 1024
+    stream_target_seconds: float = 1.0
+
+    # Incremental Config
+    incremental: bool = False
+    watermark_column: str = None
+    watermark_dir: str = None
+
+    # Source Throttling Config
+    # Extract queries running against the source at once, extract_workers when 0
+    source_max_queries: int = 0
+    source_min_queries: int = 1
+    # Caps are enforced between fetched record batches, 0 disables them
+    source_max_rows_per_second: int = 0
+    source_max_bytes_per_second: int = 0
+    # Adapt the query limit with AIMD, backing off once the fetch latency per row grows past
+    # this multiple of the lowest seen, 0 keeps it at source_max_queries
+    source_latency_tolerance: float = 0.0
+    source_backoff_factor: float = 0.5
+
+    # Spill Cache Config
+    # Keep extracted batches as Arrow IPC files for later loads of the same source snapshot,
+    # jobs with several destinations always use it
+    spill_cache: bool = False
+    spill_cache_dir: str = None
+    spill_cache_max_bytes: int = 10 * 1024 * 1024 * 1024
+    # Cached batches older than this are read from the source again, 0 keeps them until evicted
+    spill_cache_max_age_seconds: float = 0
+
+    # Load Config
+    bulk_load: bool = True
+    local_ingest: bool = True
+    max_statement_bytes: int = 16 * 1024 * 1024
+
+    # Retry Config
+    # Attempts of every batch extract, upload and load, only transient errors are retried
+    retry_attempts: int = 5
+    retry_base_seconds: float = 1.0
+    retry_max_seconds: float = 60.0
+
+    # Metrics Config
+    metrics_dir: str = None
+    metrics_textfile: str = None
+
+    # Pipeline Config
+    extract_workers: int = multiprocessing.cpu_count()
+    encode_workers: int = multiprocessing.cpu_count()
+    # Encode in encode_workers processes instead of threads
+    encode_processes: bool = False
+    upload_workers: int = 2 * multiprocessing.cpu_count()
+    load_workers: int = multiprocessing.cpu_count()
+    pipeline_queue_size: int = 4
+
+    # Connection Pool Config
+    src_pool_size: int = multiprocessing.cpu_count() + 1
+    dest_pool_size: int = multiprocessing.cpu_count() + 1
+    pool_health_check_seconds: float = 30.0
+
+    # Parquet Config
+    parquet_target_file_bytes: int = 256 * 1024 * 1024
+    parquet_target_file_rows: int = 0
+    parquet_auto_tune: bool = False
+    parquet_tune_objective: str = "balanced"
+    parquet_tune_sample_rows: int = 100000
+    # Upload and load throughput used to weigh encoded bytes against encode and decode time
+    parquet_tune_bandwidth_bytes: int = 100 * 1024 * 1024
+
+    # Partition Config
+    partition_count: int = 0
+    partition_column: str = None
+    partition_sample_size: int = 100000
+    partition_plan_path: str = None
+
+    # Checksum Validation Config
+    checksum_validation: bool = False
+    checksum_column: str = None
+    checksum_ranges: int = 64
+    checksum_workers: int = multiprocessing.cpu_count()
+    checksum_drilldown_rows: int = 10000
+    checksum_max_mismatches: int = 100
+
+    # Database Job Config
+    table_workers: int = 4
+    max_memory_bytes: int = 0
+
     # Source Config
     src_engine: str = None
     src_host: str = None
@@ -32,7 +129,17 @@ class Config:
     s3_bucket: str = None
     s3_access_key_id: str = None
     s3_secret_access_key: str = None
+    s3_endpoint_url: str = None
+    # Region of the bucket, the destination's S3 pipelines read from it
+    s3_region: str = "us-west-2"
+    s3_multipart_chunk_bytes: int = 64 * 1024 * 1024
+    s3_max_concurrency: int = 10
+    s3_upload_from_memory: bool = False
+    # Load the uploaded files with a pipeline running in the background while the job is still uploading,
+    # instead of one foreground pipeline once every file is uploaded
+    s3_pipeline_background: bool = False
+    s3_pipeline_poll_seconds: float = 2.0
 
 @dataclass
 class EngineConfig:
-    supported_engines = ["singlestore"]
\ No newline at end of file
+    supported_engines = ["singlestore", "sqlite"]
\ No newline at end of file
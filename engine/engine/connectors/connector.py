@@ -1,18 +1,35 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import pandas as pd
+import pyarrow as pa
+
+from engine.services.transfer import TransferPlan
 
 class Connector(ABC):
-    
     @staticmethod
-    def create_connector(engine: str, host: str, port: int, user: str, password: str, database: str) -> Any:
+    def create_connector(engine: str, host: str, port: int, user: str, password: str, database: str, use_async: bool = False, pool_size: int = 10) -> Any:
         
         from .singlestore import SingleStoreConnector
+        from .singlestore_async import AsyncSingleStoreConnector
+        from .sqlite import AsyncSQLiteConnector, SQLiteConnector
 
         connector_map = {
-            "singlestore": SingleStoreConnector
+            "singlestore": SingleStoreConnector,
+            "sqlite": SQLiteConnector
+        }
+
+        # Async connectors share a connection pool across every concurrent caller
+        async_connector_map = {
+            "singlestore": AsyncSingleStoreConnector,
+            "sqlite": AsyncSQLiteConnector
         }
 
+        if use_async:
+            connector_class = async_connector_map.get(engine)
+            if not connector_class:
+                raise ValueError(f"Unsupported async engine: {engine}")
+            return connector_class(host, port, user, password, database, pool_size=pool_size)
+
         connector_class = connector_map.get(engine)
         if not connector_class:
             raise ValueError(f"Unsupported engine: {engine}")
@@ -50,31 +67,113 @@ class Connector(ABC):
         pass
 
     @abstractmethod
-    def get_row_count(self, table_name: str) -> int:
+    def get_arrow_schema(self, table_schema: Dict[str, str]) -> pa.Schema:
+        """Get the Arrow schema that rows of a specific table schema are decoded into"""
+        pass
+
+    @abstractmethod
+    def get_transfer_plan(self, table_name: str, table_schema: Optional[Dict[str, str]] = None) -> TransferPlan:
+        """Get the cached transfer plan of a table, describing it only when its schema isn't given or cached"""
+        pass
+
+    @abstractmethod
+    def get_row_count(self, table_name: str, where: str = "", where_params: Optional[List[Any]] = None) -> int:
         """Get total number of rows in a table"""
         pass
 
+    @abstractmethod
+    def get_table_size(self, table_name: str) -> Tuple[int, int]:
+        """Estimate the number of rows and bytes of a table from its statistics, without scanning it"""
+        pass
+
     @abstractmethod
     def get_primary_key_columns(self, table_name: str) -> List[str]:
         """Get primary key columns for a table"""
         pass
 
     @abstractmethod
-    def read_table(self, table_name: str, interval: int, offset: int = 0, sort_column: str = "") -> pd.DataFrame:
-        """Read data from a table"""
+    def get_key_boundaries(self, table_name: str, key_columns: List[str], interval: int, where: str = "", where_params: Optional[List[Any]] = None) -> List[Tuple]:
+        """Get the last key of every full batch of `interval` rows matching `where` when ordered by the key columns"""
         pass
 
     @abstractmethod
-    def write_table(self, table_name: str, df: pd.DataFrame) -> None:
-        """Write data to a table"""
+    def get_key_range(self, table_name: str, column: str) -> Tuple[Any, Any]:
+        """Get the minimum and maximum value of a key column"""
         pass
 
     @abstractmethod
-    def ingest_parquet(self, table_name: str, parquet_path: str, aws_access_key_id: str, aws_secret_access_key: str) -> None:
-        """Optional: Ingest parquet files directly into a table"""
+    def get_key_quantiles(self, table_name: str, column: str, num_quantiles: int, sample_size: int) -> List[Any]:
+        """Estimate the values splitting a key column into `num_quantiles` equally sized parts from a random sample"""
+        pass
+
+    @abstractmethod
+    def get_range_checksum(self, table_name: str, columns: List[str], where: str = "", where_params: Optional[List[Any]] = None) -> Tuple[int, int]:
+        """Get the row count and the sum of the row hashes over `columns` of the rows matching `where`"""
+        pass
+
+    @abstractmethod
+    def get_row_checksums(self, table_name: str, columns: List[str], key_column: str, where: str = "", where_params: Optional[List[Any]] = None) -> List[Tuple[Any, int]]:
+        """Get the key and row hash over `columns` of every row matching `where`"""
+        pass
+
+    @abstractmethod
+    def read_table(self, table_name: str, interval: int, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None) -> pd.DataFrame:
+        """Read data from a table, paging by keyset when `key_columns` is given and by offset otherwise.
+        An interval of 0 reads every row matching `where`"""
+        pass
+
+    @abstractmethod
+    def read_table_arrow(self, table_name: str, interval: int, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None, plan: Optional[TransferPlan] = None) -> pa.Table:
+        """Read data from a table like `read_table`, decoding rows straight into Arrow columns with the table's transfer `plan`"""
+        pass
+
+    @abstractmethod
+    def iter_batches(self, table_name: str, batch_rows: int, interval: int = 0, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None, plan: Optional[TransferPlan] = None) -> Iterator[pa.RecordBatch]:
+        """Stream the rows selected like `read_table` as record batches of at most `batch_rows` rows"""
+        pass
+
+    @abstractmethod
+    def write_table(self, table_name: str, df: pd.DataFrame, replace: bool = False) -> None:
+        """Write data to a table, replacing rows with the same primary key when `replace` is set"""
+        pass
+
+    @abstractmethod
+    def ingest_local_parquet(self, table_name: str, parquet_path: str, replace: bool = False) -> None:
+        """Bulk load a parquet file from the local filesystem into a table, replacing rows with the same primary key when `replace` is set"""
         pass
 
     @abstractmethod
     def delete_table(self, table_name: str) -> None:
         """Delete data from a table"""
         pass
+
+class S3IngestConnector(Connector):
+    """
+    Connector of a destination that loads the parquet files a job uploads to S3
+    itself, at once or with a pipeline running while the job uploads. Jobs load
+    the files of other destinations from Config.local_dir instead
+    """
+    @abstractmethod
+    def ingest_parquet(self, table_name: str, parquet_path: str, aws_access_key_id: str, aws_secret_access_key: str) -> None:
+        """Ingest parquet files directly into a table"""
+        pass
+
+    @abstractmethod
+    def start_pipeline(self, table_name: str, parquet_path: str, aws_access_key_id: str, aws_secret_access_key: str) -> str:
+        """Start a pipeline ingesting parquet files into a table in the background, returning its name"""
+        pass
+
+    @abstractmethod
+    def get_pipeline_progress(self, pipeline_name: str) -> Tuple[str, Dict[str, str]]:
+        """The state of a pipeline and the state of every file it found, by file name"""
+        pass
+
+    @abstractmethod
+    def get_pipeline_errors(self, pipeline_name: str, limit: int = 5) -> List[str]:
+        """The most recent errors of a pipeline"""
+        pass
+
+    @abstractmethod
+    def drop_pipeline(self, pipeline_name: str) -> None:
+        """Stop and drop a pipeline"""
+        pass
@@ -0,0 +1,196 @@
+from typing import Any, Dict, List, Optional, Tuple
+import re
+import pyarrow as pa
+
+from engine.config.config import Config
+from engine.services.metrics import metrics, SIZE_BUCKETS
+from engine.services.transfer import TransferPlan, plans
+
+# Arrow types of MySQL dialect integer types, signed and unsigned
+_INTEGER_TYPES = {
+    "tinyint": (pa.int8(), pa.uint8()),
+    "smallint": (pa.int16(), pa.uint16()),
+    "mediumint": (pa.int32(), pa.uint32()),
+    "int": (pa.int32(), pa.uint32()),
+    "integer": (pa.int32(), pa.uint32()),
+    "bigint": (pa.int64(), pa.uint64())
+}
+
+# Arrow types of the other MySQL dialect types, by their base type
+_TYPES = {
+    "float": pa.float32(),
+    "double": pa.float64(),
+    "real": pa.float64(),
+    "bool": pa.bool_(),
+    "boolean": pa.bool_(),
+    "year": pa.int16(),
+    "timestamp": pa.timestamp("us"),
+    "datetime": pa.timestamp("us"),
+    "date": pa.date32(),
+    "time": pa.time64("us"),
+    "binary": pa.binary(),
+    "varbinary": pa.binary(),
+    "tinyblob": pa.binary(),
+    "blob": pa.binary(),
+    "mediumblob": pa.binary(),
+    "longblob": pa.binary(),
+    "char": pa.string(),
+    "varchar": pa.string(),
+    "tinytext": pa.string(),
+    "text": pa.string(),
+    "mediumtext": pa.string(),
+    "longtext": pa.string(),
+    "json": pa.string(),
+    "enum": pa.string(),
+    "set": pa.string()
+}
+
+_DECIMAL_TYPES = ("decimal", "numeric", "dec")
+
+# Base type and its parenthesized arguments, e.g. "decimal(10,2) unsigned"
+_TYPE_PATTERN = re.compile(r"^\s*(\w+)\s*(?:\(([^)]*)\))?")
+
+def _arrow_type(db_type: str) -> Optional[pa.DataType]:
+    """The exact Arrow type of a MySQL dialect column type, None when it has no mapping"""
+    match = _TYPE_PATTERN.match(db_type.lower())
+    if not match:
+        return None
+    base_type = match.group(1)
+    arguments = [argument.strip() for argument in (match.group(2) or "").split(",") if argument.strip()]
+    unsigned = "unsigned" in db_type[match.end():].lower()
+
+    if base_type in _INTEGER_TYPES:
+        return _INTEGER_TYPES[base_type][unsigned]
+    if base_type in _DECIMAL_TYPES:
+        precision = int(arguments[0]) if arguments else 10
+        scale = int(arguments[1]) if len(arguments) > 1 else 0
+        return pa.decimal128(precision, scale) if precision <= 38 else pa.decimal256(precision, scale)
+    return _TYPES.get(base_type)
+
+class MySQLDialect:
+    """
+    Type mapping, transfer plan caching and query building for MySQL dialect
+    databases, shared by the connectors of engines that accept it without doing
+    any I/O themselves. Connectors mixing it in set `host`, `port` and `database`
+    and implement `get_table_schema`
+    """
+    def get_parquet_schema(self, table_schema: Dict[str, str]) -> Dict[str, str]:
+        return {
+            column_name: str(arrow_type) if arrow_type is not None else 'unsupported'
+            for column_name, arrow_type in self.get_arrow_types(table_schema).items()
+        }
+
+    def get_arrow_types(self, table_schema: Dict[str, str]) -> Dict[str, Optional[pa.DataType]]:
+        """Get the Arrow type of every column of a table schema, None for types without a mapping"""
+        return {column_name: _arrow_type(db_type) for column_name, db_type in table_schema.items()}
+
+    def get_arrow_schema(self, table_schema: Dict[str, str]) -> pa.Schema:
+        arrow_types = self.get_arrow_types(table_schema)
+        # Unsupported columns are left out so their type is inferred from the data
+        return pa.schema([(name, arrow_type) for name, arrow_type in arrow_types.items() if arrow_type is not None])
+
+    def get_transfer_plan(self, table_name: str, table_schema: Optional[Dict[str, str]] = None) -> TransferPlan:
+        if table_schema is None:
+            plan = plans.latest(self._plan_key(table_name))
+            if plan is not None:
+                return plan
+            table_schema = self.get_table_schema(table_name)
+        return self._plan_for(table_name, table_schema)
+
+    def _plan_key(self, table_name: str) -> str:
+        return f"{self.host}:{self.port}/{self.database}.{table_name}"
+
+    def _plan_for(self, table_name: str, table_schema: Dict[str, str]) -> TransferPlan:
+        if not table_schema:
+            raise Exception(f"Could not get schema for table {table_name}")
+        return plans.get(self._plan_key(table_name), table_schema, lambda: TransferPlan(table_name, table_schema, self.get_arrow_types(table_schema)))
+
+    def _boundary_query(self, query: str, key_columns: List[str], after_key: Optional[Tuple], where: str, where_params: Optional[List[Any]]) -> Tuple[str, List[Any]]:
+        conditions = []
+        params = []
+        if where:
+            conditions.append(f"({where})")
+            params.extend(where_params or [])
+        if after_key is not None:
+            predicate, key_params = self._keyset_predicate(key_columns, after_key)
+            conditions.append(f"({predicate})")
+            params.extend(key_params)
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+        return query, params
+
+    def _keyset_predicate(self, key_columns: List[str], after_key: Tuple) -> Tuple[str, List[Any]]:
+        # Expands (a, b, c) > (x, y, z) into a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        clauses = []
+        params = []
+        for i, column in enumerate(key_columns):
+            conditions = [f"`{prefix}` = %s" for prefix in key_columns[:i]]
+            conditions.append(f"`{column}` > %s")
+            clauses.append(f"({' AND '.join(conditions)})")
+            params.extend(after_key[:i + 1])
+        return " OR ".join(clauses), params
+
+    def _select_query(self, table_name: str, interval: int, offset: int, sort_column: str, key_columns: Optional[List[str]], after_key: Optional[Tuple], where: str, where_params: Optional[List[Any]], columns: Optional[List[str]] = None) -> Tuple[str, List[Any]]:
+        # Selecting the columns of a transfer plan fixes their order, so rows convert without looking at the cursor
+        column_list = ", ".join(f"`{column}`" for column in columns) if columns else "*"
+        query = f"""
+            SELECT {column_list}
+            FROM {table_name}
+        """
+        conditions = []
+        params = []
+        if where:
+            conditions.append(f"({where})")
+            params.extend(where_params or [])
+
+        if key_columns:
+            # Keyset pagination seeks straight to the batch instead of scanning past `offset` rows
+            if after_key is not None:
+                predicate, key_params = self._keyset_predicate(key_columns, after_key)
+                conditions.append(f"({predicate})")
+                params.extend(key_params)
+            if conditions:
+                query += f" WHERE {' AND '.join(conditions)}"
+            query += f" ORDER BY {', '.join(f'`{column}`' for column in key_columns)}"
+            if interval:
+                query += f" LIMIT {interval}"
+        else:
+            if conditions:
+                query += f" WHERE {' AND '.join(conditions)}"
+
+            if sort_column:
+                query += f" ORDER BY {sort_column}"
+
+            if interval:
+                query += f" LIMIT {interval} OFFSET {offset}"
+
+        return query, params
+
+    def _quantiles(self, sample: List[Any], num_quantiles: int) -> List[Any]:
+        sample = sorted(sample)
+        if not sample:
+            return []
+        return [sample[(i * len(sample)) // num_quantiles] for i in range(1, num_quantiles)]
+
+    def _rows_to_record_batch(self, rows: List[Tuple], columns: List[str], plan: Optional[TransferPlan] = None) -> pa.RecordBatch:
+        if plan is not None and columns == plan.column_names:
+            return plan.to_record_batch(rows)
+        values = list(zip(*rows)) if rows else [()] * len(columns)
+        return pa.RecordBatch.from_arrays([pa.array(column) for column in values], names=columns)
+
+    def _print_load_throughput(self, table_name: str, num_rows: int, num_bytes: int, method: str, elapsed_time: float) -> None:
+        metrics.observe("load_seconds", elapsed_time, table=table_name, method=method)
+        metrics.increment("loaded_rows", num_rows, table=table_name)
+        metrics.increment("loaded_bytes", num_bytes, table=table_name)
+        # Recorded on every load so the throughput of each load method shows up in the metrics report without Config.verbose
+        elapsed_time = max(elapsed_time, 1e-6)
+        metrics.observe("load_rows_per_second", num_rows / elapsed_time, SIZE_BUCKETS, table=table_name, method=method)
+        metrics.observe("load_bytes_per_second", num_bytes / elapsed_time, SIZE_BUCKETS, table=table_name, method=method)
+        if not Config.verbose:
+            return
+
+        megabytes = num_bytes / (1024 * 1024)
+        print(
+            f"Loaded {num_rows:,} rows ({megabytes:.1f} MB) into {table_name} with {method} in {elapsed_time:.2f} seconds "
+            f"({num_rows / elapsed_time:,.0f} rows/second, {megabytes / elapsed_time:.1f} MB/second)"
+        )
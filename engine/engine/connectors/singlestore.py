@@ -1,11 +1,21 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
 import pymysql
+import pymysql.cursors
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import os
+import tempfile
 import time
 
-from engine.connectors.connector import Connector
+from engine.config.config import Config
+from engine.connectors.connector import S3IngestConnector
+from engine.connectors.dialect import MySQLDialect
+from engine.services.metrics import metrics
+from engine.services.transfer import TransferPlan
 
-class SingleStoreConnector(Connector):
+class SingleStoreConnector(MySQLDialect, S3IngestConnector):
     def __init__(self, host: str, port: int, user: str, password: str, database: str):
         self.host = host
         self.port = port
@@ -21,7 +31,8 @@ class SingleStoreConnector(Connector):
             user=self.user,
             password=self.password,
             database=self.database,
-            autocommit=True
+            autocommit=True,
+            local_infile=Config.bulk_load
         )
 
     def disconnect(self) -> None:
@@ -59,73 +70,34 @@ class SingleStoreConnector(Connector):
             print(f"Error getting schema for table {table_name}: {str(e)}")
             return {}
         
-    def get_parquet_schema(self, table_schema: Dict[str, str]) -> Dict[str, str]:
-        parquet_schema = {}
-        
-        for column_name, db_type in table_schema.items():
-            # Convert to lowercase for easier matching
-            db_type_lower = db_type.lower()
-            
-            # Integer types
-            if any(int_type in db_type_lower for int_type in ['tinyint', 'smallint', 'mediumint', 'int', 'integer']):
-                if 'unsigned' in db_type_lower:
-                    parquet_schema[column_name] = 'uint64'
-                else:
-                    parquet_schema[column_name] = 'int64'
-            
-            # Big integer types
-            elif 'bigint' in db_type_lower:
-                if 'unsigned' in db_type_lower:
-                    parquet_schema[column_name] = 'uint64'
-                else:
-                    parquet_schema[column_name] = 'int64'
-            
-            # Floating point types
-            elif any(float_type in db_type_lower for float_type in ['float', 'double', 'real']):
-                parquet_schema[column_name] = 'double'
-            
-            # Decimal/Numeric types
-            elif any(decimal_type in db_type_lower for decimal_type in ['decimal', 'numeric']):
-                parquet_schema[column_name] = 'double'
-            
-            # Boolean types
-            elif any(bool_type in db_type_lower for bool_type in ['bool', 'boolean']):
-                parquet_schema[column_name] = 'boolean'
-            
-            # Date and time types
-            elif 'timestamp' in db_type_lower:
-                parquet_schema[column_name] = 'timestamp[us]'
-            elif 'datetime' in db_type_lower:
-                parquet_schema[column_name] = 'timestamp[us]'
-            elif 'date' in db_type_lower:
-                parquet_schema[column_name] = 'date32'
-            elif 'time' in db_type_lower:
-                parquet_schema[column_name] = 'time64[us]'
-            
-            # Binary types
-            elif any(binary_type in db_type_lower for binary_type in ['binary', 'varbinary', 'blob']):
-                parquet_schema[column_name] = 'binary'
-            
-            # String types
-            elif any(string_type in db_type_lower for string_type in ['varchar', 'char', 'text', 'longtext', 'mediumtext', 'tinytext']):
-                parquet_schema[column_name] = 'string'
-            
-            # Unsupported types (default case)
-            else:
-                parquet_schema[column_name] = 'unsupported'
-        
-        return parquet_schema
-
-    def get_row_count(self, table_name: str) -> int:
+    def get_row_count(self, table_name: str, where: str = "", where_params: Optional[List[Any]] = None) -> int:
         try:
             with self.connection.cursor() as cur:
-                cur.execute(f"SELECT COUNT(*) FROM {table_name}")
+                cur.execute(f"SELECT COUNT(*) FROM {table_name}" + (f" WHERE {where}" if where else ""), where_params or None)
                 result = cur.fetchone()
                 return result[0] if result else 0
         except Exception as e:
             print(f"Error getting row count for table {table_name}: {str(e)}")
             return 0
         
+    def get_table_size(self, table_name: str) -> Tuple[int, int]:
+        try:
+            with self.connection.cursor() as cur:
+                cur.execute(self._table_size_query(), (self.database, table_name))
+                result = cur.fetchone()
+                return (int(result[0] or 0), int(result[1] or 0)) if result else (0, 0)
+        except Exception as e:
+            print(f"Error estimating the size of table {table_name}: {str(e)}")
+            return 0, 0
+
+    def _table_size_query(self) -> str:
+        return """
+            SELECT TABLE_ROWS, DATA_LENGTH
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = %s
+            AND TABLE_NAME = %s
+        """
+
     def get_primary_key_columns(self, table_name: str) -> List[str]:
         try:
             with self.connection.cursor() as cur:
@@ -143,123 +115,260 @@ class SingleStoreConnector(Connector):
             print(f"Error getting primary key columns for table {table_name}: {str(e)}")
             return []
 
-    def read_table(self, table_name: str, interval: int, offset: int = 0, sort_column: str = "") -> pd.DataFrame:
+    def get_key_boundaries(self, table_name: str, key_columns: List[str], interval: int, where: str = "", where_params: Optional[List[Any]] = None) -> List[Tuple]:
         try:
-            start_time = time.time()
-            
+            key_list = ", ".join(f"`{column}`" for column in key_columns)
+            boundaries = []
+            after_key = None
+
             with self.connection.cursor() as cur:
-                # Get column names
-                cur.execute(f"SELECT * FROM {table_name} LIMIT 0")
-                columns = [desc[0] for desc in cur.description]
-                
-                query = f"""
-                    SELECT *
-                    FROM {table_name}
-                """
+                while True:
+                    query = f"SELECT {key_list} FROM {table_name}"
+                    query, params = self._boundary_query(query, key_columns, after_key, where, where_params)
+                    # Fetch the last key of this batch plus one more row to know whether another batch follows
+                    query += f" ORDER BY {key_list} LIMIT 2 OFFSET {interval - 1}"
 
-                if sort_column:
-                    query += f" ORDER BY {sort_column}"
+                    cur.execute(query, params)
+                    rows = cur.fetchall()
+                    if len(rows) < 2:
+                        break
+                    after_key = tuple(rows[0])
+                    boundaries.append(after_key)
 
-                query += f" LIMIT {interval} OFFSET {offset}"
+            return boundaries
+        except Exception as e:
+            print(f"Error getting key boundaries for table {table_name}: {str(e)}")
+            raise
 
-                query_start = time.time()
-                cur.execute(query)
-                rows = cur.fetchall()
-                query_time = time.time() - query_start
-                print(f"Query execution time: {query_time:.2f} seconds")
-                
-                # Create DataFrame directly from rows
-                df_start = time.time()
-                df = pd.DataFrame(rows, columns=columns)
-                df_time = time.time() - df_start
+    def get_key_range(self, table_name: str, column: str) -> Tuple[Any, Any]:
+        try:
+            with self.connection.cursor() as cur:
+                cur.execute(f"SELECT MIN(`{column}`), MAX(`{column}`) FROM {table_name}")
+                result = cur.fetchone()
+                return (result[0], result[1]) if result else (None, None)
+        except Exception as e:
+            print(f"Error getting key range for table {table_name}: {str(e)}")
+            raise
+
+    def get_key_quantiles(self, table_name: str, column: str, num_quantiles: int, sample_size: int) -> List[Any]:
+        try:
+            row_count = self.get_row_count(table_name)
+            if row_count == 0 or num_quantiles < 2:
+                return []
+            sample_rate = min(1.0, sample_size / row_count)
+
+            with self.connection.cursor() as cur:
+                cur.execute(f"SELECT `{column}` FROM {table_name} WHERE `{column}` IS NOT NULL AND RAND() < %s", (sample_rate,))
+                return self._quantiles([row[0] for row in cur.fetchall()], num_quantiles)
+        except Exception as e:
+            print(f"Error sampling quantiles for table {table_name}: {str(e)}")
+            raise
+
+    def get_range_checksum(self, table_name: str, columns: List[str], where: str = "", where_params: Optional[List[Any]] = None) -> Tuple[int, int]:
+        try:
+            with self.connection.cursor() as cur:
+                cur.execute(self._range_checksum_query(table_name, columns, where), where_params or None)
+                count, checksum = cur.fetchone()
+                return count, int(checksum or 0)
+        except Exception as e:
+            print(f"Error checksumming table {table_name}: {str(e)}")
+            raise
+
+    def get_row_checksums(self, table_name: str, columns: List[str], key_column: str, where: str = "", where_params: Optional[List[Any]] = None) -> List[Tuple[Any, int]]:
+        try:
+            with self.connection.cursor() as cur:
+                cur.execute(self._row_checksums_query(table_name, columns, key_column, where), where_params or None)
+                return [(key, int(checksum)) for key, checksum in cur.fetchall()]
+        except Exception as e:
+            print(f"Error checksumming rows of table {table_name}: {str(e)}")
+            raise
+
+    def _row_hash(self, columns: List[str]) -> str:
+        # CHAR(0) stands in for NULL, which CONCAT_WS would otherwise skip. The first 60 bits of the MD5 fit
+        # in an unsigned BIGINT and SUM over them widens to DECIMAL, so the range sum never overflows
+        values = ", ".join(f"IFNULL(CAST(`{column}` AS CHAR), CHAR(0))" for column in columns)
+        return f"CAST(CONV(SUBSTRING(MD5(CONCAT_WS('|', {values})), 1, 15), 16, 10) AS UNSIGNED)"
+
+    def _range_checksum_query(self, table_name: str, columns: List[str], where: str) -> str:
+        query = f"SELECT COUNT(*), SUM({self._row_hash(columns)}) FROM {table_name}"
+        if where:
+            query += f" WHERE {where}"
+        return query
+
+    def _row_checksums_query(self, table_name: str, columns: List[str], key_column: str, where: str) -> str:
+        query = f"SELECT `{key_column}`, {self._row_hash(columns)} FROM {table_name}"
+        if where:
+            query += f" WHERE {where}"
+        return query
+
+    def read_table(self, table_name: str, interval: int, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None) -> pd.DataFrame:
+        try:
+            table = self.read_table_arrow(table_name, interval, offset, sort_column, key_columns, after_key, where, where_params)
+
+            df_start = time.time()
+            df = table.to_pandas()
+            df_time = time.time() - df_start
+            metrics.observe("dataframe_conversion_seconds", df_time, table=table_name)
+            if Config.verbose:
                 print(f"DataFrame conversion time: {df_time:.2f} seconds")
-                
-                total_time = time.time() - start_time
-                print(f"Total execution time: {total_time:.2f} seconds")
-                return df
+            return df
         except Exception as e:
+            # An empty result would silently drop the rows, the caller decides whether to retry
             print(f"Error reading table {table_name}: {str(e)}")
-            return pd.DataFrame()  # Return empty DataFrame on error
-        
-    def write_table(self, table_name: str, df: pd.DataFrame) -> None:
+            raise
+
+    def read_table_arrow(self, table_name: str, interval: int, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None, plan: Optional[TransferPlan] = None) -> pa.Table:
+        start_time = time.time()
+        query, params = self._select_query(table_name, interval, offset, sort_column, key_columns, after_key, where, where_params, plan.column_names if plan else None)
+
+        with self.connection.cursor() as cur:
+            query_start = time.time()
+            cur.execute(query, params or None)
+            rows = cur.fetchall()
+            columns = [desc[0] for desc in cur.description]
+            query_time = time.time() - query_start
+            metrics.observe("source_query_seconds", query_time, table=table_name)
+
+        arrow_start = time.time()
+        table = pa.Table.from_batches([self._rows_to_record_batch(rows, columns, plan)])
+        arrow_time = time.time() - arrow_start
+        metrics.observe("arrow_conversion_seconds", arrow_time, table=table_name)
+
+        total_time = time.time() - start_time
+        if Config.verbose:
+            print(f"Read {table.num_rows:,} rows from {table_name}: query {query_time:.2f} seconds, Arrow conversion {arrow_time:.2f} seconds, total {total_time:.2f} seconds")
+        return table
+
+    def iter_batches(self, table_name: str, batch_rows: int, interval: int = 0, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None, plan: Optional[TransferPlan] = None) -> Iterator[pa.RecordBatch]:
+        query, params = self._select_query(table_name, interval, offset, sort_column, key_columns, after_key, where, where_params, plan.column_names if plan else None)
+
+        # An unbuffered cursor streams rows from the server instead of loading the whole result set into memory
+        with self.connection.cursor(pymysql.cursors.SSCursor) as cur:
+            query_start = time.time()
+            cur.execute(query, params or None)
+            metrics.observe("source_query_seconds", time.time() - query_start, table=table_name)
+            columns = [desc[0] for desc in cur.description]
+
+            while True:
+                fetch_start = time.time()
+                rows = cur.fetchmany(batch_rows)
+                metrics.observe("source_fetch_seconds", time.time() - fetch_start, table=table_name)
+                if not rows:
+                    break
+
+                with metrics.timer("arrow_conversion_seconds", table=table_name):
+                    batch = self._rows_to_record_batch(rows, columns, plan)
+                # Without a plan, later batches keep the types inferred for the first one
+                plan = plan or TransferPlan.from_arrow_schema(table_name, batch.schema)
+                yield batch
+
+    def write_table(self, table_name: str, df: pd.DataFrame, replace: bool = False) -> None:
         if df.empty:
             print(f"Warning: Empty DataFrame provided for table {table_name}")
             return
 
         try:
             start_time = time.time()
-            
-            # Get column names and create placeholders for SQL query
-            columns = df.columns.tolist()
-            placeholders = ', '.join(['%s'] * len(columns))
-            column_names = ', '.join(columns)
-            
-            # Prepare the insert query
-            query = f"INSERT INTO {table_name} ({column_names}) VALUES ({placeholders})"
-            
-            # Convert DataFrame to list of tuples for batch insertion
-            rows = df.to_records(index=False).tolist()
-            
-            with self.connection.cursor() as cur:
-                # Use executemany for batch insertion
-                cur.executemany(query, rows)
-                
-                total_time = time.time() - start_time
-                print(f"Inserted {len(df)} rows into {table_name} in {total_time:.2f} seconds")
-                
+            table = pa.Table.from_pandas(df, preserve_index=False)
+
+            if Config.bulk_load:
+                path = self._spool_parquet(table)
+                try:
+                    self.ingest_local_parquet(table_name, path, replace)
+                finally:
+                    os.unlink(path)
+                return
+
+            self._insert_table(table_name, table, replace)
+            self._print_load_throughput(table_name, table.num_rows, table.nbytes, "INSERT", time.time() - start_time)
         except Exception as e:
             print(f"Error writing to table {table_name}: {str(e)}")
             raise
 
+    def ingest_local_parquet(self, table_name: str, parquet_path: str, replace: bool = False) -> None:
+        try:
+            start_time = time.time()
+
+            method = "INSERT"
+            if Config.bulk_load:
+                try:
+                    schema = self.get_transfer_plan(table_name).table_schema
+                    with self.connection.cursor() as cur:
+                        cur.execute(self._load_data_query(table_name, schema, parquet_path, replace))
+                    method = "LOAD DATA"
+                except pymysql.err.MySQLError as e:
+                    print(f"Bulk load into {table_name} failed, falling back to INSERT: {str(e)}")
+
+            if method == "INSERT":
+                # Memory-map the file so its pages are read straight from the OS cache instead of copied into the heap
+                self._insert_table(table_name, pq.read_table(parquet_path, memory_map=True), replace)
+
+            num_rows = pq.read_metadata(parquet_path).num_rows
+            self._print_load_throughput(table_name, num_rows, os.path.getsize(parquet_path), method, time.time() - start_time)
+        except Exception as e:
+            print(f"Error ingesting {parquet_path} into table {table_name}: {str(e)}")
+            raise
+
+    def _insert_table(self, table_name: str, table: pa.Table, replace: bool = False) -> None:
+        # One transaction for every statement, so a load that fails halfway can be retried without duplicating rows
+        self.connection.begin()
+        try:
+            with self.connection.cursor() as cur:
+                for statement in self._insert_statements(cur, table_name, table, replace):
+                    cur.execute(statement)
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+
+    def _spool_parquet(self, table: pa.Table) -> str:
+        # LOAD DATA LOCAL INFILE streams the file from disk, so the batch is spooled to a temporary parquet file
+        with tempfile.NamedTemporaryFile(suffix=".parquet", delete=False) as f:
+            pq.write_table(table, f, compression="snappy")
+            return f.name
+
+    def _load_data_query(self, table_name: str, schema: Dict[str, str], file_path: str, replace: bool = False) -> str:
+        column_mapping_str, set_str = self._parquet_column_mapping(schema)
+        query = f"""
+        LOAD DATA LOCAL INFILE '{file_path}'
+        {"REPLACE " if replace else ""}INTO TABLE {table_name}
+        FORMAT PARQUET
+        (
+            {column_mapping_str}
+        )
+        """
+        if set_str:
+            query += f"\nSET {set_str}"
+        return query
+
+    def _insert_statements(self, cur: Any, table_name: str, table: pa.Table, replace: bool = False) -> Iterator[str]:
+        # Group rows into multi-row INSERTs without letting a statement grow past Config.max_statement_bytes
+        column_names = ', '.join(table.column_names)
+        placeholders = f"({', '.join(['%s'] * table.num_columns)})"
+        prefix = f"{'REPLACE' if replace else 'INSERT'} INTO {table_name} ({column_names}) VALUES "
+
+        values = []
+        size = len(prefix)
+        for row in zip(*(column.to_pylist() for column in table.columns)):
+            value = cur.mogrify(placeholders, row)
+            if values and size + len(value) + 1 > Config.max_statement_bytes:
+                yield prefix + ",".join(values)
+                values = []
+                size = len(prefix)
+            values.append(value)
+            size += len(value) + 1
+
+        if values:
+            yield prefix + ",".join(values)
+
     def ingest_parquet(self, table_name: str, parquet_path: str, aws_access_key_id: str, aws_secret_access_key: str) -> None:
         try:
-            # Extract job ID from the last path segment before .parquet
-            job_id = parquet_path.split("/*.parquet")[0].split("/")[-1]
-            print(f"Starting parquet ingestion for Job ID: {job_id}")
-            pipeline_name = f"es_{job_id.replace('-', '_')}_pipeline"
-            
-            # Get the table schema to map columns
-            schema = self.get_table_schema(table_name)
-            if not schema:
-                raise Exception(f"Could not get schema for table {table_name}")
+            pipeline_name = self._pipeline_name(parquet_path)
             
-            # Create column mappings for the pipeline
-            column_mappings = []
-            for column_name, column_type in schema.items():
-                if 'timestamp' in column_type.lower():
-                    # Handle timestamp columns specially
-                    column_mappings.append(f"@{column_name} <- {column_name}")
-                else:
-                    column_mappings.append(f"{column_name} <- {column_name}")
+            # The table's cached plan has the schema to map columns
+            schema = self.get_transfer_plan(table_name).table_schema
             
-            # Join column mappings with commas
-            column_mapping_str = ",\n    ".join(column_mappings)
-            
-            # Create the pipeline query
-            pipeline_query = f"""
-            CREATE OR REPLACE PIPELINE {pipeline_name}
-            AS LOAD DATA S3 '{parquet_path}'
-            CONFIG '{{"region": "us-west-2"}}'
-            CREDENTIALS '{{"aws_access_key_id": "{aws_access_key_id}", "aws_secret_access_key": "{aws_secret_access_key}"}}'
-            REPLACE INTO TABLE {table_name}
-            FORMAT PARQUET
-            (
-                {column_mapping_str}
-            )
-            """
-            
-            # Add timestamp conversions if needed
-            timestamp_sets = []
-            for column_name, column_type in schema.items():
-                if 'timestamp' in column_type.lower():
-                    timestamp_sets.append(
-                        f"{column_name} = FROM_UNIXTIME(@{column_name}/1000000)"
-                    )
-            
-            if timestamp_sets:
-                pipeline_query += f"\nSET {', '.join(timestamp_sets)};"
-            else:
-                pipeline_query += ";"
+            pipeline_query = self._pipeline_query(pipeline_name, table_name, schema, parquet_path, aws_access_key_id, aws_secret_access_key)
 
             print(f"Generated pipeline definition for {pipeline_name}")
             print(pipeline_query)
@@ -282,6 +391,119 @@ class SingleStoreConnector(Connector):
             print(f"Error creating pipeline for table {table_name}: {str(e)}")
             raise
 
+    def start_pipeline(self, table_name: str, parquet_path: str, aws_access_key_id: str, aws_secret_access_key: str) -> str:
+        try:
+            pipeline_name = self._pipeline_name(parquet_path)
+            schema = self.get_transfer_plan(table_name).table_schema
+            with self.connection.cursor() as cur:
+                cur.execute(self._pipeline_query(pipeline_name, table_name, schema, parquet_path, aws_access_key_id, aws_secret_access_key))
+                # Without FOREGROUND the pipeline keeps loading new files under the path until it is dropped
+                cur.execute(f"START PIPELINE {pipeline_name}")
+            print(f"Started pipeline {pipeline_name} in the background")
+            return pipeline_name
+        except Exception as e:
+            print(f"Error starting pipeline for table {table_name}: {str(e)}")
+            raise
+
+    def get_pipeline_progress(self, pipeline_name: str) -> Tuple[str, Dict[str, str]]:
+        with self.connection.cursor() as cur:
+            cur.execute(self._pipeline_state_query(), (self.database, pipeline_name))
+            result = cur.fetchone()
+            cur.execute(self._pipeline_files_query(), (self.database, pipeline_name))
+            files = cur.fetchall()
+        return (result[0] if result else ""), {file_name: file_state for file_name, file_state in files}
+
+    def get_pipeline_errors(self, pipeline_name: str, limit: int = 5) -> List[str]:
+        with self.connection.cursor() as cur:
+            cur.execute(self._pipeline_errors_query(), (self.database, pipeline_name, limit))
+            return [row[0] for row in cur.fetchall()]
+
+    def drop_pipeline(self, pipeline_name: str) -> None:
+        with self.connection.cursor() as cur:
+            cur.execute(f"DROP PIPELINE IF EXISTS {pipeline_name}")
+
+    def _pipeline_name(self, parquet_path: str) -> str:
+        # Extract job ID from the last path segment before .parquet
+        job_id = parquet_path.split("/*.parquet")[0].split("/")[-1]
+        print(f"Starting parquet ingestion for Job ID: {job_id}")
+        return f"es_{job_id.replace('-', '_')}_pipeline"
+
+    def _pipeline_state_query(self) -> str:
+        return """
+            SELECT STATE
+            FROM INFORMATION_SCHEMA.PIPELINES
+            WHERE DATABASE_NAME = %s
+            AND PIPELINE_NAME = %s
+        """
+
+    def _pipeline_files_query(self) -> str:
+        return """
+            SELECT FILE_NAME, FILE_STATE
+            FROM INFORMATION_SCHEMA.PIPELINES_FILES
+            WHERE DATABASE_NAME = %s
+            AND PIPELINE_NAME = %s
+        """
+
+    def _pipeline_errors_query(self) -> str:
+        return """
+            SELECT ERROR_MESSAGE
+            FROM INFORMATION_SCHEMA.PIPELINES_ERRORS
+            WHERE DATABASE_NAME = %s
+            AND PIPELINE_NAME = %s
+            ORDER BY ERROR_UNIX_TIMESTAMP DESC
+            LIMIT %s
+        """
+
+    def _parquet_column_mapping(self, schema: Dict[str, str]) -> Tuple[str, str]:
+        # Create column mappings for pipelines and LOAD DATA
+        column_mappings = []
+        for column_name, column_type in schema.items():
+            if 'timestamp' in column_type.lower():
+                # Handle timestamp columns specially
+                column_mappings.append(f"@{column_name} <- {column_name}")
+            else:
+                column_mappings.append(f"{column_name} <- {column_name}")
+        
+        # Join column mappings with commas
+        column_mapping_str = ",\n    ".join(column_mappings)
+        
+        # Add timestamp conversions if needed
+        timestamp_sets = []
+        for column_name, column_type in schema.items():
+            if 'timestamp' in column_type.lower():
+                timestamp_sets.append(
+                    f"{column_name} = FROM_UNIXTIME(@{column_name}/1000000)"
+                )
+        
+        return column_mapping_str, ', '.join(timestamp_sets)
+
+    def _pipeline_query(self, pipeline_name: str, table_name: str, schema: Dict[str, str], parquet_path: str, aws_access_key_id: str, aws_secret_access_key: str) -> str:
+        column_mapping_str, set_str = self._parquet_column_mapping(schema)
+        s3_config = {"region": Config.s3_region}
+        if Config.s3_endpoint_url:
+            # Read from the same S3 compatible store the files were uploaded to
+            s3_config["endpoint_url"] = Config.s3_endpoint_url
+        
+        # Create the pipeline query
+        pipeline_query = f"""
+        CREATE OR REPLACE PIPELINE {pipeline_name}
+        AS LOAD DATA S3 '{parquet_path}'
+        CONFIG '{json.dumps(s3_config)}'
+        CREDENTIALS '{{"aws_access_key_id": "{aws_access_key_id}", "aws_secret_access_key": "{aws_secret_access_key}"}}'
+        REPLACE INTO TABLE {table_name}
+        FORMAT PARQUET
+        (
+            {column_mapping_str}
+        )
+        """
+        
+        if set_str:
+            pipeline_query += f"\nSET {set_str};"
+        else:
+            pipeline_query += ";"
+
+        return pipeline_query
+
     def delete_table(self, table_name: str) -> None:
         try:
             with self.connection.cursor() as cur:
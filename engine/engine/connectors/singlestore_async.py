@@ -0,0 +1,368 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import aiomysql
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pymysql
+import time
+
+from engine.config.config import Config
+from engine.connectors.singlestore import SingleStoreConnector
+from engine.services.metrics import metrics
+from engine.services.transfer import TransferPlan, plans
+
+class AsyncSingleStoreConnector(SingleStoreConnector):
+    """
+    SingleStore connector backed by an aiomysql connection pool, so a single event
+    loop can run many reads and writes concurrently. Query building and type mapping
+    are shared with SingleStoreConnector, only the I/O methods are coroutines here.
+    With a `pool_size` of 1 it holds a single plain connection instead, the way
+    ConnectorPool hands connectors out one connection at a time
+    """
+    def __init__(self, host: str, port: int, user: str, password: str, database: str, pool_size: int = 10):
+        super().__init__(host, port, user, password, database)
+        self.pool_size = pool_size
+        self.pool = None
+        self.connection = None
+        # A plain connection runs one statement or streamed result at a time
+        self._connection_lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        settings = dict(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            db=self.database,
+            autocommit=True,
+            local_infile=Config.bulk_load
+        )
+        if self.pool_size == 1:
+            self.connection = await aiomysql.connect(**settings)
+        else:
+            self.pool = await aiomysql.create_pool(minsize=1, maxsize=self.pool_size, **settings)
+
+    async def disconnect(self) -> None:
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+        if self.pool:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    @asynccontextmanager
+    async def _acquire(self) -> AsyncIterator[aiomysql.Connection]:
+        if self.pool is not None:
+            async with self.pool.acquire() as conn:
+                yield conn
+            return
+        async with self._connection_lock:
+            yield self.connection
+
+    async def _fetchall(self, query: str, params: Optional[Any] = None) -> List[Tuple]:
+        async with self._acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(query, params)
+                return await cur.fetchall()
+
+    async def _execute(self, query: str, params: Optional[Any] = None) -> None:
+        async with self._acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(query, params)
+
+    async def test_connection(self) -> bool:
+        try:
+            await self._fetchall("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    async def get_tables(self) -> List[str]:
+        try:
+            tables = await self._fetchall("SHOW TABLES")
+            return [table[0] for table in tables]
+        except Exception as e:
+            print(f"Error getting tables: {str(e)}")
+            return []
+
+    async def get_table_schema(self, table_name: str) -> Dict[str, str]:
+        try:
+            columns = await self._fetchall(f"DESCRIBE `{table_name}`")
+            return {col[0]: col[1] for col in columns}
+        except Exception as e:
+            print(f"Error getting schema for table {table_name}: {str(e)}")
+            return {}
+
+    async def get_transfer_plan(self, table_name: str, table_schema: Optional[Dict[str, str]] = None) -> TransferPlan:
+        if table_schema is None:
+            plan = plans.latest(self._plan_key(table_name))
+            if plan is not None:
+                return plan
+            table_schema = await self.get_table_schema(table_name)
+        return self._plan_for(table_name, table_schema)
+
+    async def get_row_count(self, table_name: str, where: str = "", where_params: Optional[List[Any]] = None) -> int:
+        try:
+            rows = await self._fetchall(f"SELECT COUNT(*) FROM {table_name}" + (f" WHERE {where}" if where else ""), where_params or None)
+            return rows[0][0] if rows else 0
+        except Exception as e:
+            print(f"Error getting row count for table {table_name}: {str(e)}")
+            return 0
+
+    async def get_table_size(self, table_name: str) -> Tuple[int, int]:
+        try:
+            rows = await self._fetchall(self._table_size_query(), (self.database, table_name))
+            return (int(rows[0][0] or 0), int(rows[0][1] or 0)) if rows else (0, 0)
+        except Exception as e:
+            print(f"Error estimating the size of table {table_name}: {str(e)}")
+            return 0, 0
+
+    async def get_primary_key_columns(self, table_name: str) -> List[str]:
+        try:
+            columns = await self._fetchall("""
+                SELECT COLUMN_NAME
+                FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+                WHERE TABLE_SCHEMA = %s
+                AND TABLE_NAME = %s
+                AND CONSTRAINT_NAME = 'PRIMARY'
+                ORDER BY ORDINAL_POSITION
+            """, (self.database, table_name))
+            return [col[0] for col in columns]
+        except Exception as e:
+            print(f"Error getting primary key columns for table {table_name}: {str(e)}")
+            return []
+
+    async def get_key_boundaries(self, table_name: str, key_columns: List[str], interval: int, where: str = "", where_params: Optional[List[Any]] = None) -> List[Tuple]:
+        try:
+            key_list = ", ".join(f"`{column}`" for column in key_columns)
+            boundaries = []
+            after_key = None
+
+            while True:
+                query = f"SELECT {key_list} FROM {table_name}"
+                query, params = self._boundary_query(query, key_columns, after_key, where, where_params)
+                # Fetch the last key of this batch plus one more row to know whether another batch follows
+                query += f" ORDER BY {key_list} LIMIT 2 OFFSET {interval - 1}"
+
+                rows = await self._fetchall(query, params)
+                if len(rows) < 2:
+                    break
+                after_key = tuple(rows[0])
+                boundaries.append(after_key)
+
+            return boundaries
+        except Exception as e:
+            print(f"Error getting key boundaries for table {table_name}: {str(e)}")
+            raise
+
+    async def get_key_range(self, table_name: str, column: str) -> Tuple[Any, Any]:
+        try:
+            rows = await self._fetchall(f"SELECT MIN(`{column}`), MAX(`{column}`) FROM {table_name}")
+            return (rows[0][0], rows[0][1]) if rows else (None, None)
+        except Exception as e:
+            print(f"Error getting key range for table {table_name}: {str(e)}")
+            raise
+
+    async def get_key_quantiles(self, table_name: str, column: str, num_quantiles: int, sample_size: int) -> List[Any]:
+        try:
+            row_count = await self.get_row_count(table_name)
+            if row_count == 0 or num_quantiles < 2:
+                return []
+            sample_rate = min(1.0, sample_size / row_count)
+
+            rows = await self._fetchall(f"SELECT `{column}` FROM {table_name} WHERE `{column}` IS NOT NULL AND RAND() < %s", (sample_rate,))
+            return self._quantiles([row[0] for row in rows], num_quantiles)
+        except Exception as e:
+            print(f"Error sampling quantiles for table {table_name}: {str(e)}")
+            raise
+
+    async def get_range_checksum(self, table_name: str, columns: List[str], where: str = "", where_params: Optional[List[Any]] = None) -> Tuple[int, int]:
+        try:
+            rows = await self._fetchall(self._range_checksum_query(table_name, columns, where), where_params or None)
+            count, checksum = rows[0]
+            return count, int(checksum or 0)
+        except Exception as e:
+            print(f"Error checksumming table {table_name}: {str(e)}")
+            raise
+
+    async def get_row_checksums(self, table_name: str, columns: List[str], key_column: str, where: str = "", where_params: Optional[List[Any]] = None) -> List[Tuple[Any, int]]:
+        try:
+            rows = await self._fetchall(self._row_checksums_query(table_name, columns, key_column, where), where_params or None)
+            return [(key, int(checksum)) for key, checksum in rows]
+        except Exception as e:
+            print(f"Error checksumming rows of table {table_name}: {str(e)}")
+            raise
+
+    async def read_table(self, table_name: str, interval: int, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None) -> pd.DataFrame:
+        try:
+            table = await self.read_table_arrow(table_name, interval, offset, sort_column, key_columns, after_key, where, where_params)
+            return await asyncio.to_thread(table.to_pandas)
+        except Exception as e:
+            print(f"Error reading table {table_name}: {str(e)}")
+            raise
+
+    async def read_table_arrow(self, table_name: str, interval: int, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None, plan: Optional[TransferPlan] = None) -> pa.Table:
+        start_time = time.time()
+        query, params = self._select_query(table_name, interval, offset, sort_column, key_columns, after_key, where, where_params, plan.column_names if plan else None)
+
+        async with self._acquire() as conn:
+            async with conn.cursor() as cur:
+                query_start = time.time()
+                await cur.execute(query, params or None)
+                rows = await cur.fetchall()
+                columns = [desc[0] for desc in cur.description]
+                query_time = time.time() - query_start
+                metrics.observe("source_query_seconds", query_time, table=table_name)
+
+        with metrics.timer("arrow_conversion_seconds", table=table_name):
+            batch = await asyncio.to_thread(self._rows_to_record_batch, rows, columns, plan)
+        total_time = time.time() - start_time
+        if Config.verbose:
+            print(f"Read {batch.num_rows:,} rows from {table_name}: query {query_time:.2f} seconds, total {total_time:.2f} seconds")
+        return pa.Table.from_batches([batch])
+
+    async def iter_batches(self, table_name: str, batch_rows: int, interval: int = 0, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None, plan: Optional[TransferPlan] = None) -> AsyncIterator[pa.RecordBatch]:
+        query, params = self._select_query(table_name, interval, offset, sort_column, key_columns, after_key, where, where_params, plan.column_names if plan else None)
+
+        # An unbuffered cursor streams rows from the server instead of loading the whole result set into memory
+        async with self._acquire() as conn:
+            async with conn.cursor(aiomysql.SSCursor) as cur:
+                query_start = time.time()
+                await cur.execute(query, params or None)
+                metrics.observe("source_query_seconds", time.time() - query_start, table=table_name)
+                columns = [desc[0] for desc in cur.description]
+
+                while True:
+                    fetch_start = time.time()
+                    rows = await cur.fetchmany(batch_rows)
+                    metrics.observe("source_fetch_seconds", time.time() - fetch_start, table=table_name)
+                    if not rows:
+                        break
+
+                    # Building the arrays is CPU bound, keep it off the event loop
+                    with metrics.timer("arrow_conversion_seconds", table=table_name):
+                        batch = await asyncio.to_thread(self._rows_to_record_batch, rows, columns, plan)
+                    # Without a plan, later batches keep the types inferred for the first one
+                    plan = plan or TransferPlan.from_arrow_schema(table_name, batch.schema)
+                    yield batch
+
+    async def write_table(self, table_name: str, df: pd.DataFrame, replace: bool = False) -> None:
+        if df.empty:
+            print(f"Warning: Empty DataFrame provided for table {table_name}")
+            return
+
+        try:
+            start_time = time.time()
+            table = await asyncio.to_thread(pa.Table.from_pandas, df, preserve_index=False)
+
+            if Config.bulk_load:
+                path = await asyncio.to_thread(self._spool_parquet, table)
+                try:
+                    await self.ingest_local_parquet(table_name, path, replace)
+                finally:
+                    os.unlink(path)
+                return
+
+            await self._insert_table(table_name, table, replace)
+            self._print_load_throughput(table_name, table.num_rows, table.nbytes, "INSERT", time.time() - start_time)
+        except Exception as e:
+            print(f"Error writing to table {table_name}: {str(e)}")
+            raise
+
+    async def ingest_local_parquet(self, table_name: str, parquet_path: str, replace: bool = False) -> None:
+        try:
+            start_time = time.time()
+
+            method = "INSERT"
+            if Config.bulk_load:
+                try:
+                    schema = (await self.get_transfer_plan(table_name)).table_schema
+                    await self._execute(self._load_data_query(table_name, schema, parquet_path, replace))
+                    method = "LOAD DATA"
+                except pymysql.err.MySQLError as e:
+                    print(f"Bulk load into {table_name} failed, falling back to INSERT: {str(e)}")
+
+            if method == "INSERT":
+                # Memory-map the file so its pages are read straight from the OS cache instead of copied into the heap
+                table = await asyncio.to_thread(pq.read_table, parquet_path, memory_map=True)
+                await self._insert_table(table_name, table, replace)
+
+            num_rows = pq.read_metadata(parquet_path).num_rows
+            self._print_load_throughput(table_name, num_rows, os.path.getsize(parquet_path), method, time.time() - start_time)
+        except Exception as e:
+            print(f"Error ingesting {parquet_path} into table {table_name}: {str(e)}")
+            raise
+
+    async def _insert_table(self, table_name: str, table: pa.Table, replace: bool = False) -> None:
+        async with self._acquire() as conn:
+            # One transaction for every statement, so a load that fails halfway can be retried without duplicating rows
+            await conn.begin()
+            try:
+                async with conn.cursor() as cur:
+                    for statement in self._insert_statements(cur, table_name, table, replace):
+                        await cur.execute(statement)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+
+    async def ingest_parquet(self, table_name: str, parquet_path: str, aws_access_key_id: str, aws_secret_access_key: str) -> None:
+        try:
+            pipeline_name = self._pipeline_name(parquet_path)
+
+            # The table's cached plan has the schema to map columns
+            schema = (await self.get_transfer_plan(table_name)).table_schema
+
+            pipeline_query = self._pipeline_query(pipeline_name, table_name, schema, parquet_path, aws_access_key_id, aws_secret_access_key)
+            print(f"Generated pipeline definition for {pipeline_name}")
+            print(pipeline_query)
+
+            start_time = time.time()
+            async with self._acquire() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(pipeline_query)
+                    await cur.execute(f"START PIPELINE {pipeline_name} FOREGROUND")
+
+                    elapsed_time = time.time() - start_time
+                    print(f"Successfully ingested in {elapsed_time:.2f} seconds")
+
+                    await cur.execute(f"DROP PIPELINE {pipeline_name}")
+        except Exception as e:
+            print(f"Error creating pipeline for table {table_name}: {str(e)}")
+            raise
+
+    async def start_pipeline(self, table_name: str, parquet_path: str, aws_access_key_id: str, aws_secret_access_key: str) -> str:
+        try:
+            pipeline_name = self._pipeline_name(parquet_path)
+            schema = (await self.get_transfer_plan(table_name)).table_schema
+            await self._execute(self._pipeline_query(pipeline_name, table_name, schema, parquet_path, aws_access_key_id, aws_secret_access_key))
+            # Without FOREGROUND the pipeline keeps loading new files under the path until it is dropped
+            await self._execute(f"START PIPELINE {pipeline_name}")
+            print(f"Started pipeline {pipeline_name} in the background")
+            return pipeline_name
+        except Exception as e:
+            print(f"Error starting pipeline for table {table_name}: {str(e)}")
+            raise
+
+    async def get_pipeline_progress(self, pipeline_name: str) -> Tuple[str, Dict[str, str]]:
+        rows = await self._fetchall(self._pipeline_state_query(), (self.database, pipeline_name))
+        files = await self._fetchall(self._pipeline_files_query(), (self.database, pipeline_name))
+        return (rows[0][0] if rows else ""), {file_name: file_state for file_name, file_state in files}
+
+    async def get_pipeline_errors(self, pipeline_name: str, limit: int = 5) -> List[str]:
+        rows = await self._fetchall(self._pipeline_errors_query(), (self.database, pipeline_name, limit))
+        return [row[0] for row in rows]
+
+    async def drop_pipeline(self, pipeline_name: str) -> None:
+        await self._execute(f"DROP PIPELINE IF EXISTS {pipeline_name}")
+
+    async def delete_table(self, table_name: str) -> None:
+        try:
+            await self._execute(f"DELETE FROM {table_name}")
+        except Exception as e:
+            print(f"Error deleting from table {table_name}: {str(e)}")
+            raise
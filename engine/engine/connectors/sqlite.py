@@ -0,0 +1,337 @@
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import hashlib
+import sqlite3
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import os
+import time
+
+from engine.connectors.connector import Connector
+from engine.connectors.dialect import MySQLDialect
+from engine.services.metrics import metrics
+from engine.services.transfer import TransferPlan
+
+class _RangeChecksum:
+    """SQLite aggregate summing the same 60-bit MD5 row hashes as SingleStoreConnector._row_hash"""
+    def __init__(self):
+        self.total = 0
+
+    def step(self, *values: Any) -> None:
+        self.total += _row_hash(*values)
+
+    def finalize(self) -> str:
+        # SQLite integers are 64-bit, return the sum as text so it can't overflow
+        return str(self.total)
+
+def _row_hash(*values: Any) -> int:
+    row = "|".join("\0" if value is None else str(value) for value in values)
+    return int(hashlib.md5(row.encode()).hexdigest()[:15], 16)
+
+class SQLiteConnector(MySQLDialect, Connector):
+    """
+    Connector for a local SQLite database file, used as a stand-in source and
+    destination for benchmarks. Tables declare MySQL style column types so the
+    type mapping and MySQL dialect query building, which SQLite accepts, are
+    shared with SingleStoreConnector; only the I/O differs. It can't ingest from
+    S3, jobs into SQLite load the exported files from Config.local_dir
+    """
+    def __init__(self, host: str, port: int, user: str, password: str, database: str):
+        # `database` is the path of the SQLite file, the other settings are unused
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.database = database
+        self.connection = None
+
+    def connect(self) -> None:
+        self.connection = sqlite3.connect(
+            self.database,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            isolation_level=None,
+            check_same_thread=False,
+            # Concurrent loads take turns on the write lock instead of failing
+            timeout=300
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.create_function("row_hash", -1, _row_hash, deterministic=True)
+        self.connection.create_aggregate("range_checksum", -1, _RangeChecksum)
+
+    def disconnect(self) -> None:
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def _execute(self, query: str, params: Optional[Any] = None) -> sqlite3.Cursor:
+        # Queries are built with the pymysql placeholder style
+        return self.connection.execute(query.replace("%s", "?"), tuple(params or ()))
+
+    def test_connection(self) -> bool:
+        try:
+            self._execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def get_tables(self) -> List[str]:
+        try:
+            rows = self._execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name").fetchall()
+            return [row[0] for row in rows]
+        except Exception as e:
+            print(f"Error getting tables: {str(e)}")
+            return []
+
+    def get_table_schema(self, table_name: str) -> Dict[str, str]:
+        try:
+            rows = self._execute(f"PRAGMA table_info(`{table_name}`)").fetchall()
+            return {row[1]: row[2].lower() for row in rows}
+        except Exception as e:
+            print(f"Error getting schema for table {table_name}: {str(e)}")
+            return {}
+
+    def get_row_count(self, table_name: str, where: str = "", where_params: Optional[List[Any]] = None) -> int:
+        try:
+            query = f"SELECT COUNT(*) FROM {table_name}" + (f" WHERE {where}" if where else "")
+            return self._execute(query, where_params).fetchone()[0]
+        except Exception as e:
+            print(f"Error getting row count for table {table_name}: {str(e)}")
+            return 0
+
+    def get_table_size(self, table_name: str) -> Tuple[int, int]:
+        try:
+            # Called explicitly so the async subclass reuses the blocking implementations on its worker thread
+            num_rows = SQLiteConnector.get_row_count(self, table_name)
+            page_size = self._execute("PRAGMA page_size").fetchone()[0]
+            try:
+                num_bytes = self._execute("SELECT SUM(pgsize) FROM dbstat WHERE name = %s", (table_name,)).fetchone()[0] or 0
+            except sqlite3.OperationalError:
+                # Without the dbstat table, split the file size evenly between the tables
+                page_count = self._execute("PRAGMA page_count").fetchone()[0]
+                num_bytes = page_count * page_size // max(len(SQLiteConnector.get_tables(self)), 1)
+            return num_rows, num_bytes
+        except Exception as e:
+            print(f"Error estimating the size of table {table_name}: {str(e)}")
+            return 0, 0
+
+    def get_primary_key_columns(self, table_name: str) -> List[str]:
+        try:
+            rows = self._execute(f"PRAGMA table_info(`{table_name}`)").fetchall()
+            return [row[1] for row in sorted(rows, key=lambda row: row[5]) if row[5]]
+        except Exception as e:
+            print(f"Error getting primary key columns for table {table_name}: {str(e)}")
+            return []
+
+    def get_key_boundaries(self, table_name: str, key_columns: List[str], interval: int, where: str = "", where_params: Optional[List[Any]] = None) -> List[Tuple]:
+        try:
+            key_list = ", ".join(f"`{column}`" for column in key_columns)
+            boundaries = []
+            after_key = None
+
+            while True:
+                query = f"SELECT {key_list} FROM {table_name}"
+                query, params = self._boundary_query(query, key_columns, after_key, where, where_params)
+                query += f" ORDER BY {key_list} LIMIT 2 OFFSET {interval - 1}"
+
+                rows = self._execute(query, params).fetchall()
+                if len(rows) < 2:
+                    break
+                after_key = tuple(rows[0])
+                boundaries.append(after_key)
+
+            return boundaries
+        except Exception as e:
+            print(f"Error getting key boundaries for table {table_name}: {str(e)}")
+            raise
+
+    def get_key_range(self, table_name: str, column: str) -> Tuple[Any, Any]:
+        try:
+            row = self._execute(f"SELECT MIN(`{column}`), MAX(`{column}`) FROM {table_name}").fetchone()
+            return (row[0], row[1]) if row else (None, None)
+        except Exception as e:
+            print(f"Error getting key range for table {table_name}: {str(e)}")
+            raise
+
+    def get_key_quantiles(self, table_name: str, column: str, num_quantiles: int, sample_size: int) -> List[Any]:
+        try:
+            row_count = SQLiteConnector.get_row_count(self, table_name)
+            if row_count == 0 or num_quantiles < 2:
+                return []
+            # RANDOM() is a signed 64-bit integer, keep rows whose value falls in the sampled fraction
+            threshold = min(int(sample_size / row_count * 2 ** 63), 2 ** 63 - 1)
+            rows = self._execute(f"SELECT `{column}` FROM {table_name} WHERE `{column}` IS NOT NULL AND ABS(RANDOM()) < %s", (threshold,)).fetchall()
+            return self._quantiles([row[0] for row in rows], num_quantiles)
+        except Exception as e:
+            print(f"Error sampling quantiles for table {table_name}: {str(e)}")
+            raise
+
+    def get_range_checksum(self, table_name: str, columns: List[str], where: str = "", where_params: Optional[List[Any]] = None) -> Tuple[int, int]:
+        try:
+            column_list = ", ".join(f"`{column}`" for column in columns)
+            query = f"SELECT COUNT(*), range_checksum({column_list}) FROM {table_name}" + (f" WHERE {where}" if where else "")
+            count, checksum = self._execute(query, where_params).fetchone()
+            return count, int(checksum or 0)
+        except Exception as e:
+            print(f"Error checksumming table {table_name}: {str(e)}")
+            raise
+
+    def get_row_checksums(self, table_name: str, columns: List[str], key_column: str, where: str = "", where_params: Optional[List[Any]] = None) -> List[Tuple[Any, int]]:
+        try:
+            column_list = ", ".join(f"`{column}`" for column in columns)
+            query = f"SELECT `{key_column}`, row_hash({column_list}) FROM {table_name}" + (f" WHERE {where}" if where else "")
+            return [(key, int(checksum)) for key, checksum in self._execute(query, where_params).fetchall()]
+        except Exception as e:
+            print(f"Error checksumming rows of table {table_name}: {str(e)}")
+            raise
+
+    def read_table(self, table_name: str, interval: int, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None) -> pd.DataFrame:
+        try:
+            return SQLiteConnector.read_table_arrow(self, table_name, interval, offset, sort_column, key_columns, after_key, where, where_params).to_pandas()
+        except Exception as e:
+            print(f"Error reading table {table_name}: {str(e)}")
+            raise
+
+    def read_table_arrow(self, table_name: str, interval: int, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None, plan: Optional[TransferPlan] = None) -> pa.Table:
+        batches = list(SQLiteConnector.iter_batches(self, table_name, 0, interval, offset, sort_column, key_columns, after_key, where, where_params, plan))
+        if not batches:
+            return pa.table({}) if plan is None else plan.arrow_schema.empty_table()
+        return pa.Table.from_batches(batches)
+
+    def iter_batches(self, table_name: str, batch_rows: int, interval: int = 0, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None, plan: Optional[TransferPlan] = None) -> Iterator[pa.RecordBatch]:
+        query, params = self._select_query(table_name, interval, offset, sort_column, key_columns, after_key, where, where_params, plan.column_names if plan else None)
+
+        query_start = time.time()
+        cur = self._execute(query, params)
+        metrics.observe("source_query_seconds", time.time() - query_start, table=table_name)
+        columns = [desc[0] for desc in cur.description]
+
+        while True:
+            fetch_start = time.time()
+            rows = cur.fetchmany(batch_rows) if batch_rows else cur.fetchall()
+            metrics.observe("source_fetch_seconds", time.time() - fetch_start, table=table_name)
+            if not rows:
+                break
+
+            with metrics.timer("arrow_conversion_seconds", table=table_name):
+                batch = self._rows_to_record_batch(rows, columns, plan)
+            plan = plan or TransferPlan.from_arrow_schema(table_name, batch.schema)
+            yield batch
+            if not batch_rows:
+                break
+
+    def write_table(self, table_name: str, df: pd.DataFrame, replace: bool = False) -> None:
+        if df.empty:
+            print(f"Warning: Empty DataFrame provided for table {table_name}")
+            return
+
+        try:
+            start_time = time.time()
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self._insert_table(table_name, table, replace)
+            self._print_load_throughput(table_name, table.num_rows, table.nbytes, "INSERT", time.time() - start_time)
+        except Exception as e:
+            print(f"Error writing to table {table_name}: {str(e)}")
+            raise
+
+    def ingest_local_parquet(self, table_name: str, parquet_path: str, replace: bool = False) -> None:
+        try:
+            start_time = time.time()
+            parquet_file = pq.ParquetFile(parquet_path, memory_map=True)
+            for row_group in range(parquet_file.num_row_groups):
+                self._insert_table(table_name, parquet_file.read_row_group(row_group), replace)
+            self._print_load_throughput(table_name, parquet_file.metadata.num_rows, os.path.getsize(parquet_path), "INSERT", time.time() - start_time)
+        except Exception as e:
+            print(f"Error ingesting {parquet_path} into table {table_name}: {str(e)}")
+            raise
+
+    def _insert_table(self, table_name: str, table: pa.Table, replace: bool = False) -> None:
+        column_names = ", ".join(f"`{column}`" for column in table.column_names)
+        placeholders = ", ".join(["?"] * table.num_columns)
+        statement = f"{'REPLACE' if replace else 'INSERT'} INTO {table_name} ({column_names}) VALUES ({placeholders})"
+        rows = zip(*(column.to_pylist() for column in table.columns))
+        # One transaction per table instead of one per row
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(statement, rows)
+
+    def delete_table(self, table_name: str) -> None:
+        try:
+            self._execute(f"DELETE FROM {table_name}")
+        except Exception as e:
+            print(f"Error deleting from table {table_name}: {str(e)}")
+            raise
+
+class AsyncSQLiteConnector(SQLiteConnector):
+    """
+    SQLiteConnector with coroutine I/O methods, running each call on a worker
+    thread so it can stand in for AsyncSingleStoreConnector in JobService
+    """
+    def __init__(self, host: str, port: int, user: str, password: str, database: str, pool_size: int = 1):
+        super().__init__(host, port, user, password, database)
+
+    async def connect(self) -> None:
+        await asyncio.to_thread(super().connect)
+
+    async def disconnect(self) -> None:
+        await asyncio.to_thread(super().disconnect)
+
+    async def test_connection(self) -> bool:
+        return await asyncio.to_thread(super().test_connection)
+
+    async def get_tables(self) -> List[str]:
+        return await asyncio.to_thread(super().get_tables)
+
+    async def get_table_schema(self, table_name: str) -> Dict[str, str]:
+        return await asyncio.to_thread(super().get_table_schema, table_name)
+
+    async def get_transfer_plan(self, table_name: str, table_schema: Optional[Dict[str, str]] = None) -> TransferPlan:
+        return await asyncio.to_thread(super().get_transfer_plan, table_name, table_schema)
+
+    async def get_row_count(self, table_name: str, where: str = "", where_params: Optional[List[Any]] = None) -> int:
+        return await asyncio.to_thread(super().get_row_count, table_name, where, where_params)
+
+    async def get_table_size(self, table_name: str) -> Tuple[int, int]:
+        return await asyncio.to_thread(super().get_table_size, table_name)
+
+    async def get_primary_key_columns(self, table_name: str) -> List[str]:
+        return await asyncio.to_thread(super().get_primary_key_columns, table_name)
+
+    async def get_key_boundaries(self, table_name: str, key_columns: List[str], interval: int, where: str = "", where_params: Optional[List[Any]] = None) -> List[Tuple]:
+        return await asyncio.to_thread(super().get_key_boundaries, table_name, key_columns, interval, where, where_params)
+
+    async def get_key_range(self, table_name: str, column: str) -> Tuple[Any, Any]:
+        return await asyncio.to_thread(super().get_key_range, table_name, column)
+
+    async def get_key_quantiles(self, table_name: str, column: str, num_quantiles: int, sample_size: int) -> List[Any]:
+        return await asyncio.to_thread(super().get_key_quantiles, table_name, column, num_quantiles, sample_size)
+
+    async def get_range_checksum(self, table_name: str, columns: List[str], where: str = "", where_params: Optional[List[Any]] = None) -> Tuple[int, int]:
+        return await asyncio.to_thread(super().get_range_checksum, table_name, columns, where, where_params)
+
+    async def get_row_checksums(self, table_name: str, columns: List[str], key_column: str, where: str = "", where_params: Optional[List[Any]] = None) -> List[Tuple[Any, int]]:
+        return await asyncio.to_thread(super().get_row_checksums, table_name, columns, key_column, where, where_params)
+
+    async def read_table(self, table_name: str, interval: int, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None) -> pd.DataFrame:
+        return await asyncio.to_thread(super().read_table, table_name, interval, offset, sort_column, key_columns, after_key, where, where_params)
+
+    async def read_table_arrow(self, table_name: str, interval: int, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None, plan: Optional[TransferPlan] = None) -> pa.Table:
+        return await asyncio.to_thread(super().read_table_arrow, table_name, interval, offset, sort_column, key_columns, after_key, where, where_params, plan)
+
+    async def iter_batches(self, table_name: str, batch_rows: int, interval: int = 0, offset: int = 0, sort_column: str = "", key_columns: Optional[List[str]] = None, after_key: Optional[Tuple] = None, where: str = "", where_params: Optional[List[Any]] = None, plan: Optional[TransferPlan] = None) -> AsyncIterator[pa.RecordBatch]:
+        batches = super().iter_batches(table_name, batch_rows, interval, offset, sort_column, key_columns, after_key, where, where_params, plan)
+        while True:
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            yield batch
+
+    async def write_table(self, table_name: str, df: pd.DataFrame, replace: bool = False) -> None:
+        await asyncio.to_thread(super().write_table, table_name, df, replace)
+
+    async def ingest_local_parquet(self, table_name: str, parquet_path: str, replace: bool = False) -> None:
+        await asyncio.to_thread(super().ingest_local_parquet, table_name, parquet_path, replace)
+
+    async def delete_table(self, table_name: str) -> None:
+        await asyncio.to_thread(super().delete_table, table_name)
@@ -0,0 +1,116 @@
+from typing import Dict, Optional
+import re
+
+# Arrow bytes per value of fixed width column types
+FIXED_WIDTHS = {
+    "tinyint": 1,
+    "bool": 1,
+    "boolean": 1,
+    "smallint": 2,
+    "year": 2,
+    "mediumint": 4,
+    "int": 4,
+    "integer": 4,
+    "float": 4,
+    "date": 4,
+    "bigint": 8,
+    "double": 8,
+    "real": 8,
+    "bit": 8,
+    "datetime": 8,
+    "timestamp": 8,
+    "time": 8,
+    "decimal": 16
+}
+
+# Assumed average width of variable length types without a declared length
+VARIABLE_WIDTHS = {
+    "tinytext": 128,
+    "tinyblob": 128,
+    "text": 1024,
+    "blob": 1024,
+    "json": 1024,
+    "mediumtext": 16 * 1024,
+    "mediumblob": 16 * 1024,
+    "longtext": 64 * 1024,
+    "longblob": 64 * 1024
+}
+
+DEFAULT_WIDTH = 16
+
+MIN_BATCH_ROWS = 10000
+MAX_BATCH_ROWS = 50000000
+MIN_STREAM_ROWS = 1000
+MAX_STREAM_ROWS = 1000000
+
+def estimate_row_bytes(table_schema: Dict[str, str]) -> int:
+    """
+    Estimate the Arrow bytes of a row from the declared column types, counting
+    strings with a declared length as half full
+    """
+    row_bytes = 0
+    for column_type in table_schema.values():
+        match = re.match(r"\s*(\w+)(?:\((\d+))?", column_type.lower())
+        if not match:
+            row_bytes += DEFAULT_WIDTH
+            continue
+        base_type, length = match.group(1), match.group(2)
+        if base_type in FIXED_WIDTHS:
+            row_bytes += FIXED_WIDTHS[base_type]
+        elif base_type in VARIABLE_WIDTHS:
+            row_bytes += VARIABLE_WIDTHS[base_type]
+        elif length:
+            # Variable length values also carry a 4 byte offset
+            row_bytes += int(length) // 2 + 4
+        else:
+            row_bytes += DEFAULT_WIDTH
+    return max(row_bytes, 1)
+
+def planned_batch_rows(row_bytes: float, target_bytes: int) -> int:
+    """Rows in a planned batch of about `target_bytes` of source data"""
+    return _clamp(target_bytes / max(row_bytes, 1), MIN_BATCH_ROWS, MAX_BATCH_ROWS)
+
+class BatchSizer:
+    """
+    Picks how many rows each streamed record batch fetches from the source. It
+    starts with the rows that fit `memory_bytes` when `in_flight` record batches
+    are held at once, then follows the measured width and fetch time of recent
+    record batches so each one takes about `target_seconds`, never going over
+    the memory budget
+    """
+    def __init__(self, row_bytes: float, memory_bytes: int, in_flight: int, target_seconds: float, smoothing: float = 0.3):
+        self.row_bytes = max(row_bytes, 1)
+        self.memory_bytes = memory_bytes
+        self.in_flight = max(in_flight, 1)
+        self.target_seconds = target_seconds
+        self.smoothing = smoothing
+        self.rows_per_second: Optional[float] = None
+        self.current = self.memory_rows()
+
+    def memory_rows(self) -> int:
+        return int(self.memory_bytes / (self.row_bytes * self.in_flight))
+
+    def rows(self) -> int:
+        return _clamp(self.current, MIN_STREAM_ROWS, MAX_STREAM_ROWS)
+
+    def observe(self, num_rows: int, num_bytes: int, seconds: float) -> None:
+        """Update the size from a record batch of `num_rows` rows and `num_bytes` bytes that took `seconds` to fetch"""
+        if not num_rows:
+            return
+        self.row_bytes = self._smooth(self.row_bytes, num_bytes / num_rows)
+        if seconds > 0:
+            self.rows_per_second = self._smooth(self.rows_per_second, num_rows / seconds)
+
+        target = self.memory_rows()
+        if self.rows_per_second:
+            target = min(target, self.rows_per_second * self.target_seconds)
+        # Move at most a factor of 2 at a time so one slow fetch doesn't collapse the size
+        self.current = int(min(max(target, self.current / 2), self.current * 2))
+
+    def _smooth(self, average: Optional[float], value: float) -> float:
+        if average is None:
+            return value
+        return average + self.smoothing * (value - average)
+
+def _clamp(value: float, lower: int, upper: int) -> int:
+    return int(min(max(value, lower), upper))
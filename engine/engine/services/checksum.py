@@ -0,0 +1,143 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+import asyncio
+import time
+
+from engine.services.partition import Partition, PartitionPlan
+from engine.services.pool import ConnectorPool
+
+@dataclass
+class RangeChecksum:
+    where: str
+    where_params: List[Any]
+    source_rows: int
+    dest_rows: int
+    source_checksum: int
+    dest_checksum: int
+
+    def matches(self) -> bool:
+        return self.source_rows == self.dest_rows and self.source_checksum == self.dest_checksum
+
+@dataclass
+class RowMismatch:
+    key: Any
+    # "missing" from the destination, "extra" in the destination, or "different" contents
+    kind: str
+
+class ChecksumValidator:
+    """
+    Compares the contents of the source and destination tables one key range at a
+    time. Each range costs a single aggregate query on each side, and only ranges
+    whose row count or checksum differ are split further and finally compared row
+    by row to find the mismatching keys
+    """
+    def __init__(
+        self,
+        source_pool: ConnectorPool,
+        dest_pool: ConnectorPool,
+        source_table: str,
+        dest_table: str,
+        columns: List[str],
+        workers: int,
+        drilldown_rows: int = 10000,
+        max_mismatches: int = 100,
+        where: str = "",
+        where_params: Optional[List[Any]] = None
+    ):
+        self.source_pool = source_pool
+        self.dest_pool = dest_pool
+        self.source_table = source_table
+        self.dest_table = dest_table
+        self.columns = columns
+        self.drilldown_rows = drilldown_rows
+        self.max_mismatches = max_mismatches
+        # Restricts every range, such as the rows an incremental run is responsible for
+        self.where = where
+        self.where_params = where_params or []
+        self._workers = asyncio.Semaphore(workers)
+
+    async def validate(self, plan: Optional[PartitionPlan]) -> List[RowMismatch]:
+        """
+        Checksum every partition of `plan`, or the whole table without a plan, and return the rows that don't match
+        """
+        start_time = time.time()
+        if plan is None:
+            checksum = await self.checksum_range("", [])
+            mismatches = [] if checksum.matches() else [RowMismatch(None, "different")]
+            print(f"Table checksum {'matches' if checksum.matches() else 'does not match'} ({checksum.source_rows:,} source rows, {checksum.dest_rows:,} destination rows)")
+            return mismatches
+
+        # Rows with a NULL key fall outside every key range, and the destination can have them even where the source has none
+        null_range = self.checksum_range(f"`{plan.key_column}` IS NULL", [])
+        key_ranges = [partition for partition in plan.partitions if not partition.is_null()]
+        results = await asyncio.gather(null_range, *(self.check_partition(plan, partition) for partition in key_ranges))
+
+        null_checksum, partition_mismatches = results[0], results[1:]
+        mismatches = [] if null_checksum.matches() else [RowMismatch(None, "different")]
+        for partition_mismatch in partition_mismatches:
+            mismatches.extend(partition_mismatch)
+
+        elapsed_time = time.time() - start_time
+        print(f"Checksummed {len(key_ranges)} ranges in {elapsed_time:.2f} seconds, found {len(mismatches)} mismatching rows")
+        return mismatches[:self.max_mismatches]
+
+    async def check_partition(self, plan: PartitionPlan, partition: Partition) -> List[RowMismatch]:
+        where, where_params = partition.predicate(plan.key_column, plan.key_type)
+        checksum = await self.checksum_range(where, where_params)
+        if checksum.matches():
+            return []
+
+        print(f"Range {where} {where_params} does not match ({checksum.source_rows:,} source rows, {checksum.dest_rows:,} destination rows)")
+        halves = _split(partition, plan.key_type)
+        if halves and max(checksum.source_rows, checksum.dest_rows) > self.drilldown_rows:
+            results = await asyncio.gather(*(self.check_partition(plan, half) for half in halves))
+            return [mismatch for result in results for mismatch in result]
+        return await self.compare_rows(plan.key_column, where, where_params)
+
+    async def checksum_range(self, where: str, where_params: List[Any]) -> RangeChecksum:
+        where, where_params = self._filter(where, where_params)
+        async with self._workers:
+            async with self.source_pool.connection() as source, self.dest_pool.connection() as dest:
+                (source_rows, source_checksum), (dest_rows, dest_checksum) = await asyncio.gather(
+                    source.get_range_checksum(self.source_table, self.columns, where, where_params),
+                    dest.get_range_checksum(self.dest_table, self.columns, where, where_params)
+                )
+        return RangeChecksum(where, where_params, source_rows, dest_rows, source_checksum, dest_checksum)
+
+    async def compare_rows(self, key_column: str, where: str, where_params: List[Any]) -> List[RowMismatch]:
+        where, where_params = self._filter(where, where_params)
+        async with self._workers:
+            async with self.source_pool.connection() as source, self.dest_pool.connection() as dest:
+                source_rows, dest_rows = await asyncio.gather(
+                    source.get_row_checksums(self.source_table, self.columns, key_column, where, where_params),
+                    dest.get_row_checksums(self.dest_table, self.columns, key_column, where, where_params)
+                )
+
+        # Multisets so duplicated rows in the destination show up as extra rows
+        missing = Counter(source_rows) - Counter(dest_rows)
+        extra = Counter(dest_rows) - Counter(source_rows)
+        missing_keys = {key for key, _ in missing.elements()}
+        extra_keys = {key for key, _ in extra.elements()}
+
+        mismatches = [RowMismatch(key, "different") for key in missing_keys & extra_keys]
+        mismatches.extend(RowMismatch(key, "missing") for key in missing_keys - extra_keys)
+        mismatches.extend(RowMismatch(key, "extra") for key in extra_keys - missing_keys)
+        return mismatches[:self.max_mismatches]
+
+    def _filter(self, where: str, where_params: List[Any]) -> Tuple[str, List[Any]]:
+        conditions = [f"({condition})" for condition in (where, self.where) if condition]
+        return " AND ".join(conditions), list(where_params) + self.where_params
+
+def _split(partition: Partition, key_type: str) -> Optional[Tuple[Partition, Partition]]:
+    """Split an integer key range in two, or return None when it can't be split further"""
+    if key_type != "int":
+        return None
+    upper = partition.upper if partition.upper_inclusive else partition.upper - 1
+    if upper <= partition.lower:
+        return None
+    middle = (partition.lower + upper + 1) // 2
+    return (
+        Partition(partition.index, partition.lower, middle, False),
+        Partition(partition.index, middle, partition.upper, partition.upper_inclusive)
+    )
@@ -0,0 +1,255 @@
+import asyncio
+from dataclasses import asdict, dataclass
+from datetime import datetime
+import time
+from typing import List, Optional
+
+from engine.config.config import Config
+from engine.services.encoder import EncoderPool
+from engine.services.metrics import metrics
+from engine.services.job import Job, JobService, create_governor, create_pool
+
+class DatabaseJob:
+    def __init__(self, job_id: str, source_engine: str, source_host: str, source_port: int, source_user: str, source_password: str, source_database: str, dest_engine: str, dest_host: str, dest_port: int, dest_user: str, dest_password: str, dest_database: str, s3_bucket: str, s3_access_key_id: str, s3_secret_access_key: str, tables: Optional[List[str]] = None):
+        self.job_id = job_id
+        self.source_engine = source_engine
+        self.source_host = source_host
+        self.source_port = source_port
+        self.source_user = source_user
+        self.source_password = source_password
+        self.source_database = source_database
+        self.dest_engine = dest_engine
+        self.dest_host = dest_host
+        self.dest_port = dest_port
+        self.dest_user = dest_user
+        self.dest_password = dest_password
+        self.dest_database = dest_database
+        self.s3_bucket = s3_bucket
+        self.s3_access_key_id = s3_access_key_id
+        self.s3_secret_access_key = s3_secret_access_key
+        # Every table of the source database when not given
+        self.tables = tables
+
+@dataclass
+class TableProgress:
+    table_name: str
+    estimated_rows: int
+    estimated_bytes: int
+    status: str = "pending"
+    rows_processed: int = 0
+    elapsed_time: float = 0.0
+    error: Optional[str] = None
+
+    def memory_estimate(self) -> int:
+        """Bytes of rows the table's job can hold in memory at once"""
+        if Config.adaptive_batch_size:
+            # Streamed record batches are sized to fit the job's memory budget
+            return int(min(self.estimated_bytes, Config.stream_memory_bytes))
+        row_bytes = self.estimated_bytes / max(self.estimated_rows, 1)
+        # Every extract worker can have a full queue of streamed chunks waiting to be encoded
+        in_flight = row_bytes * Config.stream_batch_rows * (Config.pipeline_queue_size + 1) * Config.extract_workers
+        return int(min(self.estimated_bytes, in_flight))
+
+class MemoryBudget:
+    """
+    Admits work while the sum of its memory estimates stays under `limit` bytes.
+    Work larger than the whole budget still runs, but only on its own
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._available = asyncio.Condition()
+
+    async def acquire(self, size: int) -> None:
+        if not self.limit:
+            return
+        async with self._available:
+            while self.used and self.used + size > self.limit:
+                await self._available.wait()
+            self.used += size
+
+    async def release(self, size: int) -> None:
+        if not self.limit:
+            return
+        async with self._available:
+            self.used -= size
+            self._available.notify_all()
+
+class DatabaseJobService:
+    """
+    Migrates every table of a database, running up to Config.table_workers table
+    jobs at once over connection pools shared by all of them. Tables are started
+    largest first so the biggest one never ends up running alone at the end
+    """
+    def __init__(self, job: DatabaseJob):
+        self.job = job
+        self.source_pool = None
+        self.dest_pool = None
+        self.encoder_pool = None
+        # Every table reads the same source, one governor limits them all together
+        self.governor = create_governor(Config.src_pool_size)
+        self.memory = MemoryBudget(Config.max_memory_bytes)
+        self.progress: List[TableProgress] = []
+        self.services = {}
+
+    async def run_job(self):
+        start_time = time.time()
+        self.source_pool = create_pool(
+            self.job.source_engine,
+            self.job.source_host,
+            int(self.job.source_port),
+            self.job.source_user,
+            self.job.source_password,
+            self.job.source_database,
+            Config.src_pool_size
+        )
+        self.dest_pool = create_pool(
+            self.job.dest_engine,
+            self.job.dest_host,
+            int(self.job.dest_port),
+            self.job.dest_user,
+            self.job.dest_password,
+            self.job.dest_database,
+            Config.dest_pool_size
+        )
+        if Config.encode_processes:
+            # Tables share the encoder processes instead of each starting encode_workers of their own
+            self.encoder_pool = EncoderPool(Config.encode_workers)
+
+        try:
+            self.progress = await self.plan_tables()
+            # Every running table job holds one connection from each pool, and needs at least one more to make progress
+            workers = max(1, min(Config.table_workers, Config.src_pool_size - 1, Config.dest_pool_size - 1))
+            if workers < Config.table_workers:
+                print(f"Running {workers} tables at once to leave pooled connections for their pipelines")
+
+            queue = asyncio.Queue()
+            for table in self.progress:
+                queue.put_nowait(table)
+            async with asyncio.TaskGroup() as group:
+                for _ in range(workers):
+                    group.create_task(self.run_tables(queue))
+        finally:
+            await self.source_pool.close()
+            await self.dest_pool.close()
+            if self.encoder_pool:
+                await self.encoder_pool.close()
+
+        elapsed_time = time.time() - start_time
+        self.write_metrics(elapsed_time)
+        self.print_summary(elapsed_time)
+        failed = [table.table_name for table in self.progress if table.status == "failed"]
+        if failed:
+            raise Exception(f"Failed to migrate tables: {', '.join(failed)}")
+
+    async def plan_tables(self) -> List[TableProgress]:
+        """
+        Discover the tables to migrate and order them by their estimated size, largest first
+        """
+        async with self.source_pool.connection() as source:
+            table_names = self.job.tables or await source.get_tables()
+            tables = []
+            for table_name in table_names:
+                estimated_rows, estimated_bytes = await source.get_table_size(table_name)
+                tables.append(TableProgress(table_name, estimated_rows, estimated_bytes))
+
+        tables.sort(key=lambda table: (table.estimated_bytes, table.estimated_rows), reverse=True)
+        total_bytes = sum(table.estimated_bytes for table in tables)
+        print(f"Planned {len(tables)} tables, {total_bytes / (1024 * 1024):,.1f} MB estimated")
+        for table in tables:
+            print(f"  {table.table_name}: ~{table.estimated_rows:,} rows, ~{table.estimated_bytes / (1024 * 1024):,.1f} MB")
+        return tables
+
+    async def run_tables(self, queue: asyncio.Queue) -> None:
+        while not queue.empty():
+            table = queue.get_nowait()
+            memory = table.memory_estimate()
+            await self.memory.acquire(memory)
+            try:
+                await self.run_table(table)
+            finally:
+                await self.memory.release(memory)
+
+    async def run_table(self, table: TableProgress) -> None:
+        job = Job(
+            job_id=f"{self.job.job_id}-{table.table_name}",
+            source_engine=self.job.source_engine,
+            source_host=self.job.source_host,
+            source_port=self.job.source_port,
+            source_user=self.job.source_user,
+            source_password=self.job.source_password,
+            source_database=self.job.source_database,
+            source_table=table.table_name,
+            dest_engine=self.job.dest_engine,
+            dest_host=self.job.dest_host,
+            dest_port=self.job.dest_port,
+            dest_user=self.job.dest_user,
+            dest_password=self.job.dest_password,
+            dest_database=self.job.dest_database,
+            dest_table=table.table_name,
+            s3_bucket=self.job.s3_bucket,
+            s3_access_key_id=self.job.s3_access_key_id,
+            s3_secret_access_key=self.job.s3_secret_access_key,
+            start_offset=0,
+            end_offset=0,
+            sort_column=""
+        )
+        service = JobService(job, self.source_pool, self.dest_pool, self.encoder_pool, governor=self.governor)
+        self.services[table.table_name] = service
+
+        table.status = "running"
+        start_time = time.time()
+        try:
+            await service.run_job()
+            table.status = "completed"
+        except Exception as e:
+            # One failing table shouldn't stop the others, the job fails once they are all done
+            print(f"Error migrating table {table.table_name}: {str(e)}")
+            table.status = "failed"
+            table.error = str(e)
+        finally:
+            await service.close_connectors()
+            table.elapsed_time = time.time() - start_time
+            table.rows_processed = service.rows_processed
+            del self.services[table.table_name]
+
+        self.print_progress()
+
+    def print_progress(self) -> None:
+        finished = [table for table in self.progress if table.status in ("completed", "failed")]
+        running = [table for table in self.progress if table.status == "running"]
+        remaining_bytes = sum(table.estimated_bytes for table in self.progress if table.status != "completed")
+        rows_processed = sum(table.rows_processed for table in finished)
+        rows_processed += sum(self.services[table.table_name].rows_processed for table in running if table.table_name in self.services)
+        print(f"[{len(finished)}/{len(self.progress)} tables] {rows_processed:,} rows processed, {len(running)} running, ~{remaining_bytes / (1024 * 1024):,.1f} MB remaining")
+
+    def write_metrics(self, elapsed_time: float) -> None:
+        """
+        Write the metrics of every table as one JSON report, plus the Prometheus text file when configured
+        """
+        metrics_dir = Config.metrics_dir or f"{Config.local_dir}/metrics"
+        report_path = f"{metrics_dir}/{self.job.job_id}.json"
+        metrics.write_json(
+            report_path,
+            job_id=self.job.job_id,
+            tables=[asdict(table) for table in self.progress],
+            elapsed_seconds=elapsed_time,
+            finished_at=datetime.now().isoformat()
+        )
+        print(f"Wrote metrics report to {report_path}")
+        if Config.metrics_textfile:
+            metrics.write_prometheus(Config.metrics_textfile)
+
+    def print_summary(self, elapsed_time: float) -> None:
+        total_rows = sum(table.rows_processed for table in self.progress)
+        print("\n=== Database Export Summary ===")
+        for table in self.progress:
+            line = f"{table.table_name}: {table.status}, {table.rows_processed:,} rows in {table.elapsed_time:.2f} seconds"
+            if table.error:
+                line += f" ({table.error})"
+            print(line)
+        print(f"Total time: {elapsed_time:.2f} seconds")
+        print(f"Total rows processed: {total_rows:,}")
+        print(f"Average processing speed: {total_rows / max(elapsed_time, 1e-6):.2f} rows/second")
+        print(f"Finished at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print("===============================")
@@ -0,0 +1,195 @@
+from collections import deque
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, List, Optional
+import asyncio
+import multiprocessing
+
+import pyarrow as pa
+
+from engine.services.parquet import ParquetConfig, ParquetFile, ParquetSink
+
+class EncoderProcess:
+    """
+    A worker process running one ParquetSink at a time. Record batches are
+    written into shared memory as Arrow IPC streams and read by the worker
+    without copying, only the commands and the completed files' metadata are
+    pickled over the pipe
+    """
+    def __init__(self, context: multiprocessing.context.BaseContext):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_encoder_main, args=(child_connection,), daemon=True)
+        self.process.start()
+        child_connection.close()
+
+    def call(self, command: str, *args: Any) -> Any:
+        self.connection.send((command, *args))
+        try:
+            ok, result = self.connection.recv()
+        except (EOFError, ConnectionResetError):
+            raise Exception(f"Encoder process {self.process.pid} exited with code {self.process.exitcode}")
+        if not ok:
+            raise Exception(f"Encoder process {self.process.pid} failed: {result}")
+        return result
+
+    def stop(self) -> None:
+        try:
+            self.connection.send(None)
+            self.process.join(5)
+        except (BrokenPipeError, OSError):
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+
+class ProcessSink:
+    """
+    ParquetSink running in an encoder process, with the same `write` and `close`
+    """
+    def __init__(self, encoder: EncoderProcess):
+        self.encoder = encoder
+        self.files: List[ParquetFile] = []
+        self.num_rows = 0
+        self.closed = False
+
+    def write(self, batch: pa.RecordBatch) -> List[ParquetFile]:
+        if batch.num_rows == 0:
+            return []
+
+        size = _ipc_size(batch)
+        memory = SharedMemory(create=True, size=size)
+        try:
+            _write_ipc(memory, batch)
+            completed = self.encoder.call("write", memory.name, size)
+        finally:
+            # The worker keeps its own mapping of the block for as long as it holds the batch
+            memory.close()
+            memory.unlink()
+
+        self.num_rows += batch.num_rows
+        self.files.extend(completed)
+        return completed
+
+    def close(self) -> List[ParquetFile]:
+        completed = self.encoder.call("close")
+        self.closed = True
+        self.files.extend(completed)
+        return completed
+
+class EncoderPool:
+    """
+    Keeps up to `max_size` encoder processes so parquet encoding and compression
+    run on every core instead of sharing the GIL with the extract and load
+    stages. A process is checked out for the whole sink since the files it
+    writes roll over across record batches
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # Forked workers would inherit the event loop and the connector threads
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: List[EncoderProcess] = []
+        self._size = 0
+        self._available = asyncio.Condition()
+
+    async def open_sink(self, output_dir: str, file_prefix: str, config: Optional[ParquetConfig] = None) -> ProcessSink:
+        """Open a sink on an idle encoder process, starting one if fewer than `max_size` are running"""
+        async with self._available:
+            while not self._idle and self._size >= self.max_size:
+                await self._available.wait()
+            if self._idle:
+                encoder = self._idle.pop()
+            else:
+                self._size += 1
+                encoder = None
+
+        try:
+            if encoder is None:
+                encoder = await asyncio.to_thread(EncoderProcess, self._context)
+            await asyncio.to_thread(encoder.call, "open", output_dir, file_prefix, config or ParquetConfig())
+            return ProcessSink(encoder)
+        except Exception:
+            if encoder is not None:
+                await asyncio.to_thread(encoder.stop)
+            await self._forget()
+            raise
+
+    async def release(self, sink: ProcessSink) -> None:
+        """Return the sink's process to the pool, stopping it if the sink was left open by a failure"""
+        if not sink.closed:
+            await asyncio.to_thread(sink.encoder.stop)
+            await self._forget()
+            return
+        async with self._available:
+            self._idle.append(sink.encoder)
+            self._available.notify()
+
+    async def close(self) -> None:
+        async with self._available:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for encoder in idle:
+            await asyncio.to_thread(encoder.stop)
+
+    async def _forget(self) -> None:
+        async with self._available:
+            self._size -= 1
+            self._available.notify()
+
+def _ipc_size(batch: pa.RecordBatch) -> int:
+    stream = pa.MockOutputStream()
+    with pa.ipc.new_stream(stream, batch.schema) as writer:
+        writer.write_batch(batch)
+    return stream.size()
+
+def _write_ipc(memory: SharedMemory, batch: pa.RecordBatch) -> None:
+    # The block can only be closed once the writer and its view of the block are gone, which they are on return
+    with pa.ipc.new_stream(pa.FixedSizeBufferWriter(pa.py_buffer(memory.buf)), batch.schema) as writer:
+        writer.write_batch(batch)
+
+def _encoder_main(connection: Connection) -> None:
+    sink = None
+    # Shared memory blocks still referenced by record batches buffered in the sink
+    blocks = deque()
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+
+        command, *args = message
+        try:
+            if command == "open":
+                output_dir, file_prefix, config = args
+                sink = ParquetSink(output_dir, file_prefix, config)
+                result = None
+            elif command == "write":
+                name, size = args
+                memory = SharedMemory(name=name)
+                blocks.append(memory)
+                batch = pa.ipc.open_stream(pa.py_buffer(memory.buf).slice(0, size)).read_next_batch()
+                result = sink.write(batch)
+                del batch
+            elif command == "close":
+                result = sink.close()
+                sink = None
+            else:
+                raise ValueError(f"Unknown encoder command: {command}")
+            connection.send((True, result))
+        except Exception as e:
+            connection.send((False, str(e)))
+        _release_blocks(blocks)
+
+    sink = None
+    _release_blocks(blocks)
+
+def _release_blocks(blocks: deque) -> None:
+    # Batches are consumed in order, so stop at the first block a buffered batch still points into
+    while blocks:
+        try:
+            blocks[0].close()
+        except BufferError:
+            return
+        blocks.popleft()
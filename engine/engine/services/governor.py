@@ -0,0 +1,114 @@
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+import asyncio
+import time
+
+from engine.config.config import Config
+from engine.services.metrics import metrics
+
+class SourceGovernor:
+    """
+    Limits the load extraction puts on a source: at most `limit` queries run at
+    once, and the rows and bytes they fetch are paced to `max_rows_per_second`
+    and `max_bytes_per_second` when set. With `latency_tolerance` set the limit
+    adapts with AIMD, starting from `min_queries` and growing by one query per
+    round of fetches while the fetch latency per row stays within
+    `latency_tolerance` times the lowest of the last `baseline_window` fetches,
+    and shrinking by `backoff_factor` once it rises past that, which is when the
+    source is getting busy
+    """
+    def __init__(
+        self,
+        max_queries: int,
+        min_queries: int = 1,
+        max_rows_per_second: int = 0,
+        max_bytes_per_second: int = 0,
+        latency_tolerance: float = 0.0,
+        backoff_factor: float = 0.5,
+        smoothing: float = 0.2,
+        baseline_window: int = 200
+    ):
+        self.max_queries = max(max_queries, 1)
+        self.min_queries = max(min(min_queries, self.max_queries), 1)
+        self.max_rows_per_second = max_rows_per_second
+        self.max_bytes_per_second = max_bytes_per_second
+        self.latency_tolerance = latency_tolerance
+        self.backoff_factor = backoff_factor
+        self.smoothing = smoothing
+        self.adaptive = latency_tolerance > 0
+        self.limit = float(self.min_queries if self.adaptive else self.max_queries)
+        self.in_flight = 0
+        # Smoothed seconds per fetched row, and the lowest of its recent values. Backing off brings low values back
+        # into the window, while a lasting change in the rows moves the baseline once its old values age out
+        self.latency: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self._recent = deque(maxlen=baseline_window)
+        self._fetches_since_backoff = 0
+        # When the rows and bytes fetched so far are paid off at the capped rates
+        self._rows_clock = 0.0
+        self._bytes_clock = 0.0
+        self._available = asyncio.Condition()
+
+    @asynccontextmanager
+    async def query(self) -> AsyncIterator[None]:
+        """Hold one of the `limit` query slots for the duration of a source query"""
+        async with self._available:
+            while self.in_flight >= int(self.limit):
+                await self._available.wait()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._available:
+                self.in_flight -= 1
+                self._available.notify_all()
+
+    async def observe(self, num_rows: int, num_bytes: int, seconds: float) -> None:
+        """Account for a record batch that took `seconds` to fetch, waiting as long as the rate caps require"""
+        if self.adaptive and num_rows and seconds > 0:
+            await self._adapt(seconds / num_rows)
+
+        delay = self._reserve(num_rows, num_bytes)
+        if delay > 0:
+            metrics.observe("source_throttle_seconds", delay)
+            await asyncio.sleep(delay)
+
+    def _reserve(self, num_rows: int, num_bytes: int) -> float:
+        now = time.monotonic()
+        delay = 0.0
+        if self.max_rows_per_second:
+            self._rows_clock = max(self._rows_clock, now) + num_rows / self.max_rows_per_second
+            delay = max(delay, self._rows_clock - now)
+        if self.max_bytes_per_second:
+            self._bytes_clock = max(self._bytes_clock, now) + num_bytes / self.max_bytes_per_second
+            delay = max(delay, self._bytes_clock - now)
+        return delay
+
+    async def _adapt(self, row_latency: float) -> None:
+        if self.latency is None:
+            self.latency = row_latency
+        else:
+            self.latency += self.smoothing * (row_latency - self.latency)
+        self._recent.append(self.latency)
+        self.baseline = min(self._recent)
+        self._fetches_since_backoff += 1
+
+        if self.latency > self.baseline * self.latency_tolerance:
+            # Fetches already in flight when the limit was cut still report the old latency, back off once per round
+            if self._fetches_since_backoff >= self.limit:
+                self._fetches_since_backoff = 0
+                await self._set_limit(max(self.min_queries, self.limit * self.backoff_factor))
+        else:
+            await self._set_limit(min(self.max_queries, self.limit + 1 / self.limit))
+
+    async def _set_limit(self, limit: float) -> None:
+        previous, self.limit = int(self.limit), limit
+        if int(limit) == previous:
+            return
+        metrics.observe("source_query_limit", int(limit))
+        if Config.verbose:
+            print(f"Source query limit {'raised' if int(limit) > previous else 'lowered'} to {int(limit)}, fetching {self.latency * 1e6:,.1f} us per row against a baseline of {self.baseline * 1e6:,.1f} us")
+        if int(limit) > previous:
+            async with self._available:
+                self._available.notify_all()
@@ -0,0 +1,118 @@
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import os
+import time
+
+from engine.services.manifest import Manifest
+from engine.services.metrics import metrics
+from engine.services.retry import is_transient
+
+class PipelineIngest:
+    """
+    Loads a job's parquet files with a destination pipeline started before the
+    first upload and left running in the background, so it picks up the files
+    of every batch as they land under the job's S3 prefix and loading overlaps
+    with extraction instead of following it. The pipeline's information_schema
+    progress is polled every `poll_seconds`, marking each file loaded in the
+    manifest as the pipeline reports it
+    """
+    def __init__(self, dest: Any, manifest: Manifest, table_name: str, s3_key: Callable[[str], str], poll_seconds: float = 2.0):
+        self.dest = dest
+        self.manifest = manifest
+        self.table_name = table_name
+        self.s3_key = s3_key
+        self.poll_seconds = poll_seconds
+        self.pipeline_name: Optional[str] = None
+        self.files_loaded = 0
+        self.rows_loaded = 0
+        # When each file was uploaded by this run, to measure how far loading trails the uploads
+        self.uploaded_at: Dict[str, float] = {}
+        self._uploads_done = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, parquet_path: str, aws_access_key_id: str, aws_secret_access_key: str) -> None:
+        self.pipeline_name = await self.dest.start_pipeline(self.table_name, parquet_path, aws_access_key_id, aws_secret_access_key)
+        self._task = asyncio.create_task(self._watch())
+
+    def file_uploaded(self, path: str) -> None:
+        self.uploaded_at[path] = time.time()
+
+    async def finish(self) -> None:
+        """Wait until the pipeline has loaded every uploaded file, then drop it"""
+        self._uploads_done.set()
+        wait_start = time.time()
+        try:
+            await self._task
+        finally:
+            await self.close()
+        # How long loading ran on after the last upload, close to zero once loading keeps up with extraction
+        metrics.observe("pipeline_drain_seconds", time.time() - wait_start, table=self.table_name)
+
+    async def close(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.pipeline_name is not None:
+            await self.dest.drop_pipeline(self.pipeline_name)
+            self.pipeline_name = None
+
+    async def _watch(self) -> None:
+        start_time = time.time()
+        while True:
+            # Read before polling, so once set every file uploaded is covered by the poll
+            uploads_done = self._uploads_done.is_set()
+            try:
+                state, file_states = await self.dest.get_pipeline_progress(self.pipeline_name)
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                print(f"Polling pipeline {self.pipeline_name} failed with a transient error, polling again: {str(e)}")
+                await asyncio.sleep(self.poll_seconds)
+                continue
+
+            pending = await self._record(file_states)
+            skipped = [name for name, file_state in file_states.items() if file_state == "Skipped"]
+            if skipped:
+                raise Exception(f"Pipeline {self.pipeline_name} skipped {len(skipped)} files: {', '.join(sorted(skipped))}")
+            if state in ("Error", "Stopped"):
+                errors = await self.dest.get_pipeline_errors(self.pipeline_name)
+                raise Exception(f"Pipeline {self.pipeline_name} stopped in the {state} state: {'; '.join(errors) or 'no errors reported'}")
+            if uploads_done and not pending:
+                elapsed_time = time.time() - start_time
+                print(f"Pipeline {self.pipeline_name} loaded {self.files_loaded} files ({self.rows_loaded:,} rows) in {elapsed_time:.2f} seconds")
+                return
+            await asyncio.sleep(self.poll_seconds)
+
+    async def _record(self, file_states: Dict[str, str]) -> int:
+        """Mark the files the pipeline reports as loaded, returning how many uploaded files it hasn't loaded yet"""
+        # Pipelines report S3 files by key, matched to the exported files by name as every job has its own prefix
+        loaded_names = {os.path.basename(name) for name, file_state in file_states.items() if file_state == "Loaded"}
+        now = time.time()
+        uploaded = 0
+        pending = 0
+        newly_loaded = 0
+        for batch in list(self.manifest.batches.values()):
+            for file in list(batch.files):
+                if not file.uploaded:
+                    continue
+                uploaded += 1
+                if file.loaded:
+                    continue
+                if os.path.basename(self.s3_key(file.path)) not in loaded_names:
+                    pending += 1
+                    continue
+                self.manifest.mark_loaded(file.path)
+                newly_loaded += 1
+                self.files_loaded += 1
+                self.rows_loaded += file.num_rows
+                metrics.increment("loaded_rows", file.num_rows, table=self.table_name)
+                if file.path in self.uploaded_at:
+                    metrics.observe("pipeline_file_lag_seconds", now - self.uploaded_at[file.path], table=self.table_name)
+
+        if newly_loaded:
+            await self.manifest.flush()
+            print(f"Pipeline {self.pipeline_name} has loaded {uploaded - pending} of {uploaded} uploaded files ({self.rows_loaded:,} rows this run)")
+        return pending
@@ -1,19 +1,53 @@
 import asyncio
+import copy
+from dataclasses import dataclass
 from datetime import datetime
+import hashlib
+import json
 import os
 import shutil
 import time
+from typing import Any, Dict, List, Optional, Tuple
 import uuid
 
 from engine.config.config import Config
 from engine.services.s3 import S3Service
-from engine.services.parquet import ParquetService
-from engine.connectors.connector import Connector
-from concurrent.futures import ThreadPoolExecutor
-import multiprocessing
+from engine.services.batch_size import BatchSizer, estimate_row_bytes, planned_batch_rows
+from engine.services.checksum import ChecksumValidator
+from engine.services.encoder import EncoderPool
+from engine.services.governor import SourceGovernor
+from engine.services.ingest import PipelineIngest
+from engine.services.manifest import BatchRecord, Manifest, file_checksum
+from engine.services.metrics import metrics, SIZE_BUCKETS
+from engine.services.parquet import ParquetConfig, ParquetFile, ParquetService
+from engine.services.partition import PartitionPlan, PartitionPlanner
+from engine.services.pipeline import Pipeline, Stage
+from engine.services.pool import ConnectorPool
+from engine.services.retry import RetryPolicy
+from engine.services.spill import SpillCache, SpillEntry, SpillWriter
+from engine.services.tuning import EncodingPlan, EncodingTuner
+from engine.services.watermark import Watermark
+from engine.connectors.connector import Connector, S3IngestConnector
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Rows per batch when they aren't sized from the table's row width
+DEFAULT_BATCH_SIZE = 5000000
+# Rows read to measure the average row width
+ROW_SAMPLE_SIZE = 1000
+
+@dataclass
+class Destination:
+    engine: str
+    host: str
+    port: int
+    user: str
+    password: str
+    database: str
+    table: str
 
 class Job:
-    def __init__(self, job_id: str, source_engine: str, source_host: str, source_port: int, source_user: str, source_password: str, source_database: str, source_table: str, dest_engine: str, dest_host: str, dest_port: int, dest_user: str, dest_password: str, dest_database: str, dest_table: str, s3_bucket: str, s3_access_key_id: str, s3_secret_access_key: str, start_offset: int, end_offset: int, sort_column: str):
+    def __init__(self, job_id: str, source_engine: str, source_host: str, source_port: int, source_user: str, source_password: str, source_database: str, source_table: str, dest_engine: str, dest_host: str, dest_port: int, dest_user: str, dest_password: str, dest_database: str, dest_table: str, s3_bucket: str, s3_access_key_id: str, s3_secret_access_key: str, start_offset: int, end_offset: int, sort_column: str, destinations: Optional[List[Destination]] = None):
         self.job_id = job_id
         self.source_engine = source_engine
         self.source_host = source_host
@@ -35,75 +69,616 @@ class Job:
         self.start_offset = start_offset
         self.end_offset = end_offset
         self.sort_column = sort_column
+        # Further destinations the source table is copied into along with dest_*
+        self.destinations = destinations or []
+
+    def primary_destination(self) -> Destination:
+        return Destination(self.dest_engine, self.dest_host, self.dest_port, self.dest_user, self.dest_password, self.dest_database, self.dest_table)
+
+    def for_destination(self, destination: Destination, job_id: str) -> "Job":
+        """
+        A copy of this job that copies the source table into `destination` only
+        """
+        job = copy.copy(self)
+        job.job_id = job_id
+        job.dest_engine = destination.engine
+        job.dest_host = destination.host
+        job.dest_port = destination.port
+        job.dest_user = destination.user
+        job.dest_password = destination.password
+        job.dest_database = destination.database
+        job.dest_table = destination.table
+        job.destinations = []
+        return job
+
+@dataclass
+class Batch:
+    batch_num: int
+    offset: int = 0
+    after_key: Optional[Tuple] = None
+    where: str = ""
+    where_params: Optional[List[Any]] = None
+
+@dataclass
+class BatchStream:
+    batch: Batch
+    chunks: Optional[asyncio.Queue]
+    # Files of a batch already extracted by an earlier run of the job
+    resumed_files: Optional[List[ParquetFile]] = None
+    # Set by the extract stage once it hands the stream to the encode stage
+    started: bool = False
+    # Set by the extract stage before it ends the stream when the batch couldn't be read
+    error: Optional[Exception] = None
+    # Set by the encode stage when it failed on the batch, the extract stops at its next record batch
+    encode_error: Optional[Exception] = None
+    # Set once the encode stage has read the end of the stream
+    ended: bool = False
+
+    async def put(self, record_batch: pa.RecordBatch) -> None:
+        if self.encode_error is not None:
+            raise Exception(f"Encoding batch {self.batch.batch_num} failed: {str(self.encode_error)}")
+        await self.chunks.put(record_batch)
+
+    async def get(self) -> Optional[pa.RecordBatch]:
+        record_batch = await self.chunks.get()
+        if record_batch is None:
+            self.ended = True
+        return record_batch
+
+    async def abandon(self, error: Exception) -> None:
+        """
+        Give up on the batch from the encode stage, reading whatever the extract still sends until it ends the
+        stream so it is never left blocked on the full queue
+        """
+        self.encode_error = error
+        while not self.ended:
+            await self.get()
+
+@dataclass
+class BatchPlan:
+    """
+    Batches planned once for every destination of a fan-out, so they all select the same cached batches
+    """
+    batch_size: int
+    key_columns: List[str]
+    sizer: Optional[BatchSizer]
+    batches: List[Batch]
+
+@dataclass
+class ExtractProgress:
+    """
+    Rows of a batch already streamed to the encode stage, and the key of the last one, where a retry picks up
+    """
+    rows: int = 0
+    last_key: Optional[Tuple] = None
+    attempts: int = 0
+
+def create_pool(engine: str, host: str, port: int, user: str, password: str, database: str, max_size: int) -> ConnectorPool:
+    """
+    Pool of async connectors to a database
+    """
+    # Each pooled connector holds a single plain connection, so the pool size caps the connections and
+    # ConnectorPool is the only layer pooling them
+    return ConnectorPool(
+        lambda: Connector.create_connector(engine, host, port, user, password, database, use_async=True, pool_size=1),
+        max_size,
+        Config.pool_health_check_seconds
+    )
+
+def create_governor(max_queries: int) -> SourceGovernor:
+    """
+    Governor of the extract queries against a source, allowing `max_queries` at once unless Config.source_max_queries is set
+    """
+    return SourceGovernor(
+        Config.source_max_queries or max_queries,
+        Config.source_min_queries,
+        Config.source_max_rows_per_second,
+        Config.source_max_bytes_per_second,
+        Config.source_latency_tolerance,
+        Config.source_backoff_factor
+    )
+
+def create_spill_cache() -> SpillCache:
+    return SpillCache(
+        Config.spill_cache_dir or f"{Config.local_dir}/spill",
+        Config.spill_cache_max_bytes,
+        Config.spill_cache_max_age_seconds
+    )
 
 class JobService:
-    def __init__(self, job: Job):
+    def __init__(self, job: Job, source_pool: Optional[ConnectorPool] = None, dest_pool: Optional[ConnectorPool] = None, encoder_pool: Optional[EncoderPool] = None, spill_cache: Optional[SpillCache] = None, governor: Optional[SourceGovernor] = None):
         self.job = job
         self.source = None
         self.dest = None
+        # Pools passed in are shared with other jobs and left open when this job finishes
+        self.source_pool = source_pool
+        self.dest_pool = dest_pool
+        self.owns_pools = source_pool is None
+        self.encoder_pool = encoder_pool
+        self.owns_encoder_pool = encoder_pool is None
+        # Extracted batches are read from here when cached, and added to it when not
+        self.spill_cache = spill_cache
+        # Jobs reading the same source share its governor, so its limits hold across all of them
+        self.governor = governor or create_governor(Config.extract_workers)
+        self.retry_policy = RetryPolicy(Config.retry_attempts, Config.retry_base_seconds, Config.retry_max_seconds)
+        # Errors of the batches that still failed after their retries, the other batches carry on without them
+        self.failed_batches: Dict[int, str] = {}
         self.s3 = None
-        self.batch_size = 5000000
+        # Set while a destination pipeline loads the uploaded files in the background
+        self.ingest: Optional[PipelineIngest] = None
+        self.batch_size = DEFAULT_BATCH_SIZE
+        # Batches planned by a fan-out job for each of its destination jobs
+        self.batch_plan: Optional[BatchPlan] = None
+        # Sizes the streamed record batches when Config.adaptive_batch_size is set
+        self.sizer = None
+        self.key_columns = []
+        self.source_schema = {}
+        self.transfer_plan = None
+        self.arrow_schema = None
+        self.rows_processed = 0
+        self.manifest = None
+        # Incremental runs only copy the rows between the last and the pending watermark
+        self.watermark = None
+        self.where = ""
+        self.where_params = []
+        # Per column codecs and encodings tuned on the first streamed record batch, shared by every batch
+        self.encoding_plan = None
+        self._tune_lock = asyncio.Lock()
+
+    async def extract_batch(self, batch: Batch, emit) -> None:
+        """
+        Pipeline stage streaming the rows of a batch from the source to the encode stage
+        """
+        batch_num = batch.batch_num
+        if batch.where:
+            print(f"Processing batch {batch_num} for partition {batch.where} {batch.where_params}")
+        elif self.key_columns:
+            print(f"Processing batch {batch_num} starting after key {batch.after_key}")
+        else:
+            print(f"Processing batch {batch_num} starting at offset {batch.offset:,}")
+
+        record = self.manifest.batches[batch_num]
+        if record.extracted:
+            print(f"Batch {batch_num} was already extracted, resuming from its {len(record.files)} parquet files")
+            await emit(BatchStream(batch, None, [ParquetFile(file.path, file.num_rows) for file in record.files]))
+            return
+
+        stream = BatchStream(batch, asyncio.Queue(maxsize=Config.pipeline_queue_size))
+        try:
+            if self.spill_cache is None:
+                await self.extract_from_source(batch, stream, emit)
+            else:
+                key = self.spill_key(batch)
+                async with self.spill_cache.fill_lock(key):
+                    entry = await asyncio.to_thread(self.spill_cache.get, key)
+                    if entry is None:
+                        metrics.increment("spill_cache_misses", table=self.job.source_table)
+                        writer = self.spill_cache.writer(key)
+                        try:
+                            await self.extract_from_source(batch, stream, emit, writer)
+                            await asyncio.to_thread(writer.commit, self.arrow_schema)
+                        except BaseException:
+                            await asyncio.to_thread(writer.abort)
+                            raise
+                if entry is not None:
+                    # Jobs that find the batch cached read it at the same time, only filling it is serialized
+                    stream.started = True
+                    await emit(stream)
+                    await self.extract_spilled(batch, entry, stream)
+        except asyncio.CancelledError:
+            # The encode stage is cancelled along with this one, nothing is left to read the end of the stream
+            raise
+        except Exception as e:
+            if stream.started:
+                stream.error = e
+                await stream.chunks.put(None)
+            raise
+        else:
+            await stream.chunks.put(None)
+
+    async def extract_from_source(self, batch: Batch, stream: BatchStream, emit, writer: Optional[SpillWriter] = None) -> None:
+        """
+        Stream the rows of a batch from the source, retrying transient errors after the rows already streamed
+        """
+        # The stream only goes to an encoder once its extract holds a query slot and a connection. An encoder
+        # waiting on an extract that still waits for a slot could hold up the extract that has one, for good.
+        # Retries keep both, reconnecting the connection in place, for the same reason
+        async with self.governor.query(), self.source_pool.connection() as source:
+            stream.started = True
+            await emit(stream)
+
+            progress = ExtractProgress()
+
+            async def attempt() -> None:
+                if progress.attempts:
+                    await source.disconnect()
+                    await source.connect()
+                progress.attempts += 1
+                await self.extract_source(batch, source, stream, writer, progress)
+
+            await self.retry_policy.run(
+                attempt,
+                f"Extracting batch {batch.batch_num}",
+                # Picking up after the streamed rows needs them in a stable order, otherwise only a stream that
+                # failed before its first rows can be retried
+                lambda _: progress.rows == 0 or self.resumable(batch),
+                table=self.job.source_table
+            )
+
+    def resumable(self, batch: Batch) -> bool:
+        """
+        Whether the rows of a batch come in a stable order, so a failed stream can be picked up where it stopped
+        """
+        return not batch.where and bool(self.key_columns or self.job.sort_column)
+
+    async def extract_source(self, batch: Batch, source: Connector, stream: BatchStream, writer: Optional[SpillWriter] = None, progress: Optional[ExtractProgress] = None) -> None:
+        """
+        Stream the rows of a batch from `source` into `stream`, also writing them to the spill cache with
+        `writer`. With `progress`, the rows it counts as streamed already are skipped and it is kept up to date
+        """
+        progress = progress or ExtractProgress()
+        keyset = not batch.where and bool(self.key_columns)
+        interval = 0 if batch.where else self.batch_size - progress.rows
+        if not batch.where and interval <= 0:
+            return
 
-    async def process_batch(self, offset: int) -> int:
-        # Create a new connector instance for each batch
-        batch_source = Connector.create_connector(
+        where, where_params = self.batch_filter(batch)
+        batch_rows = self.sizer.rows() if self.sizer else Config.stream_batch_rows
+        metrics.observe("stream_batch_rows", batch_rows, SIZE_BUCKETS, table=self.job.source_table)
+        fetch_start = None
+        query_start = time.perf_counter()
+        async for record_batch in source.iter_batches(
+            self.job.source_table,
+            batch_rows=batch_rows,
+            interval=interval,
+            offset=batch.offset + progress.rows,
+            sort_column=self.job.sort_column,
+            key_columns=self.key_columns if keyset else None,
+            after_key=progress.last_key if keyset and progress.rows else batch.after_key,
+            where=where,
+            where_params=where_params,
+            plan=self.transfer_plan
+        ):
+            fetched_at = time.perf_counter()
+            # The first record batch also waits on the query, only the ones after it measure the fetch rate
+            if self.sizer and fetch_start is not None:
+                self.sizer.observe(record_batch.num_rows, record_batch.nbytes, fetched_at - fetch_start)
+            # The governor counts the query time too, it's what rises first when the source gets busy
+            await self.governor.observe(record_batch.num_rows, record_batch.nbytes, fetched_at - (fetch_start or query_start))
+            if writer is not None:
+                await asyncio.to_thread(writer.write, record_batch)
+            await stream.put(record_batch)
+            progress.rows += record_batch.num_rows
+            if keyset and record_batch.num_rows:
+                progress.last_key = tuple(record_batch.column(column)[-1].as_py() for column in self.key_columns)
+            fetch_start = time.perf_counter()
+
+    async def extract_spilled(self, batch: Batch, entry: SpillEntry, stream: BatchStream) -> None:
+        """
+        Stream the rows of a batch from its memory-mapped file in the spill cache into `stream`
+        """
+        print(f"Batch {batch.batch_num} found in the spill cache, reading its {entry.num_rows:,} rows from {entry.path}")
+        metrics.increment("spill_cache_hits", table=self.job.source_table)
+        metrics.increment("spill_cache_rows", entry.num_rows, table=self.job.source_table)
+        record_batches = await asyncio.to_thread(lambda: list(self.spill_cache.read(entry)))
+        for record_batch in record_batches:
+            await stream.put(record_batch)
+
+    def spill_key(self, batch: Batch) -> str:
+        """
+        Spill cache key of a batch's rows: the source table, its schema and everything selecting the rows of the batch
+        """
+        where, where_params = self.batch_filter(batch)
+        selection = [
             self.job.source_engine,
             self.job.source_host,
-            int(self.job.source_port),
-            self.job.source_user,
-            self.job.source_password,
-            self.job.source_database
-        )
-        await batch_source.connect()
-        
-        batch_num = offset // self.batch_size
-        print(f"Processing batch {batch_num} starting at offset {offset:,}")
-        
-        data = await batch_source.read_table(
+            str(self.job.source_port),
+            self.job.source_database,
             self.job.source_table,
-            interval=self.batch_size,
-            offset=offset,
-            sort_column=self.job.sort_column
+            self.transfer_plan.fingerprint,
+            self.job.sort_column,
+            None if batch.where else self.key_columns,
+            0 if batch.where else self.batch_size,
+            batch.offset,
+            batch.after_key,
+            where,
+            where_params
+        ]
+        return hashlib.md5(json.dumps(selection, default=str).encode()).hexdigest()
+
+    async def encode_batch(self, stream: BatchStream, emit) -> None:
+        """
+        Pipeline stage appending the streamed rows of a batch to rolling parquet files
+        """
+        batch_num = stream.batch.batch_num
+        if stream.resumed_files is not None:
+            for parquet_file in stream.resumed_files:
+                await emit(parquet_file)
+            return
+
+        start_time = time.time()
+        chunk_wait = 0.0
+
+        async def next_chunk():
+            nonlocal chunk_wait
+            wait_start = time.time()
+            record_batch = await stream.get()
+            chunk_wait += time.time() - wait_start
+            return record_batch
+
+        try:
+            # The first record batch is the sample the encodings are tuned on
+            record_batch = await next_chunk()
+            parquet_config = await self.parquet_config(record_batch)
+            output_dir = f"{Config.local_dir}/{self.job.job_id}"
+            file_prefix = f"{self.job.source_table}_{batch_num}"
+            if self.encoder_pool:
+                sink = await self.encoder_pool.open_sink(output_dir, file_prefix, parquet_config)
+            else:
+                sink = ParquetService().open_sink(output_dir, file_prefix, parquet_config, self.encodes_in_memory())
+
+            try:
+                while record_batch is not None:
+                    for parquet_file in await asyncio.to_thread(sink.write, record_batch):
+                        await self.add_file(batch_num, parquet_file)
+                        await emit(parquet_file)
+                    record_batch = await next_chunk()
+
+                if stream.error is not None:
+                    raise Exception(f"Extracting batch {batch_num} failed: {str(stream.error)}")
+
+                for parquet_file in await asyncio.to_thread(sink.close):
+                    await self.add_file(batch_num, parquet_file)
+                    await emit(parquet_file)
+            finally:
+                if self.encoder_pool:
+                    await self.encoder_pool.release(sink)
+        except Exception as e:
+            # The extract would otherwise block on the full queue of a stream nobody reads anymore
+            await stream.abandon(e)
+            raise
+
+        self.manifest.mark_extracted(batch_num, sink.num_rows)
+        await self.manifest.flush()
+        self.rows_processed += sink.num_rows
+
+        elapsed_time = time.time() - start_time
+        table = self.job.source_table
+        metrics.observe("batch_seconds", elapsed_time, table=table)
+        metrics.observe("batch_chunk_wait_seconds", chunk_wait, table=table)
+        metrics.increment("extracted_rows", sink.num_rows, table=table)
+        metrics.record_batch(
+            table=table,
+            batch_num=batch_num,
+            num_rows=sink.num_rows,
+            num_files=len(sink.files),
+            file_bytes=sum(file.metrics.file_size_bytes for file in sink.files),
+            memory_bytes=sum(file.metrics.memory_size_bytes for file in sink.files),
+            seconds=elapsed_time,
+            # Time spent waiting on the source, the rest went to encoding or waiting on later stages
+            chunk_wait_seconds=chunk_wait
         )
-        
-        parquet_service = ParquetService()
-        output_path = f"{Config.local_dir}/{self.job.job_id}/{self.job.source_table}_{batch_num}.parquet"
-        await parquet_service.dataframe_to_parquet(data, output_path)
-        
+        print(f"Batch {batch_num} saved {sink.num_rows:,} rows to {len(sink.files)} parquet files in {elapsed_time:.2f} seconds")
+
+    async def parquet_config(self, sample: Optional[pa.RecordBatch]) -> ParquetConfig:
+        """
+        Settings for the parquet files of a batch, with the tuned per column encodings when Config.parquet_auto_tune is set
+        """
+        parquet_config = ParquetConfig(
+            target_file_bytes=Config.parquet_target_file_bytes,
+            target_file_rows=Config.parquet_target_file_rows
+        )
+        if Config.parquet_auto_tune and sample is not None:
+            parquet_config.columns = (await self.tune_encodings(sample)).columns
+        return parquet_config
+
+    async def tune_encodings(self, sample: pa.RecordBatch) -> EncodingPlan:
+        """
+        Tune the per column encodings once per job, reusing the plan saved by an interrupted run of it
+        """
+        async with self._tune_lock:
+            if self.encoding_plan is None:
+                plan_path = f"{Config.local_dir}/{self.job.job_id}/encoding_plan.json"
+                if os.path.exists(plan_path):
+                    self.encoding_plan = EncodingPlan.load(plan_path)
+                    print(f"Loaded parquet encoding plan from {plan_path}")
+                else:
+                    tuner = EncodingTuner(Config.parquet_tune_objective, Config.parquet_tune_bandwidth_bytes)
+                    self.encoding_plan = await asyncio.to_thread(tuner.tune, sample.slice(0, Config.parquet_tune_sample_rows))
+                    self.encoding_plan.save(plan_path)
+            return self.encoding_plan
+
+    async def add_file(self, batch_num: int, parquet_file: ParquetFile) -> None:
+        """
+        Record a parquet file completed by the encode stage in the manifest and the metrics
+        """
+        # Checksumming the file runs off the event loop
+        await asyncio.to_thread(self.manifest.add_file, batch_num, parquet_file.path, parquet_file.num_rows, parquet_file.buffer)
+        await self.manifest.flush()
+        file_metrics = parquet_file.metrics
+        table = self.job.source_table
+        metrics.observe("parquet_write_seconds", file_metrics.creation_time, table=table)
+        metrics.observe("parquet_file_bytes", file_metrics.file_size_bytes, SIZE_BUCKETS, table=table)
+        metrics.observe("parquet_file_rows", file_metrics.num_rows, SIZE_BUCKETS, table=table)
+        metrics.increment("parquet_bytes", file_metrics.file_size_bytes, table=table)
+        metrics.increment("parquet_memory_bytes", file_metrics.memory_size_bytes, table=table)
+
+    async def upload_file(self, parquet_file: ParquetFile, emit) -> None:
+        """
+        Pipeline stage uploading a parquet file to S3
+        """
+        output_path = parquet_file.path
+        if not self.manifest.file(output_path).uploaded:
+            if parquet_file.buffer is not None:
+                upload = lambda: asyncio.to_thread(self.s3.upload_buffer, parquet_file.buffer, self.s3_key(output_path))
+            else:
+                upload = lambda: asyncio.to_thread(self.s3.upload_parquet, output_path, self.s3_key(output_path))
+            uploaded = await self.retry_policy.run(upload, f"Uploading {output_path}", table=self.job.source_table)
+            if not uploaded:
+                raise Exception(f"Failed to upload {output_path} to S3")
+            self.manifest.mark_uploaded(output_path)
+            await self.manifest.flush()
+            if self.ingest:
+                self.ingest.file_uploaded(output_path)
+        # Let go of the in-memory file as soon as it is in S3
+        parquet_file.buffer = None
+        await emit(parquet_file)
+
+    async def load_file(self, parquet_file: ParquetFile, emit) -> None:
+        """
+        Pipeline stage loading a parquet file from Config.local_dir into the destination table when it can't ingest from S3
+        """
+        output_path = parquet_file.path
+        if self.manifest.file(output_path).loaded:
+            await emit(parquet_file)
+            return
+
+        async def load() -> None:
+            async with self.dest_pool.connection() as dest:
+                if Config.local_ingest:
+                    # The destination reads the exported file itself, the batch never goes back through a DataFrame
+                    await dest.ingest_local_parquet(self.job.dest_table, output_path, self.upserts())
+                else:
+                    table = await asyncio.to_thread(pq.read_table, output_path, memory_map=True)
+                    await dest.write_table(self.job.dest_table, table.to_pandas(), self.upserts())
+
+        # Every load is a single statement or transaction, so one that failed left nothing behind to duplicate
+        await self.retry_policy.run(load, f"Loading {output_path}", table=self.job.source_table)
+        self.manifest.mark_loaded(output_path)
+        await self.manifest.flush()
+        await emit(parquet_file)
+
+    def batch_filter(self, batch: Batch) -> Tuple[str, List[Any]]:
+        """
+        Combine the partition predicate of a batch with the job's incremental filter
+        """
+        conditions = [f"({where})" for where in (batch.where, self.where) if where]
+        return " AND ".join(conditions), list(batch.where_params or []) + self.where_params
+
+    def upserts(self) -> bool:
+        """
+        Whether loads replace destination rows with the same primary key instead of inserting duplicates
+        """
+        return self.watermark is not None
+
+    def s3_key(self, output_path: str) -> str:
+        return f"epic-shelter/{self.job.job_id}/{os.path.basename(output_path)}"
+
+    def loads_files(self) -> bool:
+        """
+        Whether the load stage writes each parquet file into the destination, rather than one S3 ingest at the end
+        """
+        return not self.ingests_from_s3()
+
+    def ingests_from_s3(self) -> bool:
+        """
+        Whether the destination loads the files the job uploads to S3 itself, other destinations are written directly
+        """
+        return Config.use_s3 and isinstance(self.dest, S3IngestConnector)
+
+    def ingests_in_background(self) -> bool:
+        """
+        Whether a destination pipeline loads the uploaded files while the job is still uploading them
+        """
+        return self.ingests_from_s3() and Config.s3_pipeline_background
+
+    def s3_ingest_path(self) -> str:
+        return f"{self.job.s3_bucket}/epic-shelter/{self.job.job_id}/*.parquet"
+
+    def encodes_in_memory(self) -> bool:
+        """
+        Whether parquet files are kept in memory and uploaded straight from there, skipping the local disk
+        """
+        # Files the load stage reads from Config.local_dir and files written by encoder processes have to be on disk
+        return Config.use_s3 and Config.s3_upload_from_memory and not self.loads_files() and not Config.encode_processes
+
+    def build_pipeline(self) -> Pipeline:
+        """
+        Build the extract, encode, upload and load stages for this job
+        """
+        stages = [
+            Stage("extract", self.isolated(self.extract_batch), Config.extract_workers, Config.pipeline_queue_size),
+            Stage("encode", self.isolated(self.encode_batch), Config.encode_workers, Config.pipeline_queue_size)
+        ]
         if Config.use_s3:
-            self.s3.upload_parquet(output_path, f"epic-shelter/{self.job.job_id}/{self.job.source_table}_{batch_num}.parquet")
-        
-        # If destination doesn't support parquet ingestion, write directly
-        if not Config.use_s3 or not hasattr(self.dest, 'ingest_parquet'):
-            batch_dest = Connector.create_connector(
-                self.job.dest_engine,
-                self.job.dest_host,
-                int(self.job.dest_port),
-                self.job.dest_user,
-                self.job.dest_password,
-                self.job.dest_database
-            )
-            await batch_dest.connect()
-            await batch_dest.write_table(self.job.dest_table, data)
-            await batch_dest.disconnect()
+            stages.append(Stage("upload", self.isolated(self.upload_file), Config.upload_workers, Config.pipeline_queue_size))
+        if self.loads_files():
+            stages.append(Stage("load", self.isolated(self.load_file), Config.load_workers, Config.pipeline_queue_size))
+        return Pipeline(stages, {"table": self.job.source_table})
+
+    def isolated(self, handler):
+        """
+        Wrap a pipeline stage handler so an item that still fails after its retries only fails its own batch,
+        and the files of a failed batch aren't passed on to the later stages
+        """
+        async def run(item, emit) -> None:
+            batch_num = self.batch_of(item)
+            if batch_num is None:
+                await handler(item, emit)
+                return
+            if isinstance(item, ParquetFile) and batch_num in self.failed_batches:
+                return
+            try:
+                await handler(item, emit)
+            except Exception as e:
+                self.fail_batch(batch_num, e)
+                await self.manifest.flush()
+        return run
+
+    def batch_of(self, item: Any) -> Optional[int]:
+        if isinstance(item, Batch):
+            return item.batch_num
+        if isinstance(item, BatchStream):
+            return item.batch.batch_num
+        if isinstance(item, ParquetFile):
+            return self.manifest.batch_of(item.path)
+        return None
 
-        await batch_source.disconnect()
-        print(f"Batch {batch_num} saved to {output_path}")
-        return len(data)
+    def fail_batch(self, batch_num: int, error: Exception) -> None:
+        if batch_num in self.failed_batches:
+            return
+        message = str(error) or type(error).__name__
+        print(f"Batch {batch_num} failed, continuing with the other batches: {message}")
+        self.failed_batches[batch_num] = message
+        self.manifest.mark_failed(batch_num, message)
+        metrics.increment("failed_batches", table=self.job.source_table)
 
-    def process_batch_sync(self, offset: int) -> int:
-        return asyncio.run(self.process_batch(offset))
+    def print_failed_batches(self) -> None:
+        print("\n=== Failed Batches ===")
+        for batch_num, error in sorted(self.failed_batches.items()):
+            record = self.manifest.batches[batch_num]
+            loaded = sum(1 for file in record.files if file.loaded)
+            line = f"Batch {batch_num}: {error}"
+            if loaded and not record.extracted:
+                # Rerunning extracts the batch again from the start, these rows will be loaded twice without upserts
+                line += f" ({loaded} of its files were loaded before it failed)"
+            print(line)
+        print("======================")
 
     async def run_job(self):
+        if self.job.destinations:
+            await self.run_fanout()
+            return
+
         start_time = time.time()
-        self.reset_export_dir()
+        manifest_path = f"{Config.local_dir}/{self.job.job_id}/manifest.json"
+        watermark_path = self.watermark_path()
+        if Config.incremental and os.path.exists(watermark_path):
+            self.watermark = Watermark.load(watermark_path)
+        # A finished incremental run leaves its manifest behind, the next run starts a new increment instead of resuming it
+        resuming = Config.resume and Manifest.exists(manifest_path) and (self.watermark is None or self.watermark.pending is not None)
+        if not resuming:
+            self.reset_export_dir()
         await self.initialize_connectors()
         schemas_match = await self.validate_schemas()
         if not schemas_match:
             raise Exception("Source and destination schemas do not match")
-        
+
+        if Config.incremental:
+            await self.begin_increment(watermark_path, resuming)
+
         start_row = 0
-        total_rows = await self.source.get_row_count(self.job.source_table)
+        total_rows = await self.source.get_row_count(self.job.source_table, self.where, self.where_params)
         end_row = total_rows
         print(f"Total rows: {total_rows}")
 
@@ -118,18 +693,67 @@ class JobService:
         if start_row > end_row:
             raise Exception("Start row offset is greater than end row offset")
         
-        if Config.reset_dest_table:
-            await self.dest.delete_table(self.job.dest_table)
+        if self.batch_plan is not None:
+            self.batch_size = self.batch_plan.batch_size
+            self.sizer = self.batch_plan.sizer
+        elif Config.adaptive_batch_size:
+            await self.size_batches()
 
-        with ThreadPoolExecutor(max_workers=2 * multiprocessing.cpu_count()) as executor:  # Adjust max_workers as needed
-            futures = [
-                executor.submit(self.process_batch_sync, offset)
-                for offset in range(start_row, end_row, self.batch_size)
-            ]
-            results = [future.result() for future in futures]
+        if resuming:
+            batches = await self.resume_batches(manifest_path)
+        else:
+            if Config.reset_dest_table and self.watermark and self.watermark.value is not None:
+                print("Keeping the destination table, incremental runs only upsert the rows past the watermark")
+            elif Config.reset_dest_table:
+                await self.dest.delete_table(self.job.dest_table)
 
-        if Config.use_s3 and hasattr(self.dest, 'ingest_parquet'):
-            await self.dest.ingest_parquet(self.job.dest_table, f"{self.job.s3_bucket}/epic-shelter/{self.job.job_id}/*.parquet", self.job.s3_access_key_id, self.job.s3_secret_access_key)
+            if self.batch_plan is not None:
+                self.key_columns = list(self.batch_plan.key_columns)
+                batches = list(self.batch_plan.batches)
+            else:
+                batches = await self.plan_batches(start_row, end_row)
+            print(f"Planned {len(batches)} batches")
+            self.manifest = Manifest(manifest_path, [
+                BatchRecord(batch.batch_num, batch.offset, batch.after_key, batch.where, batch.where_params)
+                for batch in batches
+            ], self.key_columns, self.batch_size)
+            self.manifest.save()
+
+        pipeline_start = time.time()
+        if Config.spill_cache and self.spill_cache is None:
+            self.spill_cache = create_spill_cache()
+        if Config.encode_processes and self.encoder_pool is None:
+            self.encoder_pool = EncoderPool(Config.encode_workers)
+        if self.ingests_in_background():
+            self.ingest = PipelineIngest(self.dest, self.manifest, self.job.dest_table, self.s3_key, Config.s3_pipeline_poll_seconds)
+            await self.ingest.start(self.s3_ingest_path(), self.job.s3_access_key_id, self.job.s3_secret_access_key)
+        try:
+            try:
+                await self.build_pipeline().run(batches)
+            finally:
+                if self.owns_encoder_pool and self.encoder_pool:
+                    await self.encoder_pool.close()
+                    self.encoder_pool = None
+            if self.ingest:
+                # The files of the batches that failed were never uploaded, the pipeline only has to finish the others
+                await self.ingest.finish()
+        finally:
+            if self.ingest:
+                await self.ingest.close()
+                self.ingest = None
+        if self.s3:
+            self.s3.print_summary(time.time() - pipeline_start)
+
+        if self.failed_batches:
+            # The export directory and manifest are kept, so rerunning the job retries only the failed batches
+            self.print_failed_batches()
+            self.write_metrics(time.time() - start_time, total_rows)
+            raise Exception(f"{len(self.failed_batches)} of {len(batches)} batches failed, rerun the job to retry them")
+
+        if self.ingests_from_s3() and not self.ingests_in_background():
+            await self.dest.ingest_parquet(self.job.dest_table, self.s3_ingest_path(), self.job.s3_access_key_id, self.job.s3_secret_access_key)
+            self.manifest.mark_all_loaded()
+            await self.manifest.flush()
         
         if Config.use_s3:
             self.delete_export_dir()
@@ -143,13 +767,23 @@ class JobService:
         row_counts_match = await self.validate_row_counts()
         if not row_counts_match:
             raise Exception("Source and destination row counts do not match")
+
+        if Config.checksum_validation:
+            checksums_match = await self.validate_checksums()
+            if not checksums_match:
+                raise Exception("Source and destination contents do not match")
+
+        if self.watermark is not None:
+            self.watermark.commit()
+            self.watermark.save(watermark_path)
+            print(f"Advanced the {self.watermark.column} watermark to {self.watermark.value}")
         
-        await self.source.disconnect()
-        await self.dest.disconnect()
+        await self.close_connectors()
 
         end_time = time.time()
         elapsed_time = end_time - start_time
         rows_per_second = total_rows / elapsed_time
+        self.write_metrics(elapsed_time, total_rows)
 
         print("Job completed successfully!")
         print("\n=== Export Summary ===")
@@ -159,6 +793,304 @@ class JobService:
         print(f"Finished at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("=====================")
 
+    async def run_fanout(self) -> None:
+        """
+        Copy the source table into the job's destination and each of its extra destinations at once, running a
+        single destination job for each. They share the source pool and the spill cache, so every batch is read
+        from the source once and every destination loads it from the cached file
+        """
+        start_time = time.time()
+        destinations = [self.job.primary_destination()] + self.job.destinations
+        if self.owns_pools:
+            # Every destination job holds a source connector for planning on top of the ones its extract stage uses
+            self.source_pool = create_pool(
+                self.job.source_engine,
+                self.job.source_host,
+                int(self.job.source_port),
+                self.job.source_user,
+                self.job.source_password,
+                self.job.source_database,
+                Config.src_pool_size + len(destinations) - 1
+            )
+        spill_cache = self.spill_cache or create_spill_cache()
+        if Config.encode_processes and self.encoder_pool is None:
+            self.encoder_pool = EncoderPool(Config.encode_workers)
+        try:
+            batch_plan = await self.plan_fanout()
+        except BaseException:
+            if self.owns_pools:
+                await self.source_pool.close()
+            raise
+
+        services = []
+        for index, destination in enumerate(destinations):
+            dest_pool = create_pool(
+                destination.engine,
+                destination.host,
+                int(destination.port),
+                destination.user,
+                destination.password,
+                destination.database,
+                Config.dest_pool_size
+            )
+            job = self.job.for_destination(destination, f"{self.job.job_id}-{index}")
+            service = JobService(job, self.source_pool, dest_pool, self.encoder_pool, spill_cache, self.governor)
+            service.batch_size = self.batch_size
+            service.batch_plan = batch_plan
+            services.append(service)
+
+        failed = []
+
+        async def run_destination(service: JobService) -> None:
+            try:
+                await service.run_job()
+            except Exception as e:
+                # One failing destination shouldn't stop the others from loading the batches they share
+                print(f"Error copying {self.job.source_table} into {service.job.dest_database}.{service.job.dest_table}: {str(e)}")
+                failed.append(f"{service.job.dest_database}.{service.job.dest_table}")
+            finally:
+                await service.close_connectors()
+                await service.dest_pool.close()
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                for service in services:
+                    group.create_task(run_destination(service))
+        finally:
+            if self.owns_pools:
+                await self.source_pool.close()
+            if self.owns_encoder_pool and self.encoder_pool:
+                await self.encoder_pool.close()
+                self.encoder_pool = None
+
+        self.rows_processed = sum(service.rows_processed for service in services)
+        elapsed_time = time.time() - start_time
+        print("\n=== Fan-out Summary ===")
+        for service in services:
+            status = "failed" if f"{service.job.dest_database}.{service.job.dest_table}" in failed else "completed"
+            print(f"{service.job.dest_database}.{service.job.dest_table}: {status}, {service.rows_processed:,} rows")
+        print(f"Spill cache: {len(spill_cache.entries)} batches, {spill_cache.size_bytes() / (1024 * 1024):,.1f} MB")
+        print(f"Total time: {elapsed_time:.2f} seconds")
+        print("=======================")
+        if failed:
+            raise Exception(f"Failed to copy into destinations: {', '.join(failed)}")
+
+    async def plan_fanout(self) -> Optional[BatchPlan]:
+        """
+        Size and plan the batches of a fan-out once, so every destination job selects the same batches and only
+        the first to reach a batch reads it from the source
+        """
+        if Config.incremental:
+            # Every destination has its own watermark, their increments and so their batches can differ
+            return None
+
+        async with self.source_pool.connection() as source:
+            self.source = source
+            try:
+                self.source_schema = await source.get_table_schema(self.job.source_table)
+                if not self.source_schema:
+                    raise Exception(f"Could not get the schema of {self.job.source_table}")
+                self.transfer_plan = await source.get_transfer_plan(self.job.source_table, self.source_schema)
+                total_rows = await source.get_row_count(self.job.source_table)
+                start_row = self.job.start_offset or 0
+                end_row = self.job.end_offset or total_rows
+                if Config.adaptive_batch_size:
+                    await self.size_batches()
+                batches = await self.plan_batches(start_row, end_row)
+            finally:
+                self.source = None
+        return BatchPlan(self.batch_size, list(self.key_columns), self.sizer, batches)
+
+    def write_metrics(self, elapsed_time: float, total_rows: int) -> None:
+        """
+        Write the job's metrics as JSON, and in the Prometheus text format when Config.metrics_textfile is set
+        """
+        metrics_dir = Config.metrics_dir or f"{Config.local_dir}/metrics"
+        report_path = f"{metrics_dir}/{self.job.job_id}.json"
+        metrics.write_json(
+            report_path,
+            table=self.job.source_table,
+            job_id=self.job.job_id,
+            source_table=self.job.source_table,
+            dest_table=self.job.dest_table,
+            total_rows=total_rows,
+            failed_batches=[{"batch_num": batch_num, "error": error} for batch_num, error in sorted(self.failed_batches.items())],
+            elapsed_seconds=elapsed_time,
+            finished_at=datetime.now().isoformat()
+        )
+        print(f"Wrote metrics report to {report_path}")
+        if Config.metrics_textfile:
+            metrics.write_prometheus(Config.metrics_textfile)
+
+    def watermark_path(self) -> str:
+        watermark_dir = Config.watermark_dir or f"{Config.local_dir}/watermarks"
+        return f"{watermark_dir}/{self.job.source_database}.{self.job.source_table}-{self.job.dest_database}.{self.job.dest_table}.json"
+
+    async def begin_increment(self, watermark_path: str, resuming: bool) -> None:
+        """
+        Pick the rows this incremental run copies: everything past the last watermark, up to the current maximum
+        """
+        if self.watermark is None:
+            column = Config.watermark_column or await self.default_key_column()
+            if not column:
+                raise Exception("Incremental sync requires a watermark column, sort column or primary key")
+            self.watermark = Watermark(column)
+
+        # An interrupted run is resumed with the same upper bound so its planned batches stay valid
+        if not resuming or self.watermark.pending is None:
+            _, self.watermark.pending = await self.source.get_key_range(self.job.source_table, self.watermark.column)
+            self.watermark.save(watermark_path)
+
+        self.where, self.where_params = self.watermark.predicate()
+        if self.watermark.value is None:
+            print(f"No watermark yet, copying every row up to {self.watermark.column} = {self.watermark.pending}")
+        else:
+            print(f"Copying rows with {self.watermark.column} after {self.watermark.value} up to {self.watermark.pending}")
+
+    async def resume_batches(self, manifest_path: str) -> List[Batch]:
+        """
+        Load the manifest of an earlier run of this job and return the batches it didn't finish
+        """
+        self.manifest = Manifest.load(manifest_path)
+        self.key_columns = self.manifest.key_columns
+        # Manifests from before batches were sized per table were planned with the default size
+        self.batch_size = self.manifest.batch_size or DEFAULT_BATCH_SIZE
+
+        batches = []
+        completed = 0
+        for record in self.manifest.batches.values():
+            if record.extracted and not await self.verify_batch_files(record):
+                print(f"Batch {record.batch_num} has missing or corrupt files, extracting it again")
+                self.manifest.reset_batch(record.batch_num)
+            elif not record.extracted and record.files:
+                # Drop the files of a batch that was interrupted halfway through
+                self.manifest.reset_batch(record.batch_num)
+
+            if record.is_complete(Config.use_s3, self.loads_files()):
+                completed += 1
+                continue
+            record.error = None
+            self.manifest.mark_changed(record.batch_num)
+
+            batches.append(Batch(
+                batch_num=record.batch_num,
+                offset=record.offset,
+                after_key=tuple(record.after_key) if record.after_key is not None else None,
+                where=record.where,
+                where_params=record.where_params
+            ))
+
+        await self.manifest.flush()
+        print(f"Resuming job {self.job.job_id}: {completed} batches already completed, {len(batches)} remaining")
+        return batches
+
+    async def verify_batch_files(self, record: BatchRecord) -> bool:
+        """
+        Check the files of an extracted batch against their checksums, locally and in S3
+        """
+        for file in record.files:
+            local_ok = os.path.exists(file.path) and await asyncio.to_thread(file_checksum, file.path) == file.checksum
+
+            if Config.use_s3 and file.uploaded and not await asyncio.to_thread(self.s3.object_exists, self.s3_key(file.path), file.checksum):
+                print(f"{file.path} is missing from S3, uploading it again")
+                file.uploaded = False
+                self.manifest.mark_changed(record.batch_num)
+
+            if local_ok:
+                continue
+            # Without the local copy the file can only be skipped if nothing still needs to read it
+            if not (file.uploaded or not Config.use_s3) or not (file.loaded or not self.loads_files()):
+                return False
+        return True
+
+    async def size_batches(self) -> None:
+        """
+        Size the planned batches and the streamed record batches from the average
+        row width, estimated from the declared column types and then measured on a
+        sample of rows
+        """
+        row_bytes = estimate_row_bytes(self.source_schema)
+        sample = await self.source.read_table_arrow(self.job.source_table, ROW_SAMPLE_SIZE, where=self.where, where_params=self.where_params, plan=self.transfer_plan)
+        if sample.num_rows:
+            row_bytes = sample.nbytes / sample.num_rows
+
+        self.batch_size = planned_batch_rows(row_bytes, Config.batch_target_bytes)
+        # Every extract worker can have a full queue of record batches waiting, plus the one being encoded
+        in_flight = Config.extract_workers * (Config.pipeline_queue_size + 1)
+        self.sizer = BatchSizer(row_bytes, Config.stream_memory_bytes, in_flight, Config.stream_target_seconds)
+        print(f"Estimated {row_bytes:,.0f} bytes per row, planning batches of {self.batch_size:,} rows streamed {self.sizer.rows():,} rows at a time")
+
+    async def plan_batches(self, start_row: int, end_row: int) -> List[Batch]:
+        """
+        Plan the batches to extract between the start and end rows
+        """
+        if Config.partition_count:
+            return await self.plan_partitions()
+
+        self.key_columns = []
+        if Config.use_keyset:
+            self.key_columns = await self.source.get_primary_key_columns(self.job.source_table)
+
+        if not self.key_columns:
+            return [
+                Batch(batch_num=offset // self.batch_size, offset=offset)
+                for offset in range(start_row, end_row, self.batch_size)
+            ]
+
+        print(f"Using keyset pagination on {', '.join(self.key_columns)}")
+        boundaries = await self.source.get_key_boundaries(self.job.source_table, self.key_columns, self.batch_size, self.where, self.where_params)
+
+        # Batch n starts right after the last key of batch n - 1, offsets are rounded to batch boundaries
+        batches = []
+        for batch_num, after_key in enumerate([None] + boundaries):
+            offset = batch_num * self.batch_size
+            if offset + self.batch_size > start_row and offset < end_row:
+                batches.append(Batch(batch_num=batch_num, offset=offset, after_key=after_key))
+        return batches
+
+    async def plan_partitions(self) -> List[Batch]:
+        """
+        Plan one batch per key range partition, reusing the saved plan at Config.partition_plan_path if there is one
+        """
+        key_column = Config.partition_column or await self.default_key_column()
+        if not key_column:
+            raise Exception("Partitioning requires a partition column, sort column or primary key")
+
+        plan = None
+        if Config.partition_plan_path and os.path.exists(Config.partition_plan_path):
+            plan = PartitionPlan.load(Config.partition_plan_path)
+            # A plan saved for another table or key column would select the wrong rows
+            if plan.table_name != self.job.source_table or plan.key_column != key_column:
+                print(f"Partition plan at {Config.partition_plan_path} splits {plan.table_name}.{plan.key_column} instead of {self.job.source_table}.{key_column}, planning again")
+                plan = None
+            else:
+                print(f"Loaded partition plan from {Config.partition_plan_path}")
+
+        if plan is None:
+            planner = PartitionPlanner(self.source, Config.partition_sample_size)
+            plan = await planner.plan(self.job.source_table, key_column, Config.partition_count)
+            if Config.partition_plan_path:
+                plan.save(Config.partition_plan_path)
+                print(f"Saved partition plan to {Config.partition_plan_path}")
+
+        if self.job.start_offset or self.job.end_offset:
+            print("Start and end offsets are ignored when partitioning")
+
+        batches = []
+        for partition in plan.partitions:
+            where, where_params = partition.predicate(plan.key_column, plan.key_type)
+            batches.append(Batch(batch_num=partition.index, where=where, where_params=where_params))
+        return batches
+
+    async def default_key_column(self) -> Optional[str]:
+        """
+        The sort column, or else the first primary key column, to split the source table on
+        """
+        if self.job.sort_column:
+            return self.job.sort_column
+        primary_key = await self.source.get_primary_key_columns(self.job.source_table)
+        return primary_key[0] if primary_key else None
+
     def reset_export_dir(self):
         if os.path.exists(f"{Config.local_dir}/{self.job.job_id}"):
             for file in os.listdir(f"{Config.local_dir}/{self.job.job_id}"):
@@ -179,26 +1111,29 @@ class JobService:
         """
         Initialize the source and destination connectors
         """
-        self.source = Connector.create_connector(
-            self.job.source_engine,
-            self.job.source_host,
-            int(self.job.source_port),
-            self.job.source_user,
-            self.job.source_password,
-            self.job.source_database
-        )
-        
-        self.dest = Connector.create_connector(
-            self.job.dest_engine,
-            self.job.dest_host,
-            int(self.job.dest_port),
-            self.job.dest_user,
-            self.job.dest_password,
-            self.job.dest_database
-        )
+        if self.owns_pools:
+            self.source_pool = create_pool(
+                self.job.source_engine,
+                self.job.source_host,
+                int(self.job.source_port),
+                self.job.source_user,
+                self.job.source_password,
+                self.job.source_database,
+                Config.src_pool_size
+            )
+            self.dest_pool = create_pool(
+                self.job.dest_engine,
+                self.job.dest_host,
+                int(self.job.dest_port),
+                self.job.dest_user,
+                self.job.dest_password,
+                self.job.dest_database,
+                Config.dest_pool_size
+            )
 
-        await self.source.connect()
-        await self.dest.connect()
+        # The job keeps one connector from each pool for planning and validation queries
+        self.source = await self.source_pool.checkout()
+        self.dest = await self.dest_pool.checkout()
 
         can_connect_source = await self.source.test_connection()
         can_connect_dest = await self.dest.test_connection()
@@ -212,25 +1147,86 @@ class JobService:
             self.s3 = S3Service(
                 self.job.s3_bucket,
                 self.job.s3_access_key_id,
-                self.job.s3_secret_access_key
+                self.job.s3_secret_access_key,
+                endpoint_url=Config.s3_endpoint_url,
+                multipart_chunksize=Config.s3_multipart_chunk_bytes,
+                max_concurrency=Config.s3_max_concurrency,
+                # Every upload worker can have max_concurrency parts in flight on the shared client
+                max_pool_connections=max(10, Config.upload_workers * Config.s3_max_concurrency)
             )
 
+    async def close_connectors(self):
+        """
+        Return the job's connectors and close every pooled connection, unless the pools are shared
+        """
+        if self.source is not None:
+            await self.source_pool.release(self.source)
+            self.source = None
+        if self.dest is not None:
+            await self.dest_pool.release(self.dest)
+            self.dest = None
+        if self.owns_pools:
+            await self.source_pool.close()
+            await self.dest_pool.close()
+
     async def validate_schemas(self) -> bool:
         """
         Validate the schemas of the source and destination tables
         """
-        source_schema = await self.source.get_table_schema(self.job.source_table)
+        self.source_schema = await self.source.get_table_schema(self.job.source_table)
         dest_schema = await self.dest.get_table_schema(self.job.dest_table)
+        if not self.source_schema or self.source_schema != dest_schema:
+            return False
 
-        return source_schema == dest_schema
+        # Every batch decodes rows with the same plan so their parquet files line up, and loads find
+        # the destination's columns in its cached plan instead of describing the table again
+        self.transfer_plan = await self.source.get_transfer_plan(self.job.source_table, self.source_schema)
+        await self.dest.get_transfer_plan(self.job.dest_table, dest_schema)
+        self.arrow_schema = self.transfer_plan.arrow_schema
+        return True
     
     async def validate_row_counts(self) -> bool:
         """
         Validate the row counts of the source and destination tables
         """
+        if self.watermark is not None:
+            # Source rows updated past the pending watermark or deleted once copied would throw off a count of
+            # the source, so incremental runs check the destination holds every row extracted in the increment
+            where, where_params = self.watermark.predicate()
+            extracted_rows = sum(batch.num_rows for batch in self.manifest.batches.values())
+            dest_row_count = await self.dest.get_row_count(self.job.dest_table, where, where_params)
+            return extracted_rows == dest_row_count
+
         source_row_count = await self.source.get_row_count(self.job.source_table)
         dest_row_count = await self.dest.get_row_count(self.job.dest_table)
 
         return source_row_count == dest_row_count
-    
-    
\ No newline at end of file
+
+    async def validate_checksums(self) -> bool:
+        """
+        Compare the contents of the source and destination tables with per key range checksums
+        """
+        validator = ChecksumValidator(
+            self.source_pool,
+            self.dest_pool,
+            self.job.source_table,
+            self.job.dest_table,
+            self.arrow_schema.names,
+            Config.checksum_workers,
+            Config.checksum_drilldown_rows,
+            Config.checksum_max_mismatches,
+            *(self.watermark.upper_predicate() if self.watermark else ("", []))
+        )
+
+        plan = None
+        key_column = Config.checksum_column or await self.default_key_column()
+        if key_column:
+            planner = PartitionPlanner(self.source, Config.partition_sample_size)
+            plan = await planner.plan(self.job.source_table, key_column, Config.checksum_ranges)
+        else:
+            print("No key column to split the table on, checksumming it as a single range")
+
+        mismatches = await validator.validate(plan)
+        for mismatch in mismatches:
+            print(f"Row with key {mismatch.key} is {mismatch.kind} in the destination")
+        return not mismatches
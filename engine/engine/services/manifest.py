@@ -0,0 +1,202 @@
+from dataclasses import dataclass, field, asdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Set
+import asyncio
+import hashlib
+import json
+import os
+import threading
+
+@dataclass
+class FileRecord:
+    path: str
+    num_rows: int
+    checksum: str
+    uploaded: bool = False
+    loaded: bool = False
+
+@dataclass
+class BatchRecord:
+    batch_num: int
+    offset: int = 0
+    after_key: Optional[List[Any]] = None
+    where: str = ""
+    where_params: Optional[List[Any]] = None
+    # Extracted once every parquet file of the batch has been written and checksummed
+    extracted: bool = False
+    num_rows: int = 0
+    files: List[FileRecord] = field(default_factory=list)
+    # Last error of a batch that failed, cleared when it is retried
+    error: Optional[str] = None
+
+    def is_complete(self, needs_upload: bool, needs_load: bool) -> bool:
+        if not self.extracted:
+            return False
+        return all(
+            (file.uploaded or not needs_upload) and (file.loaded or not needs_load)
+            for file in self.files
+        )
+
+class Manifest:
+    """
+    Durable record of a job's batches and the parquet files they produced, saved
+    as JSON under Config.local_dir/{job_id} so a rerun of the same job can skip
+    the work that already finished. Changes are recorded in memory and written
+    by `flush`, which pipeline stages await after every change: it writes off
+    the event loop, and changes made while a write is running are written
+    together by the next one
+    """
+    def __init__(self, path: str, batches: List[BatchRecord], key_columns: Optional[List[str]] = None, batch_size: Optional[int] = None):
+        self.path = path
+        self.key_columns = key_columns or []
+        # Rows per keyset or offset batch, resumed batches have to be read with the size they were planned with
+        self.batch_size = batch_size
+        self.batches = {batch.batch_num: batch for batch in batches}
+        self._files = {file.path: file for batch in batches for file in batch.files}
+        self._batch_nums = {file.path: batch.batch_num for batch in batches for file in batch.files}
+        # Serialized batches, rebuilt only for the batches changed since the last write
+        self._records: Dict[int, Dict[str, Any]] = {}
+        self._dirty: Set[int] = set(self.batches)
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(path)
+
+    @staticmethod
+    def load(path: str) -> "Manifest":
+        with open(path) as f:
+            data = json.load(f, object_hook=_decode)
+        batches = []
+        for batch in data["batches"]:
+            files = [FileRecord(**file) for file in batch.pop("files")]
+            batches.append(BatchRecord(files=files, **batch))
+        return Manifest(path, batches, data["key_columns"], data.get("batch_size"))
+
+    def save(self) -> None:
+        self._write(self._snapshot())
+
+    async def flush(self) -> None:
+        """Write the changes made since the last write, without blocking the event loop"""
+        if not self._dirty:
+            return
+        async with self._flush_lock:
+            # A write that ran while this one waited may have covered its changes already
+            if not self._dirty:
+                return
+            await asyncio.to_thread(self._write, self._snapshot())
+
+    def _snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            for batch_num in dirty:
+                self._records[batch_num] = asdict(self.batches[batch_num])
+            return {
+                "key_columns": self.key_columns,
+                "batch_size": self.batch_size,
+                "batches": [self._records[batch_num] for batch_num in self.batches]
+            }
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        # Write to a temporary file first so a crash never leaves a truncated manifest behind
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(data, f, indent=2, default=_encode)
+        os.replace(temp_path, self.path)
+
+    def reset_batch(self, batch_num: int) -> None:
+        """Forget the files of a batch so it is extracted again"""
+        batch = self.batches[batch_num]
+        for file in batch.files:
+            self._files.pop(file.path, None)
+            self._batch_nums.pop(file.path, None)
+            if os.path.exists(file.path):
+                os.unlink(file.path)
+        batch.files = []
+        batch.extracted = False
+        batch.num_rows = 0
+        batch.error = None
+        self._dirty.add(batch_num)
+
+    def add_file(self, batch_num: int, path: str, num_rows: int, buffer: Optional[Any] = None) -> FileRecord:
+        """Record a completed parquet file, checksumming `buffer` instead of the file on disk for in-memory files"""
+        checksum = hashlib.md5(buffer).hexdigest() if buffer is not None else file_checksum(path)
+        record = FileRecord(path=path, num_rows=num_rows, checksum=checksum)
+        with self._lock:
+            self.batches[batch_num].files.append(record)
+            self._files[path] = record
+            self._batch_nums[path] = batch_num
+            self._dirty.add(batch_num)
+        return record
+
+    def mark_extracted(self, batch_num: int, num_rows: int) -> None:
+        batch = self.batches[batch_num]
+        batch.extracted = True
+        batch.num_rows = num_rows
+        self._dirty.add(batch_num)
+
+    def mark_failed(self, batch_num: int, error: str) -> None:
+        self.batches[batch_num].error = error
+        self._dirty.add(batch_num)
+
+    def mark_uploaded(self, path: str) -> None:
+        self._files[path].uploaded = True
+        self._dirty.add(self._batch_nums[path])
+
+    def mark_loaded(self, path: str) -> None:
+        self._files[path].loaded = True
+        self._dirty.add(self._batch_nums[path])
+
+    def mark_all_loaded(self) -> None:
+        for file in self._files.values():
+            file.loaded = True
+        self._dirty.update(self.batches)
+
+    def mark_changed(self, batch_num: int) -> None:
+        """Record a change made to a batch or its files directly, to be written by the next flush"""
+        self._dirty.add(batch_num)
+
+    def file(self, path: str) -> Optional[FileRecord]:
+        return self._files.get(path)
+
+    def batch_of(self, path: str) -> Optional[int]:
+        """The number of the batch that produced a file"""
+        return self._batch_nums.get(path)
+
+def file_checksum(path: str) -> str:
+    # MD5 matches the ETag S3 reports for single part uploads
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _encode(value: Any) -> Dict[str, Any]:
+    if isinstance(value, datetime):
+        return {"__type__": "datetime", "value": value.isoformat()}
+    if isinstance(value, date):
+        return {"__type__": "date", "value": value.isoformat()}
+    if isinstance(value, time):
+        return {"__type__": "time", "value": value.isoformat()}
+    if isinstance(value, timedelta):
+        return {"__type__": "timedelta", "value": value.total_seconds()}
+    if isinstance(value, Decimal):
+        return {"__type__": "decimal", "value": str(value)}
+    if isinstance(value, bytes):
+        return {"__type__": "bytes", "value": value.hex()}
+    raise TypeError(f"Cannot serialize {type(value).__name__} to the manifest")
+
+def _decode(value: Dict[str, Any]) -> Any:
+    decoders = {
+        "datetime": datetime.fromisoformat,
+        "date": date.fromisoformat,
+        "time": time.fromisoformat,
+        "timedelta": lambda seconds: timedelta(seconds=seconds),
+        "decimal": Decimal,
+        "bytes": bytes.fromhex
+    }
+    if "__type__" in value:
+        return decoders[value["__type__"]](value["value"])
+    return value
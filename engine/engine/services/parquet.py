@@ -10,6 +10,9 @@ from typing import Dict, List, Any
 import os
 import time
 
+from engine.config.config import Config
+from engine.services.metrics import metrics
+
 class CompressionType(str, Enum):
     NONE = "none"
     SNAPPY = "snappy" 
@@ -18,16 +21,54 @@ class CompressionType(str, Enum):
     LZ4 = "lz4"
     ZSTD = "zstd"
 
+@dataclass
+class ColumnEncoding:
+    compression: CompressionType = CompressionType.SNAPPY
+    # Only used by codecs with levels, such as ZSTD
+    compression_level: Optional[int] = None
+    # Parquet encoding such as PLAIN or BYTE_STREAM_SPLIT, dictionary encoding when None
+    encoding: Optional[str] = None
+
 class ParquetConfig:
     def __init__(
         self,
         compression: CompressionType = CompressionType.SNAPPY,
         row_group_size: int = 100000,
-        enable_statistics: bool = True
+        enable_statistics: bool = True,
+        target_file_bytes: int = 256 * 1024 * 1024,
+        target_file_rows: int = 0,
+        columns: Optional[Dict[str, ColumnEncoding]] = None
     ):
         self.compression = compression
         self.row_group_size = row_group_size
         self.enable_statistics = enable_statistics
+        # Files roll over once either target is reached, 0 disables a target
+        self.target_file_bytes = target_file_bytes
+        self.target_file_rows = target_file_rows
+        # Per column codecs and encodings, columns not listed use `compression` with dictionary encoding
+        self.columns = columns or {}
+
+    def writer_options(self, schema: pa.Schema) -> Dict[str, Any]:
+        """Keyword arguments for pq.ParquetWriter writing tables of `schema`"""
+        if not self.columns:
+            return {"compression": self.compression.value, "write_statistics": self.enable_statistics}
+
+        columns = {name: self.columns.get(name, ColumnEncoding(self.compression)) for name in schema.names}
+        options = {
+            "compression": {name: column.compression.value for name, column in columns.items()},
+            "use_dictionary": [name for name, column in columns.items() if column.encoding is None],
+            "write_statistics": self.enable_statistics
+        }
+        levels = {name: column.compression_level for name, column in columns.items() if column.compression_level is not None}
+        if levels:
+            options["compression_level"] = levels
+        encodings = {name: column.encoding for name, column in columns.items() if column.encoding is not None}
+        if encodings:
+            options["column_encoding"] = encodings
+        return options
+
+    def compression_name(self) -> str:
+        return "per-column" if self.columns else self.compression.value
 
 @dataclass
 class ParquetMetrics:
@@ -58,9 +99,40 @@ class ParquetService:
         table = pa.Table.from_pandas(df)
         self._write_parquet(table, output_path, config)
         creation_time = time.time() - start_time
-        print(f"Parquet file creation time: {creation_time:.2f} seconds")
+        metrics.observe("parquet_write_seconds", creation_time)
+        if Config.verbose:
+            print(f"Parquet file creation time: {creation_time:.2f} seconds")
         return output_path
 
+    async def table_to_parquet(
+        self,
+        table: pa.Table,
+        output_path: str,
+        config: Optional[ParquetConfig] = None
+    ) -> str:
+        if config is None:
+            config = ParquetConfig()
+
+        start_time = time.time()
+        self._write_parquet(table, output_path, config)
+        creation_time = time.time() - start_time
+        metrics.observe("parquet_write_seconds", creation_time)
+        if Config.verbose:
+            print(f"Parquet file creation time: {creation_time:.2f} seconds")
+        return output_path
+
+    def open_sink(
+        self,
+        output_dir: str,
+        file_prefix: str,
+        config: Optional[ParquetConfig] = None,
+        in_memory: bool = False
+    ) -> "ParquetSink":
+        if config is None:
+            config = ParquetConfig()
+
+        return ParquetSink(output_dir, file_prefix, config, in_memory)
+
     def _write_parquet(
         self,
         table: pa.Table,
@@ -70,7 +142,154 @@ class ParquetService:
         pq.write_table(
             table,
             output_path,
-            compression=config.compression.value,
             row_group_size=config.row_group_size,
-            write_statistics=config.enable_statistics
-        )
\ No newline at end of file
+            **config.writer_options(table.schema)
+        )
+
+@dataclass
+class ParquetFile:
+    path: str
+    num_rows: int
+    # Contents of files written to memory instead of `path`
+    buffer: Optional[pa.Buffer] = None
+    metrics: Optional[ParquetMetrics] = None
+
+class ParquetSink:
+    """
+    Appends record batches to a series of parquet files, writing full row groups
+    of `row_group_size` rows and rolling over to a new file once the file
+    reaches `target_file_bytes` or `target_file_rows`. With `in_memory` the files
+    are kept as Arrow buffers and never touch the disk
+    """
+    def __init__(self, output_dir: str, file_prefix: str, config: ParquetConfig, in_memory: bool = False):
+        self.output_dir = output_dir
+        self.file_prefix = file_prefix
+        self.config = config
+        self.in_memory = in_memory
+        self.files: List[ParquetFile] = []
+        self.num_rows = 0
+
+        self._buffer: List[pa.RecordBatch] = []
+        self._buffered_rows = 0
+        self._file = None
+        self._writer = None
+        self._path = None
+        self._file_rows = 0
+        self._file_memory = 0
+        self._file_write_time = 0.0
+
+    def write(self, batch: pa.RecordBatch) -> List[ParquetFile]:
+        """Append a batch, returning any files completed by it"""
+        completed = []
+        if batch.num_rows == 0:
+            return completed
+
+        self._buffer.append(batch)
+        self._buffered_rows += batch.num_rows
+        while self._buffered_rows >= self._next_row_group_size():
+            completed.extend(self._flush_row_group(self._next_row_group_size()))
+        return completed
+
+    def close(self) -> List[ParquetFile]:
+        """Flush the remaining rows and close the current file, returning the files it completed"""
+        completed = []
+        while self._buffered_rows:
+            completed.extend(self._flush_row_group(min(self._buffered_rows, self._next_row_group_size())))
+        if self._writer:
+            completed.append(self._roll())
+        return completed
+
+    def _next_row_group_size(self) -> int:
+        size = self.config.row_group_size
+        if self.config.target_file_rows:
+            size = min(size, self.config.target_file_rows - self._file_rows)
+        return size
+
+    def _flush_row_group(self, num_rows: int) -> List[ParquetFile]:
+        table = pa.Table.from_batches(self._buffer)
+        row_group = table.slice(0, num_rows)
+        remainder = table.slice(num_rows)
+        self._buffer = remainder.to_batches()
+        self._buffered_rows = remainder.num_rows
+
+        if self._writer is None:
+            self._path = f"{self.output_dir}/{self.file_prefix}_{len(self.files)}.parquet"
+            self._file = pa.BufferOutputStream() if self.in_memory else pa.OSFile(self._path, "wb")
+            self._writer = pq.ParquetWriter(self._file, row_group.schema, **self.config.writer_options(row_group.schema))
+
+        write_start = time.time()
+        self._writer.write_table(row_group, row_group_size=num_rows)
+        self._file_write_time += time.time() - write_start
+        self._file_memory += row_group.nbytes
+        self._file_rows += num_rows
+        self.num_rows += num_rows
+
+        reached_bytes = self.config.target_file_bytes and self._file.tell() >= self.config.target_file_bytes
+        reached_rows = self.config.target_file_rows and self._file_rows >= self.config.target_file_rows
+        if reached_bytes or reached_rows:
+            return [self._roll()]
+        return []
+
+    def _roll(self) -> ParquetFile:
+        close_start = time.time()
+        self._writer.close()
+        if self.in_memory:
+            buffer = self._file.getvalue()
+            parquet_file = ParquetFile(self._path, self._file_rows, buffer)
+            metadata = pq.read_metadata(pa.BufferReader(buffer))
+            file_size = buffer.size
+        else:
+            self._file.close()
+            parquet_file = ParquetFile(self._path, self._file_rows)
+            metadata = pq.read_metadata(self._path)
+            file_size = os.path.getsize(self._path)
+        creation_time = self._file_write_time + time.time() - close_start
+
+        parquet_file.metrics = collect_metrics(metadata, file_size, self.config.compression_name(), self._file_memory, creation_time)
+        self.files.append(parquet_file)
+        self._writer = None
+        self._file = None
+        self._path = None
+        self._file_rows = 0
+        self._file_memory = 0
+        self._file_write_time = 0.0
+        return parquet_file
+
+def collect_metrics(metadata: pq.FileMetaData, file_size: int, compression: str, memory_size: int, creation_time: float) -> ParquetMetrics:
+    """Summarize a written parquet file from its footer, merging the column statistics of every row group"""
+    schema = metadata.schema.to_arrow_schema()
+    column_statistics = {}
+    for row_group in range(metadata.num_row_groups):
+        for column in range(metadata.num_columns):
+            chunk = metadata.row_group(row_group).column(column)
+            stats = chunk.statistics
+            merged = column_statistics.setdefault(chunk.path_in_schema, {
+                "null_count": 0,
+                "min": None,
+                "max": None,
+                "compression": chunk.compression,
+                "encodings": list(chunk.encodings),
+                "compressed_bytes": 0,
+                "uncompressed_bytes": 0
+            })
+            merged["compressed_bytes"] += chunk.total_compressed_size
+            merged["uncompressed_bytes"] += chunk.total_uncompressed_size
+            if stats is None:
+                continue
+            if stats.has_null_count:
+                merged["null_count"] += stats.null_count
+            if stats.has_min_max:
+                merged["min"] = stats.min if merged["min"] is None else min(merged["min"], stats.min)
+                merged["max"] = stats.max if merged["max"] is None else max(merged["max"], stats.max)
+
+    return ParquetMetrics(
+        num_rows=metadata.num_rows,
+        num_row_groups=metadata.num_row_groups,
+        num_columns=metadata.num_columns,
+        file_size_bytes=file_size,
+        schema={field.name: str(field.type) for field in schema},
+        compression=compression,
+        column_statistics=column_statistics,
+        memory_size_bytes=memory_size,
+        creation_time=creation_time
+    )
@@ -0,0 +1,163 @@
+from dataclasses import dataclass, asdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+import json
+
+from engine.connectors.connector import Connector
+
+@dataclass
+class Partition:
+    index: int
+    lower: Any
+    upper: Any
+    # Every partition but the last stops right before the next one's lower bound
+    upper_inclusive: bool
+
+    def is_null(self) -> bool:
+        """Whether this is the partition of the rows with a NULL key, which no key range covers"""
+        return self.lower is None and self.upper is None
+
+    def predicate(self, column: str, key_type: str) -> Tuple[str, List[Any]]:
+        """Build the `WHERE` predicate and parameters selecting the rows of this partition"""
+        if self.is_null():
+            return f"`{column}` IS NULL", []
+        if self.upper_inclusive:
+            return f"`{column}` BETWEEN %s AND %s", [self.lower, self.upper]
+        if key_type == "int":
+            return f"`{column}` BETWEEN %s AND %s", [self.lower, self.upper - 1]
+        return f"`{column}` >= %s AND `{column}` < %s", [self.lower, self.upper]
+
+@dataclass
+class PartitionPlan:
+    table_name: str
+    key_column: str
+    key_type: str
+    sampled: bool
+    partitions: List[Partition]
+
+    def to_dict(self) -> Dict[str, Any]:
+        plan = asdict(self)
+        for partition in plan["partitions"]:
+            partition["lower"] = _encode_value(partition["lower"], self.key_type)
+            partition["upper"] = _encode_value(partition["upper"], self.key_type)
+        return plan
+
+    @staticmethod
+    def from_dict(plan: Dict[str, Any]) -> "PartitionPlan":
+        key_type = plan["key_type"]
+        partitions = [
+            Partition(
+                index=partition["index"],
+                lower=_decode_value(partition["lower"], key_type),
+                upper=_decode_value(partition["upper"], key_type),
+                upper_inclusive=partition["upper_inclusive"]
+            )
+            for partition in plan["partitions"]
+        ]
+        return PartitionPlan(plan["table_name"], plan["key_column"], key_type, plan["sampled"], partitions)
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @staticmethod
+    def load(path: str) -> "PartitionPlan":
+        with open(path) as f:
+            return PartitionPlan.from_dict(json.load(f))
+
+class PartitionPlanner:
+    def __init__(self, connector: Connector, sample_size: int = 100000):
+        self.connector = connector
+        self.sample_size = sample_size
+
+    async def plan(self, table_name: str, key_column: str, num_partitions: int) -> PartitionPlan:
+        """
+        Split a table into `num_partitions` non-overlapping key ranges, using sampled
+        quantiles when `sample_size` is set and evenly spaced cut points otherwise.
+        Rows with a NULL key get a partition of their own
+        """
+        null_rows = await self.connector.get_row_count(table_name, f"`{key_column}` IS NULL")
+        null_partitions = [Partition(0, None, None, True)] if null_rows else []
+        min_value, max_value = await self.connector.get_key_range(table_name, key_column)
+        if min_value is None:
+            return PartitionPlan(table_name, key_column, "str", False, null_partitions)
+
+        key_type = _key_type(min_value)
+        sampled = self.sample_size > 0 or key_type == "str"
+
+        if sampled:
+            cuts = await self.connector.get_key_quantiles(table_name, key_column, num_partitions, max(self.sample_size, num_partitions))
+        else:
+            cuts = _linear_cuts(min_value, max_value, num_partitions, key_type)
+
+        # Duplicate quantiles from skewed samples would produce empty partitions
+        cuts = sorted({cut for cut in cuts if min_value < cut <= max_value})
+
+        bounds = [min_value] + cuts
+        partitions = []
+        for i, lower in enumerate(bounds):
+            last = i == len(bounds) - 1
+            partitions.append(Partition(
+                index=i,
+                lower=lower,
+                upper=max_value if last else bounds[i + 1],
+                upper_inclusive=last
+            ))
+        for partition in null_partitions:
+            partition.index = len(partitions)
+            partitions.append(partition)
+
+        print(f"Planned {len(partitions)} partitions on {table_name}.{key_column} between {min_value} and {max_value}")
+        return PartitionPlan(table_name, key_column, key_type, sampled, partitions)
+
+def _key_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "str"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, Decimal):
+        return "decimal"
+    if isinstance(value, datetime):
+        return "datetime"
+    if isinstance(value, date):
+        return "date"
+    return "str"
+
+def _linear_cuts(min_value: Any, max_value: Any, num_partitions: int, key_type: str) -> List[Any]:
+    if key_type == "int":
+        step = (max_value - min_value + 1) / num_partitions
+        return [min_value + int(step * i) for i in range(1, num_partitions)]
+    if key_type in ("float", "decimal"):
+        step = (max_value - min_value) / num_partitions
+        return [min_value + step * i for i in range(1, num_partitions)]
+    if key_type in ("datetime", "date"):
+        step = (max_value - min_value) / num_partitions
+        if key_type == "date":
+            step = timedelta(days=max(1, step.days))
+        return [min_value + step * i for i in range(1, num_partitions)]
+    return []
+
+def _encode_value(value: Any, key_type: str) -> Optional[Any]:
+    if value is None:
+        return None
+    if key_type in ("datetime", "date"):
+        return value.isoformat()
+    if key_type == "decimal":
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode()
+    return value
+
+def _decode_value(value: Any, key_type: str) -> Optional[Any]:
+    if value is None:
+        return None
+    if key_type == "datetime":
+        return datetime.fromisoformat(value)
+    if key_type == "date":
+        return date.fromisoformat(value)
+    if key_type == "decimal":
+        return Decimal(value)
+    return value
@@ -0,0 +1,86 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+import asyncio
+import time
+
+from engine.services.metrics import metrics
+
+# Handlers receive an item and an `emit` coroutine that passes results to the next stage
+StageHandler = Callable[[Any, Callable[[Any], Awaitable[None]]], Awaitable[None]]
+
+_DONE = object()
+
+@dataclass
+class Stage:
+    name: str
+    handler: StageHandler
+    concurrency: int = 1
+    queue_size: int = 1
+
+class Pipeline:
+    """
+    Runs items through a chain of stages connected by bounded queues. Every stage
+    runs `concurrency` workers, and a full queue blocks the stage feeding it so a
+    slow stage throttles the ones before it instead of buffering without limit.
+    Every stage records how long items wait in its queue, how long the handler
+    runs and how long it is blocked emitting into the next stage's full queue
+    """
+    def __init__(self, stages: List[Stage], labels: Optional[Dict[str, Any]] = None):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.labels = labels or {}
+
+    async def run(self, items: Iterable[Any]) -> List[Any]:
+        """Feed items through every stage, returning whatever the last stage emits"""
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        results = []
+
+        async def collect(result: Any) -> None:
+            results.append(result)
+
+        async def worker(index: int) -> None:
+            stage = self.stages[index]
+            labels = {"stage": stage.name, **self.labels}
+
+            async def emit(result: Any) -> None:
+                emit_start = time.perf_counter()
+                if index + 1 < len(self.stages):
+                    await queues[index + 1].put((time.perf_counter(), result))
+                else:
+                    await collect(result)
+                metrics.observe("stage_emit_wait_seconds", time.perf_counter() - emit_start, **labels)
+
+            while True:
+                idle_start = time.perf_counter()
+                item = await queues[index].get()
+                if item is _DONE:
+                    return
+                enqueued_at, item = item
+                started_at = time.perf_counter()
+                metrics.observe("stage_idle_seconds", started_at - idle_start, **labels)
+                metrics.observe("stage_queue_wait_seconds", started_at - enqueued_at, **labels)
+                await stage.handler(item, emit)
+                metrics.observe("stage_seconds", time.perf_counter() - started_at, **labels)
+
+        async def run_stage(index: int) -> None:
+            async with asyncio.TaskGroup() as group:
+                for _ in range(self.stages[index].concurrency):
+                    group.create_task(worker(index))
+            # Every worker of this stage is done, so the next stage will receive no more items
+            if index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1].concurrency):
+                    await queues[index + 1].put(_DONE)
+
+        async def feed() -> None:
+            for item in items:
+                await queues[0].put((time.perf_counter(), item))
+            for _ in range(self.stages[0].concurrency):
+                await queues[0].put(_DONE)
+
+        async with asyncio.TaskGroup() as group:
+            group.create_task(feed())
+            for index in range(len(self.stages)):
+                group.create_task(run_stage(index))
+
+        return results
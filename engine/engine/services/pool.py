@@ -0,0 +1,80 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Tuple
+import asyncio
+import time
+
+from engine.connectors.connector import Connector
+
+class ConnectorPool:
+    """
+    Keeps up to `max_size` connected connectors and hands them out one at a time.
+    Connectors idle for longer than `health_check_seconds` are tested with
+    `test_connection` before reuse and reconnected if they went stale
+    """
+    def __init__(self, factory: Callable[[], Connector], max_size: int, health_check_seconds: float = 30.0):
+        self.factory = factory
+        self.max_size = max_size
+        self.health_check_seconds = health_check_seconds
+        self._idle: List[Tuple[Connector, float]] = []
+        self._size = 0
+        self._available = asyncio.Condition()
+
+    async def checkout(self) -> Connector:
+        """Take a healthy connector from the pool, waiting if `max_size` are already checked out"""
+        async with self._available:
+            while not self._idle and self._size >= self.max_size:
+                await self._available.wait()
+            if self._idle:
+                connector, released_at = self._idle.pop()
+            else:
+                self._size += 1
+                connector, released_at = None, 0.0
+
+        try:
+            if connector is None:
+                connector = self.factory()
+                await connector.connect()
+            elif time.time() - released_at > self.health_check_seconds and not await connector.test_connection():
+                print("Reconnecting stale pooled connection")
+                await connector.disconnect()
+                await connector.connect()
+            return connector
+        except Exception:
+            await self._forget()
+            raise
+
+    async def release(self, connector: Connector) -> None:
+        """Return a connector to the pool for the next checkout"""
+        async with self._available:
+            # Most recently used connectors are handed out first since they are the most likely to still be alive
+            self._idle.append((connector, time.time()))
+            self._available.notify()
+
+    async def discard(self, connector: Connector) -> None:
+        """Close a connector that may be in a bad state instead of returning it to the pool"""
+        try:
+            await connector.disconnect()
+        finally:
+            await self._forget()
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[Connector]:
+        connector = await self.checkout()
+        try:
+            yield connector
+        except BaseException:
+            await self.discard(connector)
+            raise
+        await self.release(connector)
+
+    async def close(self) -> None:
+        async with self._available:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for connector, _ in idle:
+            await connector.disconnect()
+
+    async def _forget(self) -> None:
+        async with self._available:
+            self._size -= 1
+            self._available.notify()
@@ -0,0 +1,72 @@
+from typing import Awaitable, Callable, Optional, TypeVar
+import asyncio
+import random
+import sqlite3
+
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError
+import pymysql
+
+from engine.services.metrics import metrics
+
+T = TypeVar("T")
+
+# MySQL protocol errors that go away on their own: too many connections, server shutting down,
+# lock wait timeout, deadlock, connection refused, server gone away and lost connection
+TRANSIENT_MYSQL_ERRORS = {1040, 1053, 1205, 1213, 2003, 2006, 2013, 2055}
+
+# S3 error codes for throttling and timeouts, on top of every 5xx status
+TRANSIENT_S3_ERRORS = {"SlowDown", "Throttling", "ThrottlingException", "RequestTimeout", "RequestTimeoutException"}
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether an error is likely to go away when the operation is retried, such as
+    a reset connection, a lock wait timeout or an S3 5xx, rather than a fatal
+    one like a syntax error or a missing table
+    """
+    while error is not None:
+        if isinstance(error, pymysql.err.MySQLError):
+            if error.args and error.args[0] in TRANSIENT_MYSQL_ERRORS:
+                return True
+        elif isinstance(error, sqlite3.OperationalError):
+            if "locked" in str(error) or "busy" in str(error):
+                return True
+        elif isinstance(error, ClientError):
+            response = error.response or {}
+            status = response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+            if status >= 500 or response.get("Error", {}).get("Code") in TRANSIENT_S3_ERRORS:
+                return True
+        elif isinstance(error, (BotoConnectionError, ConnectionError, TimeoutError, asyncio.TimeoutError)):
+            return True
+        # Connectors and services often wrap the error that caused a failure
+        error = error.__cause__ or error.__context__
+    return False
+
+class RetryPolicy:
+    """
+    Retries an operation up to `attempts` times in all, sleeping a random time
+    between zero and an exponentially growing cap of `base_seconds * 2 ** retry`,
+    at most `max_seconds`, before each retry. The jitter keeps the batches that
+    failed together, for example on a source restart, from retrying in lockstep
+    """
+    def __init__(self, attempts: int, base_seconds: float, max_seconds: float):
+        self.attempts = max(attempts, 1)
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+
+    def delay(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_seconds, self.base_seconds * 2 ** retry))
+
+    async def run(self, operation: Callable[[], Awaitable[T]], description: str, can_retry: Optional[Callable[[Exception], bool]] = None, **labels) -> T:
+        """Await `operation` until it succeeds, retrying errors that are transient and that `can_retry` accepts"""
+        retry = 0
+        while True:
+            try:
+                return await operation()
+            except Exception as e:
+                retry += 1
+                if retry >= self.attempts or not is_transient(e) or (can_retry and not can_retry(e)):
+                    raise
+                delay = self.delay(retry - 1)
+                metrics.increment("retries", **labels)
+                print(f"{description} failed with a transient error, retrying in {delay:.1f} seconds ({retry}/{self.attempts - 1}): {str(e)}")
+                await asyncio.sleep(delay)
@@ -1,32 +1,114 @@
+from typing import Optional
+import os
+import threading
 import time
 import boto3
+import pyarrow as pa
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
 
+from engine.config.config import Config
+from engine.services.metrics import metrics, SIZE_BUCKETS
+from engine.services.retry import is_transient
+
 class S3Service:
-    def __init__(self, bucket_name: str, access_key_id: str, secret_access_key: str):
+    def __init__(
+        self,
+        bucket_name: str,
+        access_key_id: str,
+        secret_access_key: str,
+        endpoint_url: Optional[str] = None,
+        multipart_chunksize: int = 64 * 1024 * 1024,
+        max_concurrency: int = 10,
+        max_pool_connections: int = 50
+    ):
+        # One client is shared by every upload, its connection pool has to cover all concurrent parts
         self.s3_client = boto3.client(
             's3',
             aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key
+            aws_secret_access_key=secret_access_key,
+            endpoint_url=endpoint_url,
+            config=BotoConfig(max_pool_connections=max_pool_connections)
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_chunksize,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency,
+            use_threads=True
         )
         self.access_key_id = access_key_id
         self.secret_access_key = secret_access_key
         self.bucket_name = bucket_name
 
+        self.files_uploaded = 0
+        self.bytes_uploaded = 0
+        self.upload_time = 0.0
+        self._stats_lock = threading.Lock()
+
     def upload_file(self, file_path: str, s3_path: str) -> bool:
         try:
             start_time = time.time()
-            self.s3_client.upload_file(file_path, self.bucket_name, s3_path)
+            self.s3_client.upload_file(file_path, self.bucket_name, s3_path, Config=self.transfer_config)
             upload_time = time.time() - start_time
-            print(f"Successfully uploaded {file_path} to {self.bucket_name}/{s3_path} in {upload_time:.2f} seconds")
+            self._record_upload(file_path, s3_path, os.path.getsize(file_path), upload_time)
             return True
-        except ClientError as e:
+        except (ClientError, S3UploadFailedError) as e:
+            # The managed transfer wraps the ClientError in an S3UploadFailedError. Throttling and server errors
+            # are raised for the caller to retry, the rest fail the upload
             print(f"Failed to upload {file_path}: {str(e)}")
+            if is_transient(e):
+                raise
+            return False
+
+    def upload_buffer(self, buffer: pa.Buffer, s3_path: str) -> bool:
+        """Upload an in-memory file, such as a parquet file written to a pyarrow BufferOutputStream"""
+        try:
+            start_time = time.time()
+            # BufferReader reads the Arrow buffer in place without copying it into a bytes object
+            self.s3_client.upload_fileobj(pa.BufferReader(buffer), self.bucket_name, s3_path, Config=self.transfer_config)
+            upload_time = time.time() - start_time
+            self._record_upload("memory", s3_path, buffer.size, upload_time)
+            return True
+        except (ClientError, S3UploadFailedError) as e:
+            print(f"Failed to upload {s3_path} from memory: {str(e)}")
+            if is_transient(e):
+                raise
+            return False
+
+    def _record_upload(self, source: str, s3_path: str, size: int, upload_time: float) -> None:
+        with self._stats_lock:
+            self.files_uploaded += 1
+            self.bytes_uploaded += size
+            self.upload_time += upload_time
+        metrics.observe("s3_upload_seconds", upload_time)
+        metrics.observe("s3_upload_bytes", size, SIZE_BUCKETS)
+        if not Config.verbose:
+            return
+
+        megabytes = size / (1024 * 1024)
+        print(f"Successfully uploaded {source} to {self.bucket_name}/{s3_path} ({megabytes:.1f} MB) in {upload_time:.2f} seconds ({megabytes / max(upload_time, 1e-6):.1f} MB/second)")
+
+    def print_summary(self, elapsed_time: float) -> None:
+        """Print the total upload throughput over the wall clock time of the uploads"""
+        megabytes = self.bytes_uploaded / (1024 * 1024)
+        print(f"Uploaded {self.files_uploaded} files ({megabytes:.1f} MB) to S3, {megabytes / max(elapsed_time, 1e-6):.1f} MB/second overall, {megabytes / max(self.upload_time, 1e-6):.1f} MB/second per upload")
+
+    def object_exists(self, s3_path: str, checksum: Optional[str] = None) -> bool:
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_path)
+        except ClientError:
             return False
+        # Multipart uploads have a composite ETag ("<md5>-<parts>") that can't be compared to the file checksum
+        etag = response.get("ETag", "").strip('"')
+        if checksum and "-" not in etag:
+            return etag == checksum
+        return True
 
     def upload_parquet(self, parquet_path: str, s3_path: str) -> bool:
         if not parquet_path.endswith('.parquet'):
             print(f"File {parquet_path} is not a parquet file")
             return False
-            
+
         return self.upload_file(parquet_path, s3_path)
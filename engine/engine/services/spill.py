@@ -0,0 +1,163 @@
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterator, Optional
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+
+import pyarrow as pa
+
+@dataclass
+class SpillEntry:
+    path: str
+    num_rows: int
+    size_bytes: int
+    created_at: float
+    last_used: float
+
+class SpillWriter:
+    """
+    Writes the record batches of one extracted batch to a temporary Arrow IPC
+    file, which only becomes visible in the cache once committed
+    """
+    def __init__(self, cache: "SpillCache", key: str):
+        self.cache = cache
+        self.key = key
+        self.path = f"{cache.path(key)}.{uuid.uuid4().hex}.tmp"
+        self.num_rows = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, batch: pa.RecordBatch) -> None:
+        if self._writer is None:
+            self._file = pa.OSFile(self.path, "wb")
+            self._writer = pa.ipc.new_file(self._file, batch.schema)
+        self._writer.write_batch(batch)
+        self.num_rows += batch.num_rows
+
+    def commit(self, schema: Optional[pa.Schema] = None) -> None:
+        """Add the file to the cache, writing an empty one of `schema` if no record batch was written"""
+        if self._writer is None:
+            if schema is None:
+                return
+            self._file = pa.OSFile(self.path, "wb")
+            self._writer = pa.ipc.new_file(self._file, schema)
+        self._close()
+        self.cache.add(self.key, self.path, self.num_rows)
+
+    def abort(self) -> None:
+        if self._writer is not None:
+            self._close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _close(self) -> None:
+        self._writer.close()
+        self._file.close()
+        self._writer = None
+        self._file = None
+
+class SpillCache:
+    """
+    Extracted batches kept under `cache_dir` as uncompressed Arrow IPC files, so
+    a batch read from the source once can be loaded into several destinations,
+    or again by a later job on the same snapshot, straight from a memory map.
+    Files are evicted least recently used first once they add up to more than
+    `max_bytes`, and ignored once older than `max_age_seconds` when it is set.
+    The cache can't tell whether the source changed since a batch was cached,
+    it is only meant for sources that don't
+    """
+    def __init__(self, cache_dir: str, max_bytes: int, max_age_seconds: float = 0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.entries: Dict[str, SpillEntry] = {}
+        self._lock = threading.Lock()
+        # Jobs filling the same batch at once take turns, so only the first one reads the source
+        self._fill_locks: Dict[str, asyncio.Lock] = {}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                entries = json.load(f)
+            self.entries = {
+                key: SpillEntry(**entry) for key, entry in entries.items()
+                if os.path.exists(entry["path"])
+            }
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.arrow")
+
+    def fill_lock(self, key: str) -> asyncio.Lock:
+        return self._fill_locks.setdefault(key, asyncio.Lock())
+
+    def get(self, key: str) -> Optional[SpillEntry]:
+        """The cached batch of `key`, marked as most recently used, or None if it isn't cached"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if not os.path.exists(entry.path) or (self.max_age_seconds and time.time() - entry.created_at > self.max_age_seconds):
+                self._remove(key)
+                self._save()
+                return None
+            entry.last_used = time.time()
+            self._save()
+            return entry
+
+    def writer(self, key: str) -> SpillWriter:
+        return SpillWriter(self, key)
+
+    def add(self, key: str, temp_path: str, num_rows: int) -> SpillEntry:
+        """Move a written file into the cache, evicting the least recently used files over `max_bytes`"""
+        path = self.path(key)
+        os.replace(temp_path, path)
+        now = time.time()
+        entry = SpillEntry(path, num_rows, os.path.getsize(path), now, now)
+        with self._lock:
+            self.entries[key] = entry
+            self._evict(keep=key)
+            self._save()
+        return entry
+
+    def read(self, entry: SpillEntry) -> Iterator[pa.RecordBatch]:
+        """Memory-map a cached batch and yield its record batches, backed by the mapped pages instead of copies"""
+        reader = pa.ipc.open_file(pa.memory_map(entry.path))
+        for index in range(reader.num_record_batches):
+            yield reader.get_batch(index)
+
+    def size_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self.entries.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self.entries):
+                self._remove(key)
+            self._save()
+
+    def _evict(self, keep: str) -> None:
+        # The newest file stays even when it alone is over the limit, the jobs waiting on it still need it
+        total = self.size_bytes()
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1].last_used):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= entry.size_bytes
+            self._remove(key)
+            print(f"Evicted {entry.num_rows:,} cached rows ({entry.size_bytes / (1024 * 1024):,.1f} MB) from the spill cache")
+
+    def _remove(self, key: str) -> None:
+        # Readers that still have the file mapped keep reading it after the unlink
+        entry = self.entries.pop(key)
+        if os.path.exists(entry.path):
+            os.unlink(entry.path)
+
+    def _save(self) -> None:
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({key: asdict(entry) for key, entry in self.entries.items()}, f, indent=2)
+        os.replace(temp_path, self.index_path)
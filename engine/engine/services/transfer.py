@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+import hashlib
+import json
+import threading
+
+import pyarrow as pa
+
+Converter = Callable[[Sequence[Any]], pa.Array]
+
+def schema_fingerprint(table_schema: Dict[str, str]) -> str:
+    """Hash of the column names, types and order of a table schema"""
+    return hashlib.md5(json.dumps(list(table_schema.items())).encode()).hexdigest()
+
+def converter_for(arrow_type: Optional[pa.DataType]) -> Converter:
+    """
+    Build the function turning the values of a column fetched through the DB-API into an Arrow array of `arrow_type`
+    """
+    if arrow_type is None:
+        # Columns without a mapped type are inferred from their values
+        return pa.array
+    # pymysql returns float for FLOAT columns, int for BOOL columns and timedelta for TIME columns,
+    # none of which pyarrow converts straight to the mapped type
+    if pa.types.is_floating(arrow_type) or pa.types.is_boolean(arrow_type):
+        return lambda values: pa.array(values).cast(arrow_type)
+    if pa.types.is_time(arrow_type):
+        return lambda values: pa.array(values, type=pa.duration("us")).cast(pa.int64()).cast(arrow_type)
+    return lambda values: pa.array(values, type=arrow_type)
+
+@dataclass
+class ColumnPlan:
+    name: str
+    db_type: str
+    # None for column types without a mapping
+    arrow_type: Optional[pa.DataType]
+    convert: Converter
+
+class TransferPlan:
+    """
+    Everything needed to move the rows of a table that only depends on its
+    schema: the column order, the exact Arrow type of every column and the
+    converter building its arrays. Computed once per table schema and shared by
+    every batch, so they all decode rows the same way without describing the
+    table again
+    """
+    def __init__(self, table_name: str, table_schema: Dict[str, str], arrow_types: Dict[str, Optional[pa.DataType]]):
+        self.table_name = table_name
+        self.table_schema = dict(table_schema)
+        self.fingerprint = schema_fingerprint(table_schema)
+        self.columns = [
+            ColumnPlan(name, db_type, arrow_types.get(name), converter_for(arrow_types.get(name)))
+            for name, db_type in table_schema.items()
+        ]
+        self.column_names = [column.name for column in self.columns]
+        self.arrow_schema = pa.schema([
+            (column.name, column.arrow_type) for column in self.columns if column.arrow_type is not None
+        ])
+
+    @staticmethod
+    def from_arrow_schema(table_name: str, schema: pa.Schema) -> "TransferPlan":
+        """Plan decoding rows into the types of `schema`, leaving columns of unknown type to be inferred"""
+        arrow_types = {field.name: None if pa.types.is_null(field.type) else field.type for field in schema}
+        return TransferPlan(table_name, {field.name: str(field.type) for field in schema}, arrow_types)
+
+    def type_names(self) -> Dict[str, str]:
+        """The Arrow type of every column as a string, 'unsupported' for columns without a mapping"""
+        return {column.name: str(column.arrow_type) if column.arrow_type is not None else "unsupported" for column in self.columns}
+
+    def to_record_batch(self, rows: Sequence[Tuple]) -> pa.RecordBatch:
+        """Convert rows selected in the plan's column order into a record batch"""
+        # Transpose the rows once and build every column as a typed Arrow array, without going through pandas
+        values = list(zip(*rows)) if rows else [()] * len(self.columns)
+        arrays = [column.convert(column_values) for column, column_values in zip(self.columns, values)]
+        return pa.RecordBatch.from_arrays(arrays, names=self.column_names)
+
+class TransferPlanCache:
+    """
+    Transfer plans by table and schema fingerprint, shared by every connector
+    and job in the process. The most recent plan of each table is kept as well
+    for callers, like loads, that don't have the table's schema at hand
+    """
+    def __init__(self):
+        self._plans: Dict[Tuple[str, str], TransferPlan] = {}
+        self._latest: Dict[str, TransferPlan] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, table_schema: Dict[str, str], build: Callable[[], TransferPlan]) -> TransferPlan:
+        """The plan of the table `key` with `table_schema`, built the first time that schema is seen"""
+        fingerprint = schema_fingerprint(table_schema)
+        with self._lock:
+            plan = self._plans.get((key, fingerprint))
+            if plan is None:
+                plan = self._plans[(key, fingerprint)] = build()
+            self._latest[key] = plan
+            return plan
+
+    def latest(self, key: str) -> Optional[TransferPlan]:
+        with self._lock:
+            return self._latest.get(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._plans.clear()
+            self._latest.clear()
+
+plans = TransferPlanCache()
@@ -0,0 +1,153 @@
+from dataclasses import dataclass, asdict
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from engine.services.parquet import ColumnEncoding, CompressionType
+
+class TuneObjective(str, Enum):
+    # Fewest bytes to store and upload
+    SIZE = "size"
+    # Fastest to upload and decode into the destination
+    LOAD = "load"
+    # Fastest end to end, counting the encode time as well
+    BALANCED = "balanced"
+
+# Codec and level pairs tried for every column
+CODECS: List[Tuple[CompressionType, Optional[int]]] = [
+    (CompressionType.NONE, None),
+    (CompressionType.SNAPPY, None),
+    (CompressionType.LZ4, None),
+    (CompressionType.ZSTD, 1),
+    (CompressionType.ZSTD, 3),
+    (CompressionType.ZSTD, 9)
+]
+
+@dataclass
+class CandidateResult:
+    encoding: ColumnEncoding
+    size_bytes: int
+    encode_seconds: float
+    decode_seconds: float
+
+@dataclass
+class EncodingPlan:
+    objective: str
+    sample_rows: int
+    columns: Dict[str, ColumnEncoding]
+    # Encoded bytes of each column on the sample, for reporting
+    sample_bytes: Dict[str, int]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @staticmethod
+    def from_dict(plan: Dict[str, Any]) -> "EncodingPlan":
+        columns = {
+            name: ColumnEncoding(CompressionType(column["compression"]), column["compression_level"], column["encoding"])
+            for name, column in plan["columns"].items()
+        }
+        return EncodingPlan(plan["objective"], plan["sample_rows"], columns, plan["sample_bytes"])
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @staticmethod
+    def load(path: str) -> "EncodingPlan":
+        with open(path) as f:
+            return EncodingPlan.from_dict(json.load(f))
+
+class EncodingTuner:
+    """
+    Picks a codec and encoding for every column by writing a sample of rows with
+    each candidate and scoring the encoded size, encode time and decode time
+    against `objective`. `bandwidth_bytes` is the upload and load throughput
+    that turns encoded bytes into seconds so they can be weighed against time
+    """
+    def __init__(self, objective: str, bandwidth_bytes: int, repeats: int = 2):
+        self.objective = TuneObjective(objective)
+        self.bandwidth_bytes = bandwidth_bytes
+        # Best of several runs, small samples encode fast enough for timings to be noisy
+        self.repeats = repeats
+
+    def tune(self, sample: pa.RecordBatch) -> EncodingPlan:
+        start_time = time.time()
+        table = pa.Table.from_batches([sample])
+        columns = {}
+        sample_bytes = {}
+        for name in table.column_names:
+            column = table.select([name])
+            results = []
+            for encoding in self.candidates(column.schema.field(name).type):
+                try:
+                    results.append(self.measure(column, encoding))
+                except (pa.ArrowException, ValueError):
+                    # Not every encoding supports every physical type
+                    continue
+            best = min(results, key=self.score)
+            columns[name] = best.encoding
+            sample_bytes[name] = best.size_bytes
+
+        plan = EncodingPlan(self.objective.value, table.num_rows, columns, sample_bytes)
+        print(f"Tuned parquet encodings for {self.objective.value} on {table.num_rows:,} rows in {time.time() - start_time:.2f} seconds")
+        for name, encoding in columns.items():
+            level = f" level {encoding.compression_level}" if encoding.compression_level is not None else ""
+            print(f"  {name}: {encoding.encoding or 'DICTIONARY'}, {encoding.compression.value}{level}, {sample_bytes[name]:,} bytes")
+        return plan
+
+    def candidates(self, arrow_type: pa.DataType) -> List[ColumnEncoding]:
+        encodings = [None, "PLAIN"]
+        if pa.types.is_floating(arrow_type):
+            encodings.append("BYTE_STREAM_SPLIT")
+        elif pa.types.is_integer(arrow_type) or pa.types.is_temporal(arrow_type):
+            encodings.append("DELTA_BINARY_PACKED")
+        elif pa.types.is_string(arrow_type) or pa.types.is_binary(arrow_type):
+            encodings.extend(["DELTA_LENGTH_BYTE_ARRAY", "DELTA_BYTE_ARRAY"])
+        elif pa.types.is_boolean(arrow_type):
+            # Booleans aren't dictionary encoded
+            encodings = ["PLAIN"]
+
+        return [
+            ColumnEncoding(compression, level, encoding)
+            for encoding in encodings
+            for compression, level in CODECS
+        ]
+
+    def measure(self, column: pa.Table, encoding: ColumnEncoding) -> CandidateResult:
+        options = {
+            "compression": encoding.compression.value,
+            "use_dictionary": encoding.encoding is None
+        }
+        if encoding.compression_level is not None:
+            options["compression_level"] = encoding.compression_level
+        if encoding.encoding is not None:
+            options["column_encoding"] = encoding.encoding
+
+        encode_seconds = decode_seconds = float("inf")
+        for _ in range(self.repeats):
+            stream = pa.BufferOutputStream()
+            encode_start = time.perf_counter()
+            pq.write_table(column, stream, **options)
+            encode_seconds = min(encode_seconds, time.perf_counter() - encode_start)
+            buffer = stream.getvalue()
+
+            if self.objective != TuneObjective.SIZE:
+                decode_start = time.perf_counter()
+                pq.read_table(pa.BufferReader(buffer))
+                decode_seconds = min(decode_seconds, time.perf_counter() - decode_start)
+
+        return CandidateResult(encoding, buffer.size, encode_seconds, decode_seconds)
+
+    def score(self, result: CandidateResult) -> Tuple[float, float]:
+        if self.objective == TuneObjective.SIZE:
+            # Faster encodes break ties between equally small candidates
+            return (result.size_bytes, result.encode_seconds)
+        seconds = result.size_bytes / self.bandwidth_bytes + result.decode_seconds
+        if self.objective == TuneObjective.BALANCED:
+            seconds += result.encode_seconds
+        return (seconds, result.size_bytes)
@@ -53,8 +53,9 @@ def validate_migration(src_connector: Connector, dest_connector: Connector):
         print(f"Destination table {Config.dest_table} not found")
         raise typer.Exit(3)
 
-    src_parquet_schema = src_connector.get_parquet_schema(src_table_schema)
-    dest_parquet_schema = dest_connector.get_parquet_schema(dest_table_schema)
+    # Compiling the transfer plans here caches them for the migration that follows
+    src_parquet_schema = src_connector.get_transfer_plan(Config.src_table, src_table_schema).type_names()
+    dest_parquet_schema = dest_connector.get_transfer_plan(Config.dest_table, dest_table_schema).type_names()
     print(src_parquet_schema)
     print(dest_parquet_schema)
     for column_name, parquet_type in src_parquet_schema.items():
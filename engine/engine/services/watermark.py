@@ -0,0 +1,48 @@
+from dataclasses import dataclass, asdict
+from typing import Any, List, Optional, Tuple
+import json
+import os
+
+from engine.services.manifest import _decode, _encode
+
+@dataclass
+class Watermark:
+    """
+    High-water mark of an incremental sync. `value` is the largest value of
+    `column` already copied to the destination, `pending` the largest value the
+    run in progress is copying, which becomes `value` once the run succeeds
+    """
+    column: str
+    value: Optional[Any] = None
+    pending: Optional[Any] = None
+
+    def predicate(self) -> Tuple[str, List[Any]]:
+        """Build the `WHERE` predicate and parameters selecting the rows of the pending run"""
+        if self.pending is None:
+            return "", []
+        if self.value is None:
+            return f"`{self.column}` <= %s", [self.pending]
+        return f"`{self.column}` > %s AND `{self.column}` <= %s", [self.value, self.pending]
+
+    def upper_predicate(self) -> Tuple[str, List[Any]]:
+        """Build the predicate selecting every row up to the pending mark, old or new"""
+        if self.pending is None:
+            return "", []
+        return f"`{self.column}` <= %s", [self.pending]
+
+    def commit(self) -> None:
+        if self.pending is not None:
+            self.value = self.pending
+        self.pending = None
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(asdict(self), f, indent=2, default=_encode)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load(path: str) -> "Watermark":
+        with open(path) as f:
+            return Watermark(**json.load(f, object_hook=_decode))
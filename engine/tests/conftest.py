@@ -0,0 +1,73 @@
+import os
+import sqlite3
+
+import pytest
+
+from engine.config.config import Config
+from engine.services.job import Job
+from engine.services.metrics import metrics
+from engine.services.transfer import plans
+from benchmarks.synthetic import TableSpec, prepare_destination, prepare_source
+
+@pytest.fixture(autouse=True)
+def config(tmp_path):
+    """Run every test against its own directories, restoring the settings it changed afterwards"""
+    saved = {name: value for name, value in vars(Config).items() if not name.startswith("__")}
+    Config.local_dir = str(tmp_path / "export")
+    Config.metrics_dir = str(tmp_path / "metrics")
+    Config.spill_cache_dir = str(tmp_path / "spill")
+    Config.use_s3 = False
+    Config.resume = False
+    Config.incremental = False
+    Config.adaptive_batch_size = False
+    Config.stream_batch_rows = 1000
+    Config.retry_base_seconds = 0.01
+    metrics.reset()
+    plans.clear()
+    yield Config
+    for name, value in saved.items():
+        setattr(Config, name, value)
+
+@pytest.fixture
+def spec():
+    return TableSpec(rows=20000, string_columns=1, timestamp_columns=1)
+
+@pytest.fixture
+def make_job(tmp_path, spec):
+    """Build a job copying the synthetic table between two SQLite databases"""
+    source_path = str(tmp_path / "source.db")
+    prepare_source(source_path, spec)
+
+    def make_job(job_id: str = "test", dest_name: str = "dest.db", **options) -> Job:
+        dest_path = str(tmp_path / dest_name)
+        if not os.path.exists(dest_path):
+            prepare_destination(dest_path, spec)
+        return Job(
+            job_id=job_id,
+            source_engine="sqlite",
+            source_host="",
+            source_port=0,
+            source_user="",
+            source_password="",
+            source_database=source_path,
+            source_table=spec.name,
+            dest_engine="sqlite",
+            dest_host="",
+            dest_port=0,
+            dest_user="",
+            dest_password="",
+            dest_database=dest_path,
+            dest_table=spec.name,
+            s3_bucket="",
+            s3_access_key_id="",
+            s3_secret_access_key="",
+            start_offset=0,
+            end_offset=0,
+            sort_column="",
+            **options
+        )
+    return make_job
+
+def count_rows(path: str, table: str) -> int:
+    with sqlite3.connect(path) as connection:
+        return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
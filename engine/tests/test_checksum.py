@@ -0,0 +1,59 @@
+import asyncio
+import shutil
+import sqlite3
+
+from engine.connectors.sqlite import AsyncSQLiteConnector
+from engine.services.checksum import ChecksumValidator
+from engine.services.job import create_pool
+from engine.services.partition import Partition, PartitionPlan
+from benchmarks.synthetic import prepare_source
+
+def validate(source_path: str, dest_path: str, spec, plan: PartitionPlan, drilldown_rows: int):
+    async def run():
+        source_pool = create_pool("sqlite", "", 0, "", "", source_path, 2)
+        dest_pool = create_pool("sqlite", "", 0, "", "", dest_path, 2)
+        try:
+            validator = ChecksumValidator(source_pool, dest_pool, spec.name, spec.name, list(spec.columns()), 2, drilldown_rows)
+            return await validator.validate(plan)
+        finally:
+            await source_pool.close()
+            await dest_pool.close()
+    return asyncio.run(run())
+
+def test_drilldown_finds_the_mismatching_rows(spec, tmp_path, monkeypatch):
+    source_path = str(tmp_path / "source.db")
+    dest_path = str(tmp_path / "dest.db")
+    prepare_source(source_path, spec)
+    shutil.copy(source_path, dest_path)
+    with sqlite3.connect(dest_path) as connection:
+        connection.execute(f"UPDATE {spec.name} SET i0 = i0 + 1 WHERE id = 12345")
+        connection.execute(f"DELETE FROM {spec.name} WHERE id = 777")
+    compared_rows = []
+    get_row_checksums = AsyncSQLiteConnector.get_row_checksums
+
+    async def counted_get_row_checksums(self, *args, **kwargs):
+        rows = await get_row_checksums(self, *args, **kwargs)
+        compared_rows.append(len(rows))
+        return rows
+
+    monkeypatch.setattr(AsyncSQLiteConnector, "get_row_checksums", counted_get_row_checksums)
+    plan = PartitionPlan(spec.name, "id", "int", False, [
+        Partition(0, 1, 10001, False),
+        Partition(1, 10001, spec.rows, True)
+    ])
+
+    mismatches = validate(source_path, dest_path, spec, plan, drilldown_rows=100)
+
+    assert sorted((mismatch.key, mismatch.kind) for mismatch in mismatches) == [(777, "missing"), (12345, "different")]
+    # Only the small ranges holding a mismatching row are compared row by row
+    assert compared_rows and max(compared_rows) <= 100
+
+def test_matching_tables_have_no_mismatches(spec, tmp_path):
+    source_path = str(tmp_path / "source.db")
+    dest_path = str(tmp_path / "dest.db")
+    prepare_source(source_path, spec)
+    shutil.copy(source_path, dest_path)
+    plan = PartitionPlan(spec.name, "id", "int", False, [Partition(0, 1, spec.rows, True)])
+
+    assert validate(source_path, dest_path, spec, plan, drilldown_rows=100) == []
+    assert validate(source_path, dest_path, spec, None, drilldown_rows=100) == []
@@ -0,0 +1,35 @@
+import pyarrow as pa
+import pytest
+
+from engine.connectors.connector import Connector
+from engine.connectors.dialect import MySQLDialect, _arrow_type
+from engine.connectors.singlestore import SingleStoreConnector
+from engine.connectors.sqlite import SQLiteConnector
+
+@pytest.mark.parametrize("db_type, arrow_type", [
+    ("bigint", pa.int64()),
+    ("int(10) unsigned", pa.uint32()),
+    ("decimal(10,2)", pa.decimal128(10, 2)),
+    ("decimal(65,30)", pa.decimal256(65, 30)),
+    ("varchar(255)", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+    ("geometry", None),
+])
+def test_arrow_type(db_type, arrow_type):
+    assert _arrow_type(db_type) == arrow_type
+
+def test_keyset_select_query():
+    connector = SQLiteConnector("", 0, "", "", ":memory:")
+
+    query, params = connector._select_query("t", 100, 0, "", ["a", "b"], (1, 2), "`c` > %s", [5], ["a", "b", "c"])
+
+    assert " ".join(query.split()) == (
+        "SELECT `a`, `b`, `c` FROM t WHERE (`c` > %s) AND ((`a` > %s) OR (`a` = %s AND `b` > %s)) ORDER BY `a`, `b` LIMIT 100"
+    )
+    assert params == [5, 1, 1, 2]
+
+def test_sqlite_shares_only_the_dialect_with_singlestore():
+    assert issubclass(SQLiteConnector, MySQLDialect) and issubclass(SQLiteConnector, Connector)
+    assert not issubclass(SQLiteConnector, SingleStoreConnector)
+    for name in ("_load_data_query", "_spool_parquet", "_table_size_query", "_pipeline_query"):
+        assert not hasattr(SQLiteConnector, name)
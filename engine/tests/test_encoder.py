@@ -0,0 +1,89 @@
+import asyncio
+from multiprocessing.shared_memory import SharedMemory
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from engine.services import encoder
+from engine.services.encoder import EncoderPool
+from engine.services.parquet import ParquetConfig
+
+def record_batch(start: int, num_rows: int) -> pa.RecordBatch:
+    ids = list(range(start, start + num_rows))
+    return pa.RecordBatch.from_pydict({"id": ids, "name": [f"row {i}" for i in ids], "value": [i / 3 for i in ids]})
+
+def test_process_sink_writes_the_batches_it_is_handed(tmp_path, monkeypatch):
+    blocks = []
+
+    class RecordedSharedMemory(SharedMemory):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            blocks.append(self.name)
+
+    monkeypatch.setattr(encoder, "SharedMemory", RecordedSharedMemory)
+
+    async def run():
+        pool = EncoderPool(1)
+        try:
+            sink = await pool.open_sink(str(tmp_path), "t_0", ParquetConfig(row_group_size=1000, target_file_rows=2000))
+            files = []
+            for start in range(0, 5000, 500):
+                files.extend(await asyncio.to_thread(sink.write, record_batch(start, 500)))
+            files.extend(await asyncio.to_thread(sink.close))
+            await pool.release(sink)
+            return files
+        finally:
+            await pool.close()
+
+    files = asyncio.run(run())
+
+    assert [file.num_rows for file in files] == [2000, 2000, 1000]
+    table = pa.concat_tables(pq.read_table(file.path) for file in files)
+    assert table.column("id").to_pylist() == list(range(5000))
+    assert table.column("name")[4321].as_py() == "row 4321"
+    # Every batch went through its own shared memory block, unlinked once the worker had it
+    assert len(blocks) == 10
+    for name in blocks:
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=name)
+
+def test_encoder_processes_are_reused_and_stopped_after_a_failure(tmp_path):
+    async def run():
+        pool = EncoderPool(1)
+        try:
+            first = await pool.open_sink(str(tmp_path), "t_0")
+            await asyncio.to_thread(first.write, record_batch(0, 10))
+            await asyncio.to_thread(first.close)
+            await pool.release(first)
+
+            second = await pool.open_sink(str(tmp_path), "t_1")
+            reused = second.encoder is first.encoder
+            # A sink left open by a failure stops its process instead of going back to the pool
+            await pool.release(second)
+            stopped = not second.encoder.process.is_alive()
+
+            third = await pool.open_sink(str(tmp_path), "t_2")
+            replaced = third.encoder is not second.encoder
+            await asyncio.to_thread(third.close)
+            await pool.release(third)
+            return reused, stopped, replaced
+        finally:
+            await pool.close()
+
+    assert asyncio.run(run()) == (True, True, True)
+
+def test_encoder_errors_are_raised_in_the_caller(tmp_path):
+    async def run():
+        pool = EncoderPool(1)
+        try:
+            sink = await pool.open_sink(str(tmp_path), "t_0")
+            await asyncio.to_thread(sink.write, record_batch(0, 10))
+            # A batch of another schema can't be appended to the same file
+            await asyncio.to_thread(sink.write, pa.RecordBatch.from_pydict({"other": [1]}))
+            await asyncio.to_thread(sink.close)
+        finally:
+            await pool.close()
+
+    with pytest.raises(Exception, match="Encoder process .* failed"):
+        asyncio.run(run())
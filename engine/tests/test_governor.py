@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from engine.services.governor import SourceGovernor
+
+def test_a_fixed_limit_caps_concurrent_queries():
+    running = []
+
+    async def fetch(governor):
+        async with governor.query():
+            running.append(governor.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        governor = SourceGovernor(3)
+        await asyncio.gather(*(fetch(governor) for _ in range(10)))
+        return governor
+
+    governor = asyncio.run(run())
+
+    assert not governor.adaptive and governor.limit == 3
+    assert max(running) == 3
+    assert governor.in_flight == 0
+
+def test_the_limit_grows_while_latency_holds():
+    async def run():
+        governor = SourceGovernor(8, min_queries=1, latency_tolerance=2.0)
+        limits = [governor.limit]
+        for _ in range(100):
+            await governor.observe(1000, 0, 1.0)
+            limits.append(governor.limit)
+        return limits
+
+    limits = asyncio.run(run())
+
+    assert limits[0] == 1
+    # Additive increase: 1 / limit per fetch, about one query per round of `limit` fetches
+    assert limits[1:4] == pytest.approx([2, 2.5, 2.9])
+    assert limits == sorted(limits)
+    assert limits[-1] == 8
+
+def test_the_limit_is_cut_once_per_round_when_latency_rises():
+    async def run():
+        governor = SourceGovernor(8, min_queries=1, latency_tolerance=2.0, backoff_factor=0.5)
+        while governor.limit < 8:
+            await governor.observe(1000, 0, 1.0)
+        limits = []
+        for _ in range(10):
+            await governor.observe(1000, 0, 10.0)
+            limits.append(governor.limit)
+        return limits
+
+    limits = asyncio.run(run())
+
+    # Multiplicative decrease, waiting out the fetches started under the old limit, and never below min_queries
+    assert limits == [4, 4, 4, 4, 2, 2, 1, 1, 1, 1]
+
+def test_rows_and_bytes_are_paced_to_the_caps():
+    governor = SourceGovernor(4, max_rows_per_second=1000, max_bytes_per_second=1000000)
+
+    assert governor._reserve(500, 1000) == pytest.approx(0.5, abs=0.05)
+    assert governor._reserve(500, 1000) == pytest.approx(1.0, abs=0.05)
+    # Whichever cap is further behind sets the delay
+    assert governor._reserve(0, 3000000) == pytest.approx(3.0, abs=0.05)
+    assert SourceGovernor(4)._reserve(10 ** 9, 10 ** 12) == 0
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from engine.connectors.connector import S3IngestConnector
+from engine.connectors.singlestore import SingleStoreConnector
+from engine.connectors.sqlite import SQLiteConnector
+from engine.services.ingest import PipelineIngest
+from engine.services.manifest import BatchRecord, Manifest
+
+class FakePipelineDest:
+    """Destination whose pipeline loads every file `lag` seconds after it was uploaded"""
+    def __init__(self, lag: float = 0.05, state: str = "Running"):
+        self.lag = lag
+        self.state = state
+        self.uploaded = {}
+        self.dropped = []
+
+    async def start_pipeline(self, table_name, parquet_path, aws_access_key_id, aws_secret_access_key):
+        return "es_test_pipeline"
+
+    async def get_pipeline_progress(self, pipeline_name):
+        now = time.time()
+        return self.state, {
+            f"epic-shelter/test/{os.path.basename(path)}": "Loaded" if now - uploaded_at >= self.lag else "Unloaded"
+            for path, uploaded_at in self.uploaded.items()
+        }
+
+    async def get_pipeline_errors(self, pipeline_name, limit=5):
+        return ["Leaf error: corrupt parquet file"]
+
+    async def drop_pipeline(self, pipeline_name):
+        self.dropped.append(pipeline_name)
+
+async def ingest_files(tmp_path, dest, num_files=3):
+    manifest = Manifest(str(tmp_path / "manifest.json"), [BatchRecord(index) for index in range(num_files)])
+    ingest = PipelineIngest(dest, manifest, "t", lambda path: f"epic-shelter/test/{os.path.basename(path)}", poll_seconds=0.01)
+    await ingest.start("bucket/epic-shelter/test/*.parquet", "", "")
+    for index in range(num_files):
+        path = str(tmp_path / f"t_{index}_0.parquet")
+        manifest.add_file(index, path, 100, buffer=b"parquet")
+        manifest.mark_uploaded(path)
+        ingest.file_uploaded(path)
+        dest.uploaded[path] = time.time()
+        await asyncio.sleep(0.02)
+    await ingest.finish()
+    return manifest, ingest
+
+def test_files_are_marked_loaded_as_the_pipeline_reports_them(tmp_path):
+    dest = FakePipelineDest()
+    manifest, ingest = asyncio.run(ingest_files(tmp_path, dest))
+
+    assert all(file.loaded for batch in manifest.batches.values() for file in batch.files)
+    assert (ingest.files_loaded, ingest.rows_loaded) == (3, 300)
+    assert dest.dropped == ["es_test_pipeline"]
+
+def test_a_failed_pipeline_raises_its_errors_and_is_dropped(tmp_path):
+    dest = FakePipelineDest(state="Error")
+    with pytest.raises(Exception, match="corrupt parquet file"):
+        asyncio.run(ingest_files(tmp_path, dest))
+    assert dest.dropped == ["es_test_pipeline"]
+
+def test_s3_ingest_connectors_must_implement_the_pipeline_methods():
+    class IngestOnly(SQLiteConnector, S3IngestConnector):
+        def ingest_parquet(self, table_name, parquet_path, aws_access_key_id, aws_secret_access_key):
+            pass
+
+    with pytest.raises(TypeError, match="start_pipeline"):
+        IngestOnly("", 0, "", "", ":memory:")
+    assert issubclass(SingleStoreConnector, S3IngestConnector)
+    assert not issubclass(SQLiteConnector, S3IngestConnector)
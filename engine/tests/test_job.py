@@ -0,0 +1,249 @@
+import asyncio
+import os
+import sqlite3
+
+import pytest
+
+from engine.connectors.sqlite import AsyncSQLiteConnector
+from engine.services.governor import SourceGovernor
+from engine.services.job import Destination, JobService
+from engine.services.metrics import metrics
+from engine.services.parquet import ParquetSink
+from engine.services.partition import Partition, PartitionPlan
+from benchmarks.synthetic import prepare_destination
+from conftest import count_rows
+
+def run(service: JobService, timeout: float = 60) -> None:
+    asyncio.run(asyncio.wait_for(service.run_job(), timeout))
+
+def test_encode_failure_fails_only_its_batch(make_job, spec, monkeypatch):
+    write = ParquetSink.write
+    calls = 0
+
+    def failing_write(self, batch):
+        nonlocal calls
+        calls += 1
+        if calls == 3:
+            raise OSError("No space left on device")
+        return write(self, batch)
+
+    monkeypatch.setattr(ParquetSink, "write", failing_write)
+    job = make_job()
+    service = JobService(job)
+    # Enough record batches per batch that the extract fills the queue the failed encoder stops reading
+    service.batch_size = 10000
+
+    with pytest.raises(Exception, match="1 of 2 batches failed"):
+        run(service)
+
+    assert list(service.failed_batches) == [0]
+    assert "No space left on device" in service.failed_batches[0]
+    assert service.manifest.batches[0].error is not None
+    assert count_rows(job.dest_database, spec.name) == spec.rows - 10000
+
+def test_streams_wait_for_a_query_slot_before_reaching_an_encoder(make_job, spec, config):
+    # More extracts than encoders and a single query slot, as when the adaptive limit starts at one query
+    config.extract_workers = 2
+    config.encode_workers = 1
+    # Many more record batches per batch than the stream queue holds
+    config.stream_batch_rows = 100
+    service = JobService(make_job(), governor=SourceGovernor(1))
+    service.batch_size = 2000
+
+    run(service)
+
+    assert service.failed_batches == {}
+    assert count_rows(service.job.dest_database, spec.name) == spec.rows
+
+def test_s3_jobs_into_sqlite_load_the_local_files(make_job, spec, config, monkeypatch):
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    config.use_s3 = True
+    with moto.mock_aws():
+        boto3.client("s3").create_bucket(Bucket="exports")
+        job = make_job(job_id="s3-job")
+        job.s3_bucket = "exports"
+        job.s3_access_key_id = "testing"
+        job.s3_secret_access_key = "testing"
+        service = JobService(job)
+        service.batch_size = 5000
+
+        run(service)
+
+        keys = [item["Key"] for item in boto3.client("s3").list_objects_v2(Bucket="exports")["Contents"]]
+    assert len(keys) == 4
+    assert all(key.startswith("epic-shelter/s3-job/") for key in keys)
+    assert count_rows(job.dest_database, spec.name) == spec.rows
+
+def test_fanout_reads_every_batch_from_the_source_once(make_job, spec, config, tmp_path, monkeypatch):
+    config.spill_cache = True
+    config.adaptive_batch_size = True
+    # Small enough batches for the test table to be split into several
+    config.batch_target_bytes = 256 * 1024
+    reads = []
+    boundary_queries = []
+    iter_batches = AsyncSQLiteConnector.iter_batches
+    get_key_boundaries = AsyncSQLiteConnector.get_key_boundaries
+
+    def counted_iter_batches(self, table_name, *args, **kwargs):
+        reads.append(kwargs.get("after_key"))
+        return iter_batches(self, table_name, *args, **kwargs)
+
+    async def counted_get_key_boundaries(self, *args, **kwargs):
+        boundary_queries.append(args)
+        return await get_key_boundaries(self, *args, **kwargs)
+
+    monkeypatch.setattr(AsyncSQLiteConnector, "iter_batches", counted_iter_batches)
+    monkeypatch.setattr(AsyncSQLiteConnector, "get_key_boundaries", counted_get_key_boundaries)
+    extra_dest = str(tmp_path / "dest_1.db")
+    prepare_destination(extra_dest, spec)
+    job = make_job(job_id="fanout", destinations=[Destination("sqlite", "", 0, "", "", extra_dest, spec.name)])
+
+    run(JobService(job))
+
+    assert len(boundary_queries) == 1
+    assert len(reads) > 1
+    assert len(reads) == len(set(reads))
+    counters = {counter["name"]: counter["value"] for counter in metrics.report(spec.name)["counters"]}
+    assert counters["spill_cache_misses"] == len(reads)
+    assert counters["spill_cache_hits"] == len(reads)
+    assert count_rows(job.dest_database, spec.name) == spec.rows
+    assert count_rows(extra_dest, spec.name) == spec.rows
+
+def test_incremental_counts_ignore_rows_updated_past_the_watermark(make_job, spec, config, monkeypatch):
+    config.incremental = True
+    config.watermark_column = "i0"
+    job = make_job()
+    service = JobService(job)
+    validate_row_counts = JobService.validate_row_counts
+
+    async def update_then_validate(self):
+        # A copied row updated in the source while the run finishes moves past the pending watermark
+        with sqlite3.connect(job.source_database) as connection:
+            connection.execute(f"UPDATE {spec.name} SET i0 = ? WHERE id = 1", (self.watermark.pending + 1,))
+        return await validate_row_counts(self)
+
+    monkeypatch.setattr(JobService, "validate_row_counts", update_then_validate)
+    run(service)
+
+    assert service.watermark.value is not None
+    assert service.watermark.pending is None
+    assert count_rows(job.dest_database, spec.name) == spec.rows
+
+def file_batch(parquet_path: str) -> int:
+    # Exported files are named {table}_{batch}_{part}.parquet
+    return int(os.path.basename(parquet_path).rsplit("_", 2)[1])
+
+def fail_loading_batch(monkeypatch, batch_num: int) -> list:
+    """Make the destination fail to load the files of one batch, returning the files it loads"""
+    ingest_local_parquet = AsyncSQLiteConnector.ingest_local_parquet
+    loaded = []
+
+    async def failing_ingest(self, table_name, parquet_path, replace=False):
+        if file_batch(parquet_path) == batch_num:
+            raise ValueError("Table is read only")
+        loaded.append(parquet_path)
+        return await ingest_local_parquet(self, table_name, parquet_path, replace)
+
+    monkeypatch.setattr(AsyncSQLiteConnector, "ingest_local_parquet", failing_ingest)
+    return loaded
+
+def test_resume_loads_only_the_failed_batch(make_job, spec, config, monkeypatch):
+    config.local_ingest = True
+    fail_loading_batch(monkeypatch, 1)
+    service = JobService(make_job(job_id="resume"))
+    service.batch_size = 5000
+    with pytest.raises(Exception, match="1 of 4 batches failed"):
+        run(service)
+    assert "Table is read only" in service.manifest.batches[1].error
+
+    monkeypatch.undo()
+    loaded = fail_loading_batch(monkeypatch, -1)
+    reads = []
+    iter_batches = AsyncSQLiteConnector.iter_batches
+
+    def counted_iter_batches(self, table_name, *args, **kwargs):
+        reads.append(kwargs.get("after_key"))
+        return iter_batches(self, table_name, *args, **kwargs)
+
+    monkeypatch.setattr(AsyncSQLiteConnector, "iter_batches", counted_iter_batches)
+    config.resume = True
+    resumed = JobService(make_job(job_id="resume"))
+    run(resumed)
+
+    # The failed batch's files were kept, so it is loaded again without reading the source
+    assert reads == []
+    assert len(loaded) == len(service.manifest.batches[1].files)
+    assert all(file_batch(path) == 1 for path in loaded)
+    assert count_rows(resumed.job.dest_database, spec.name) == spec.rows
+
+def test_resume_uploads_files_missing_from_s3_again(make_job, spec, config, monkeypatch):
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    config.use_s3 = True
+    config.local_ingest = True
+    with moto.mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket="exports")
+
+        def s3_job():
+            job = make_job(job_id="s3-resume")
+            job.s3_bucket = "exports"
+            job.s3_access_key_id = "testing"
+            job.s3_secret_access_key = "testing"
+            return job
+
+        fail_loading_batch(monkeypatch, 0)
+        service = JobService(s3_job())
+        service.batch_size = 10000
+        with pytest.raises(Exception, match="1 of 2 batches failed"):
+            run(service)
+        missing = service.s3_key(service.manifest.batches[0].files[0].path)
+        client.delete_object(Bucket="exports", Key=missing)
+
+        monkeypatch.undo()
+        monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+        config.resume = True
+        resumed = JobService(s3_job())
+        run(resumed)
+
+        keys = [item["Key"] for item in client.list_objects_v2(Bucket="exports")["Contents"]]
+    assert resumed.s3.files_uploaded == 1
+    assert missing in keys
+    assert count_rows(resumed.job.dest_database, spec.name) == spec.rows
+
+def test_load_throughput_is_recorded_without_verbose(make_job, spec, config):
+    config.verbose = False
+    config.local_ingest = True
+
+    run(JobService(make_job()))
+
+    histograms = {histogram["name"]: histogram for histogram in metrics.report(spec.name)["histograms"]}
+    assert histograms["load_rows_per_second"]["labels"]["method"] == "INSERT"
+    assert histograms["load_rows_per_second"]["count"] > 0
+    assert histograms["load_bytes_per_second"]["sum"] > 0
+
+def test_partitioned_export_keeps_rows_with_a_null_key(make_job, spec, config):
+    job = make_job()
+    with sqlite3.connect(job.source_database) as connection:
+        connection.execute(f"UPDATE {spec.name} SET i0 = NULL WHERE id % 10 = 0")
+    config.partition_count = 4
+    config.partition_column = "i0"
+
+    run(JobService(job))
+
+    assert count_rows(job.dest_database, spec.name) == spec.rows
+
+def test_partition_plan_of_another_column_is_not_reused(make_job, spec, config, tmp_path):
+    plan_path = str(tmp_path / "plan.json")
+    # A plan for the same table split on another column, whose ranges would select the wrong rows
+    PartitionPlan(spec.name, "i0", "int", False, [Partition(0, 0, 10, True)]).save(plan_path)
+    config.partition_count = 4
+    config.partition_plan_path = plan_path
+
+    run(JobService(make_job()))
+
+    assert PartitionPlan.load(plan_path).key_column == "id"
+    assert count_rows(make_job().dest_database, spec.name) == spec.rows
@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+
+from engine.services.manifest import BatchRecord, Manifest
+
+def make_manifest(tmp_path, num_batches=3):
+    manifest = Manifest(str(tmp_path / "manifest.json"), [
+        BatchRecord(batch_num, offset=batch_num * 100, after_key=[Decimal("1.5"), datetime(2024, 1, batch_num + 1)])
+        for batch_num in range(num_batches)
+    ], ["id", "created_at"], 100)
+    manifest.save()
+    return manifest
+
+def add_file(manifest, tmp_path, batch_num, index=0):
+    path = str(tmp_path / f"t_{batch_num}_{index}.parquet")
+    with open(path, "wb") as f:
+        f.write(b"parquet")
+    manifest.add_file(batch_num, path, 10)
+    return path
+
+def test_flushed_changes_are_loaded_back(tmp_path):
+    manifest = make_manifest(tmp_path)
+    path = add_file(manifest, tmp_path, 1)
+    manifest.mark_uploaded(path)
+    manifest.mark_extracted(1, 10)
+    manifest.mark_failed(2, "deadlock")
+    asyncio.run(manifest.flush())
+
+    loaded = Manifest.load(manifest.path)
+    assert loaded.key_columns == ["id", "created_at"]
+    assert loaded.batch_size == 100
+    assert loaded.batches[0].after_key == [Decimal("1.5"), datetime(2024, 1, 1)]
+    assert loaded.batches[1].extracted and loaded.batches[1].num_rows == 10
+    assert loaded.file(path).uploaded and not loaded.file(path).loaded
+    assert loaded.batches[2].error == "deadlock"
+    assert loaded.batch_of(path) == 1
+
+def test_changes_made_during_a_write_are_written_together(tmp_path, monkeypatch):
+    manifest = make_manifest(tmp_path, num_batches=10)
+    writes = []
+    write = manifest._write
+    monkeypatch.setattr(manifest, "_write", lambda data: (writes.append(data), write(data)))
+
+    async def mark(batch_num):
+        manifest.mark_extracted(batch_num, batch_num)
+        await manifest.flush()
+
+    async def mark_all():
+        await asyncio.gather(*(mark(batch_num) for batch_num in range(10)))
+
+    asyncio.run(mark_all())
+
+    assert 1 <= len(writes) < 10
+    assert all(batch.extracted for batch in Manifest.load(manifest.path).batches.values())
+
+def test_reset_batch_forgets_its_files(tmp_path):
+    manifest = make_manifest(tmp_path)
+    path = add_file(manifest, tmp_path, 0)
+    manifest.reset_batch(0)
+    asyncio.run(manifest.flush())
+
+    assert manifest.batch_of(path) is None
+    assert manifest.file(path) is None
+    assert Manifest.load(manifest.path).batches[0].files == []
@@ -0,0 +1,87 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from engine.connectors.sqlite import AsyncSQLiteConnector
+from engine.services.partition import Partition, PartitionPlan, PartitionPlanner
+
+def create_table(path: str, keys) -> None:
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, k BIGINT)")
+        connection.executemany("INSERT INTO t (k) VALUES (?)", [(key,) for key in keys])
+
+def plan(path: str, num_partitions: int, sample_size: int = 0) -> PartitionPlan:
+    async def run():
+        connector = AsyncSQLiteConnector("", 0, "", "", path)
+        await connector.connect()
+        try:
+            return await PartitionPlanner(connector, sample_size).plan("t", "k", num_partitions)
+        finally:
+            await connector.disconnect()
+    return asyncio.run(run())
+
+def partition_rows(path: str, plan: PartitionPlan):
+    with sqlite3.connect(path) as connection:
+        return [
+            connection.execute(f"SELECT COUNT(*) FROM t WHERE {where.replace('%s', '?')}", params).fetchone()[0]
+            for where, params in (partition.predicate(plan.key_column, plan.key_type) for partition in plan.partitions)
+        ]
+
+def test_even_cuts_split_the_key_range(tmp_path):
+    path = str(tmp_path / "source.db")
+    create_table(path, range(1, 1001))
+
+    even = plan(path, 4)
+
+    assert not even.sampled
+    assert [(partition.lower, partition.upper) for partition in even.partitions] == [(1, 251), (251, 501), (501, 751), (751, 1000)]
+    assert [partition.upper_inclusive for partition in even.partitions] == [False, False, False, True]
+    assert partition_rows(path, even) == [250, 250, 250, 250]
+
+def test_sampled_cuts_follow_skewed_keys(tmp_path):
+    path = str(tmp_path / "source.db")
+    # Most keys are bunched at the bottom of the range, where even cuts would put them all in one partition
+    create_table(path, list(range(1, 9001)) + list(range(10 ** 6, 10 ** 6 + 1000 * 1000, 1000)))
+
+    skewed = plan(path, 4, sample_size=10000)
+
+    assert skewed.sampled
+    rows = partition_rows(path, skewed)
+    assert sum(rows) == 10000
+    assert max(rows) < 4000
+
+def test_empty_table_has_no_partitions(tmp_path):
+    path = str(tmp_path / "source.db")
+    create_table(path, [])
+
+    assert plan(path, 4).partitions == []
+
+def test_null_keys_get_their_own_partition(tmp_path):
+    path = str(tmp_path / "source.db")
+    create_table(path, list(range(1, 101)) + [None] * 10)
+
+    with_nulls = plan(path, 2)
+
+    assert with_nulls.partitions[-1].is_null()
+    assert [partition.index for partition in with_nulls.partitions] == [0, 1, 2]
+    assert partition_rows(path, with_nulls) == [50, 50, 10]
+    loaded = PartitionPlan.from_dict(with_nulls.to_dict())
+    assert loaded.partitions[-1].is_null()
+
+def test_only_null_keys(tmp_path):
+    path = str(tmp_path / "source.db")
+    create_table(path, [None] * 10)
+
+    only_nulls = plan(path, 4)
+
+    assert [partition.is_null() for partition in only_nulls.partitions] == [True]
+    assert partition_rows(path, only_nulls) == [10]
+
+@pytest.mark.parametrize("partition, predicate", [
+    (Partition(0, 1, 10, False), ("`k` BETWEEN %s AND %s", [1, 9])),
+    (Partition(1, 10, 20, True), ("`k` BETWEEN %s AND %s", [10, 20])),
+    (Partition(2, None, None, True), ("`k` IS NULL", [])),
+])
+def test_predicate(partition, predicate):
+    assert partition.predicate("k", "int") == predicate
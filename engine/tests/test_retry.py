@@ -0,0 +1,75 @@
+import asyncio
+import sqlite3
+
+import pymysql
+import pytest
+from botocore.exceptions import ClientError
+
+from engine.services.retry import RetryPolicy, is_transient
+
+def client_error(code: str, status: int) -> ClientError:
+    return ClientError({"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}, "PutObject")
+
+@pytest.mark.parametrize("error, transient", [
+    (pymysql.err.OperationalError(1213, "Deadlock found"), True),
+    (pymysql.err.OperationalError(2013, "Lost connection to MySQL server"), True),
+    (pymysql.err.ProgrammingError(1064, "You have an error in your SQL syntax"), False),
+    (pymysql.err.ProgrammingError(1146, "Table doesn't exist"), False),
+    (sqlite3.OperationalError("database is locked"), True),
+    (sqlite3.OperationalError("no such table: t"), False),
+    (client_error("SlowDown", 503), True),
+    (client_error("InternalError", 500), True),
+    (client_error("AccessDenied", 403), False),
+    (ConnectionResetError("Connection reset by peer"), True),
+    (ValueError("bad value"), False),
+])
+def test_is_transient(error, transient):
+    assert is_transient(error) == transient
+
+def test_is_transient_follows_the_cause():
+    try:
+        try:
+            raise pymysql.err.OperationalError(2006, "MySQL server has gone away")
+        except pymysql.err.OperationalError as e:
+            raise Exception("Extracting batch 3 failed") from e
+    except Exception as e:
+        assert is_transient(e)
+
+class Flaky:
+    def __init__(self, failures: int, error: Exception):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return "done"
+
+def test_retry_policy_retries_transient_errors():
+    operation = Flaky(2, sqlite3.OperationalError("database is locked"))
+
+    assert asyncio.run(RetryPolicy(3, 0.001, 0.01).run(operation, "Loading")) == "done"
+    assert operation.calls == 3
+
+def test_retry_policy_gives_up_after_its_attempts():
+    operation = Flaky(3, sqlite3.OperationalError("database is locked"))
+
+    with pytest.raises(sqlite3.OperationalError):
+        asyncio.run(RetryPolicy(3, 0.001, 0.01).run(operation, "Loading"))
+    assert operation.calls == 3
+
+def test_retry_policy_raises_fatal_errors_at_once():
+    operation = Flaky(1, ValueError("bad value"))
+
+    with pytest.raises(ValueError):
+        asyncio.run(RetryPolicy(3, 0.001, 0.01).run(operation, "Loading"))
+    assert operation.calls == 1
+
+def test_retry_policy_respects_can_retry():
+    operation = Flaky(1, ConnectionResetError("Connection reset by peer"))
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(RetryPolicy(3, 0.001, 0.01).run(operation, "Extracting", can_retry=lambda e: False))
+    assert operation.calls == 1
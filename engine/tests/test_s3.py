@@ -0,0 +1,81 @@
+import hashlib
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+from boto3.exceptions import S3UploadFailedError
+from botocore.exceptions import ClientError
+
+from engine.services.s3 import S3Service
+
+MB = 1024 * 1024
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        boto3.client("s3").create_bucket(Bucket="exports")
+        # The smallest part size S3 accepts, so a few megabytes already take a multipart upload
+        yield S3Service("exports", "testing", "testing", multipart_chunksize=5 * MB)
+
+def write_parquet(path: str, rows: int = 1000) -> str:
+    pq.write_table(pa.table({"id": list(range(rows)), "name": [f"row {i}" for i in range(rows)]}), path)
+    with open(path, "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+def test_upload_parquet_is_found_by_its_checksum(s3, tmp_path):
+    path = str(tmp_path / "batch_0.parquet")
+    checksum = write_parquet(path)
+
+    assert s3.upload_parquet(path, "job/batch_0.parquet")
+
+    assert s3.object_exists("job/batch_0.parquet", checksum)
+    assert not s3.object_exists("job/batch_0.parquet", "0" * 32)
+    assert not s3.object_exists("job/batch_1.parquet", checksum)
+    assert s3.files_uploaded == 1
+
+def test_upload_parquet_rejects_other_files(s3, tmp_path):
+    path = tmp_path / "batch_0.csv"
+    path.write_text("id\n1\n")
+
+    assert not s3.upload_parquet(str(path), "job/batch_0.csv")
+    assert s3.files_uploaded == 0
+
+def test_multipart_uploads_are_found_without_comparing_checksums(s3):
+    buffer = pa.py_buffer(b"x" * (12 * MB))
+
+    assert s3.upload_buffer(buffer, "job/large.parquet")
+
+    etag = s3.s3_client.head_object(Bucket="exports", Key="job/large.parquet")["ETag"]
+    assert etag.strip('"').endswith("-3")
+    assert s3.object_exists("job/large.parquet", hashlib.md5(buffer.to_pybytes()).hexdigest())
+    assert s3.bytes_uploaded == 12 * MB
+
+def test_upload_to_a_missing_bucket_fails(s3, tmp_path):
+    path = str(tmp_path / "batch_0.parquet")
+    write_parquet(path)
+    s3.bucket_name = "missing"
+
+    assert not s3.upload_parquet(path, "job/batch_0.parquet")
+    assert not s3.upload_buffer(pa.py_buffer(b"parquet"), "job/batch_1.parquet")
+    assert s3.files_uploaded == 0
+
+def test_throttled_uploads_are_raised_to_be_retried(s3, tmp_path, monkeypatch):
+    path = str(tmp_path / "batch_0.parquet")
+    write_parquet(path)
+
+    def throttled_upload(*args, **kwargs):
+        # How the managed transfer reports a failed upload, wrapping the ClientError
+        try:
+            raise ClientError({"Error": {"Code": "SlowDown"}, "ResponseMetadata": {"HTTPStatusCode": 503}}, "PutObject")
+        except ClientError as e:
+            raise S3UploadFailedError(f"Failed to upload {path} to exports/job/batch_0.parquet: {e}")
+
+    monkeypatch.setattr(s3.s3_client, "upload_file", throttled_upload)
+
+    with pytest.raises(S3UploadFailedError):
+        s3.upload_parquet(path, "job/batch_0.parquet")
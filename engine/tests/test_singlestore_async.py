@@ -0,0 +1,67 @@
+import asyncio
+
+import aiomysql
+
+from engine.connectors.singlestore_async import AsyncSingleStoreConnector
+from engine.services.job import create_pool
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, params=None):
+        self.connection.running += 1
+        self.connection.most_running = max(self.connection.most_running, self.connection.running)
+        await asyncio.sleep(0.01)
+        self.connection.running -= 1
+        self.connection.queries.append(query)
+
+    async def fetchall(self):
+        return [(1,)]
+
+class FakeConnection:
+    def __init__(self):
+        self.queries = []
+        self.running = 0
+        self.most_running = 0
+        self.closed = False
+
+    def cursor(self, *args):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+def test_pooled_connectors_hold_a_plain_connection(monkeypatch):
+    connections = []
+
+    async def connect(**kwargs):
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    async def no_pool(**kwargs):
+        raise AssertionError("Pooled connectors shouldn't open an aiomysql pool of their own")
+
+    monkeypatch.setattr(aiomysql, "connect", connect)
+    monkeypatch.setattr(aiomysql, "create_pool", no_pool)
+
+    async def run():
+        pool = create_pool("singlestore", "localhost", 3306, "root", "", "db", 2)
+        async with pool.connection() as first, pool.connection() as second:
+            assert isinstance(first, AsyncSingleStoreConnector)
+            # Statements on one connection take turns
+            await asyncio.gather(first.test_connection(), first.test_connection(), second.test_connection())
+        await pool.close()
+
+    asyncio.run(run())
+
+    assert len(connections) == 2
+    assert [len(connection.queries) for connection in connections] == [2, 1]
+    assert all(connection.most_running == 1 for connection in connections)
+    assert all(connection.closed for connection in connections)
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import time
+
+import pyarrow as pa
+
+from engine.services.spill import SpillCache
+
+def fill(cache: SpillCache, key: str, num_rows: int = 1000) -> None:
+    writer = cache.writer(key)
+    writer.write(pa.RecordBatch.from_pydict({"id": list(range(num_rows))}))
+    writer.commit()
+
+def test_cached_batches_are_read_back(tmp_path):
+    cache = SpillCache(str(tmp_path), 10 * 1024 * 1024)
+    writer = cache.writer("t-0")
+    for start in range(0, 300, 100):
+        writer.write(pa.RecordBatch.from_pydict({"id": list(range(start, start + 100))}))
+    writer.commit()
+
+    entry = cache.get("t-0")
+
+    assert entry.num_rows == 300
+    assert [batch.num_rows for batch in cache.read(entry)] == [100, 100, 100]
+    assert pa.Table.from_batches(list(cache.read(entry))).column("id").to_pylist() == list(range(300))
+    assert cache.get("t-1") is None
+
+def test_least_recently_used_batches_are_evicted(tmp_path):
+    fill(SpillCache(str(tmp_path), 1 << 30), "probe")
+    entry_bytes = os.path.getsize(os.path.join(str(tmp_path), "probe.arrow"))
+    # Room for three batches
+    cache = SpillCache(str(tmp_path / "cache"), 3 * entry_bytes)
+    for key in ("a", "b", "c"):
+        fill(cache, key)
+        time.sleep(0.01)
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") is not None
+
+    fill(cache, "d")
+
+    assert set(cache.entries) == {"a", "c", "d"}
+    assert not os.path.exists(cache.path("b"))
+    assert cache.size_bytes() <= 3 * entry_bytes
+
+def test_the_newest_batch_stays_even_over_the_limit(tmp_path):
+    cache = SpillCache(str(tmp_path), 1)
+    fill(cache, "a")
+    fill(cache, "b")
+
+    assert set(cache.entries) == {"b"}
+
+def test_expired_and_aborted_batches_are_not_served(tmp_path):
+    cache = SpillCache(str(tmp_path), 1 << 30, max_age_seconds=60)
+    fill(cache, "old")
+    cache.entries["old"].created_at -= 120
+    writer = cache.writer("aborted")
+    writer.write(pa.RecordBatch.from_pydict({"id": [1]}))
+    writer.abort()
+
+    assert cache.get("old") is None
+    assert not os.path.exists(cache.path("old"))
+    assert cache.get("aborted") is None
+    assert os.listdir(str(tmp_path)) == ["index.json"]
+
+def test_the_index_survives_a_restart(tmp_path):
+    fill(SpillCache(str(tmp_path), 1 << 30), "a", 42)
+
+    reopened = SpillCache(str(tmp_path), 1 << 30)
+
+    assert reopened.get("a").num_rows == 42
+
+def test_concurrent_fills_of_a_batch_read_the_source_once(tmp_path):
+    cache = SpillCache(str(tmp_path), 1 << 30)
+    source_reads = []
+
+    async def extract(key):
+        # The way JobService.extract_batch fills the cache: the first holder of the lock fills it, the rest hit
+        async with cache.fill_lock(key):
+            if cache.get(key) is None:
+                source_reads.append(key)
+                await asyncio.sleep(0.01)
+                fill(cache, key)
+            return cache.get(key).num_rows
+
+    async def run():
+        return await asyncio.gather(*(extract(key) for key in ("a", "a", "a", "b")))
+
+    assert asyncio.run(run()) == [1000, 1000, 1000, 1000]
+    assert sorted(source_reads) == ["a", "b"]
+    assert cache.fill_lock("a") is cache.fill_lock("a")
+    assert cache.fill_lock("a") is not cache.fill_lock("b")
@@ -0,0 +1,74 @@
+import random
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from engine.services.parquet import ColumnEncoding, CompressionType, ParquetConfig
+from engine.services.tuning import CODECS, CandidateResult, EncodingPlan, EncodingTuner
+
+def sample_batch(num_rows: int = 5000) -> pa.RecordBatch:
+    rng = random.Random(7)
+    return pa.RecordBatch.from_pydict({
+        "id": list(range(num_rows)),
+        "price": [rng.uniform(0, 1000) for _ in range(num_rows)],
+        "status": [rng.choice(["new", "paid", "shipped"]) for _ in range(num_rows)],
+        "flag": [i % 2 == 0 for i in range(num_rows)]
+    })
+
+def test_candidates_depend_on_the_column_type():
+    tuner = EncodingTuner("size", 100 * 1024 * 1024)
+
+    def encodings(arrow_type):
+        return {candidate.encoding for candidate in tuner.candidates(arrow_type)}
+
+    assert encodings(pa.float64()) == {None, "PLAIN", "BYTE_STREAM_SPLIT"}
+    assert encodings(pa.int64()) == {None, "PLAIN", "DELTA_BINARY_PACKED"}
+    assert encodings(pa.timestamp("us")) == {None, "PLAIN", "DELTA_BINARY_PACKED"}
+    assert encodings(pa.string()) == {None, "PLAIN", "DELTA_LENGTH_BYTE_ARRAY", "DELTA_BYTE_ARRAY"}
+    assert encodings(pa.bool_()) == {"PLAIN"}
+    assert len(tuner.candidates(pa.bool_())) == len(CODECS)
+
+def test_size_objective_picks_the_smallest_encoding_of_every_column():
+    tuner = EncodingTuner("size", 100 * 1024 * 1024, repeats=1)
+    sample = sample_batch()
+
+    plan = tuner.tune(sample)
+
+    table = pa.Table.from_batches([sample])
+    for name in table.column_names:
+        column = table.select([name])
+        sizes = []
+        for candidate in tuner.candidates(column.schema.field(name).type):
+            try:
+                sizes.append(tuner.measure(column, candidate).size_bytes)
+            except (pa.ArrowException, ValueError):
+                continue
+        assert plan.sample_bytes[name] == min(sizes)
+    # Three distinct strings compress best as a dictionary
+    assert plan.columns["status"].encoding is None
+
+def test_load_objective_weighs_bytes_against_decode_time():
+    small_slow = CandidateResult(ColumnEncoding(CompressionType.ZSTD, 9), 1000, 0.5, 0.02)
+    large_fast = CandidateResult(ColumnEncoding(CompressionType.NONE), 100000, 0.001, 0.001)
+
+    # Over a slow link the smaller file wins, over a fast one the quicker decode does
+    assert min([small_slow, large_fast], key=EncodingTuner("load", 1024 * 1024).score) is small_slow
+    assert min([small_slow, large_fast], key=EncodingTuner("load", 1024 ** 3).score) is large_fast
+    # Counting the encode time as well favours the cheap codec sooner
+    assert min([small_slow, large_fast], key=EncodingTuner("balanced", 10 * 1024 * 1024).score) is large_fast
+    assert min([small_slow, large_fast], key=EncodingTuner("size", 1024 ** 3).score) is small_slow
+
+def test_plan_round_trips_and_drives_the_writer(tmp_path):
+    plan = EncodingTuner("size", 100 * 1024 * 1024, repeats=1).tune(sample_batch(1000))
+    path = str(tmp_path / "encodings.json")
+    plan.save(path)
+
+    loaded = EncodingPlan.load(path)
+
+    assert loaded == plan
+    config = ParquetConfig(columns=loaded.columns)
+    table = pa.Table.from_batches([sample_batch(1000)])
+    pq.write_table(table, str(tmp_path / "t.parquet"), **config.writer_options(table.schema))
+    metadata = pq.ParquetFile(str(tmp_path / "t.parquet")).metadata
+    for index, name in enumerate(table.column_names):
+        assert metadata.row_group(0).column(index).compression.lower() == loaded.columns[name].compression.value.replace("none", "uncompressed")